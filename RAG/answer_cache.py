@@ -0,0 +1,116 @@
+"""
+Cache sémantique des réponses du chatbot
+Une question proche (similarité cosinus des embeddings) d'une question déjà
+posée renvoie directement la réponse et les sources mémorisées
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ENTRIES
+
+
+def normalize_question(question: str) -> str:
+    """Met la question en minuscules, sans espaces superflus ni ponctuation finale"""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+
+def collection_fingerprint(vectorstore, persist_directory: Path) -> Tuple[int, float]:
+    """
+    Empreinte de la collection Chroma : nombre de chunks et date de dernière
+    écriture des fichiers de la base. Elle change à chaque réindexation.
+    """
+    mtimes = [0.0]
+    for entry in os.scandir(persist_directory):
+        # Le fichier -shm de SQLite est modifié même par les lectures
+        if entry.is_file() and not entry.name.endswith('-shm'):
+            mtimes.append(entry.stat().st_mtime)
+    return vectorstore._collection.count(), max(mtimes)
+
+
+class SemanticAnswerCache:
+    """Cache LRU avec expiration, recherche par similarité cosinus"""
+
+    def __init__(self, embeddings,
+                 threshold: float = ANSWER_CACHE_THRESHOLD,
+                 ttl: float = ANSWER_CACHE_TTL,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._next_id = 0
+        self._fingerprint = None
+        self._lock = threading.Lock()  # Partagé par toutes les sessions Streamlit
+
+    def embed(self, question: str) -> np.ndarray:
+        """Embedding normalisé (norme 1) de la question normalisée"""
+        vector = np.asarray(self.embeddings.embed_query(normalize_question(question)), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def check_collection(self, fingerprint):
+        """Vide le cache si la collection Chroma a changé depuis la dernière requête"""
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                self._entries.clear()
+                self._fingerprint = fingerprint
+
+    def get(self, vector: np.ndarray, settings) -> Optional[Dict]:
+        """
+        Cherche une réponse mémorisée pour une question similaire
+
+        Args:
+            vector: Embedding normalisé de la question
+            settings: Paramètres de recherche (sources, budget) qui font partie de la clé
+
+        Returns:
+            Dictionnaire avec la réponse et les sources, ou None
+        """
+        now = time.time()
+        with self._lock:
+            for entry_id in [i for i, e in self._entries.items() if now - e['created_at'] > self.ttl]:
+                del self._entries[entry_id]
+
+            candidates = [(i, e) for i, e in self._entries.items() if e['settings'] == settings]
+            if candidates:
+                matrix = np.stack([e['vector'] for _, e in candidates])
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)  # Plus récemment utilisée
+                    self.hits += 1
+                    return {"answer": entry['answer'], "sources": entry['sources']}
+
+            self.misses += 1
+            return None
+
+    def put(self, vector: np.ndarray, settings, answer: str, sources: List):
+        """Mémorise une réponse ; l'entrée la moins récemment utilisée est retirée au-delà de la limite"""
+        with self._lock:
+            self._entries[self._next_id] = {
+                'vector': vector,
+                'settings': settings,
+                'answer': answer,
+                'sources': sources,
+                'created_at': time.time(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -0,0 +1,223 @@
+"""
+API HTTP asynchrone du chatbot RAG
+Le moteur (embeddings, base vectorielle, LLM) est chargé une seule fois au
+démarrage ; les requêtes concurrentes sont exécutées dans un pool de threads.
+
+Utilisation :
+    python RAG/api.py --port 8000
+
+Routes :
+    POST /ask         {"question": ..., "token_budget": 1200, "k": null, "session_id": ..., "client_id": ...,
+                       "fast_path": true, "reask_query": null}
+                      -> réponse, sources, requête de recherche, durées
+                      (fast_path : réponse rapide permise pour une question de consultation ;
+                      reask_query : requête d'une question déjà posée, sans reformulation ni
+                      nouvel enregistrement dans la mémoire)
+                      (k et token_budget : entiers positifs, ramenés à RAG_API_MAX_K et
+                      RAG_API_TOKEN_BUDGET_RANGE ; 400 sinon)
+                      (503 si le LLM est saturé et LLM_BUSY_FALLBACK désactivé)
+    POST /ask/stream  même corps -> NDJSON : sources, position dans la file du LLM
+                      tant que la question attend, puis tokens, puis durées
+    GET  /stats       compteurs des caches, du préchargement et de la file du LLM
+    GET  /metrics     durées par étape, tokens et caches au format texte de Prometheus
+    GET  /health
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from aiohttp import web
+from langchain_core.documents import Document
+
+from config import (RAG_API_HOST, RAG_API_PORT, RAG_API_WORKERS, RAG_API_MAX_K, RAG_API_TOKEN_BUDGET_RANGE,
+                    CONTEXT_TOKEN_BUDGET, FAST_PATH)
+from RAG.engine import RAGEngine
+from RAG.scheduler import SchedulerBusy
+from telemetry import METRICS
+
+ENGINE_KEY = web.AppKey("engine", RAGEngine)
+EXECUTOR_KEY = web.AppKey("executor", ThreadPoolExecutor)
+
+
+def serialize_sources(sources: List[Document]) -> List[Dict]:
+    return [{"content": doc.page_content, "metadata": doc.metadata} for doc in sources]
+
+
+def parse_int(payload: Dict, field: str, default: Optional[int], low: int, high: int) -> Optional[int]:
+    """
+    Lit un champ entier du corps JSON, ramené dans [low, high]
+
+    Args:
+        payload: Le corps JSON
+        field: Le nom du champ
+        default: Valeur si le champ est absent ou nul
+        low: Valeur minimale
+        high: Valeur maximale
+
+    Returns:
+        La valeur bornée, ou default
+    """
+    value = payload.get(field)
+    if value is None:
+        return default
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        number = int(value)
+    except (TypeError, ValueError):
+        raise web.HTTPBadRequest(text=f"Le champ '{field}' doit être un entier")
+    if number < 0:
+        raise web.HTTPBadRequest(text=f"Le champ '{field}' doit être positif")
+    return min(max(number, low), high)
+
+
+async def parse_request(request: web.Request) -> Dict:
+    """Valide le corps JSON d'une question"""
+    try:
+        payload = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text="Corps JSON invalide")
+    if not isinstance(payload, dict):
+        raise web.HTTPBadRequest(text="Le corps JSON doit être un objet")
+    question = payload.get("question") or ""
+    question = question.strip() if isinstance(question, str) else ""
+    if not question:
+        raise web.HTTPBadRequest(text="Le champ 'question' est obligatoire")
+    return {
+        "question": question,
+        "k": parse_int(payload, "k", None, 1, RAG_API_MAX_K),
+        "session_id": payload.get("session_id") or None,
+        "client_id": payload.get("client_id") or None,
+        "token_budget": parse_int(payload, "token_budget", CONTEXT_TOKEN_BUDGET, *RAG_API_TOKEN_BUDGET_RANGE),
+        "fast_path": bool(payload.get("fast_path", FAST_PATH)),
+        "reask_query": (payload.get("reask_query") or "").strip() or None,
+    }
+
+
+async def handle_ask(request: web.Request) -> web.Response:
+    params = await parse_request(request)
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(
+            request.app[EXECUTOR_KEY],
+            lambda: request.app[ENGINE_KEY].answer(**params)
+        )
+    except SchedulerBusy as busy:
+        raise web.HTTPServiceUnavailable(text=f"LLM saturé : {busy}",
+                                         headers={"Retry-After": str(max(1, round(busy.estimated_wait)))})
+    return web.json_response({
+        "answer": result["answer"],
+        "sources": serialize_sources(result["sources"]),
+        "search_query": result["search_query"],
+        "cached": result["cached"],
+        "degraded": result["degraded"],
+        "fast_path": result["fast_path"],
+        "timings": result["timings"],
+    })
+
+
+async def handle_ask_stream(request: web.Request) -> web.StreamResponse:
+    params = await parse_request(request)
+    loop = asyncio.get_running_loop()
+    executor = request.app[EXECUTOR_KEY]
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+
+    async def send(event: Dict):
+        await response.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def on_queue(position: int, estimated_wait: float):
+        # Appelée dans le pool pendant l'attente du premier token : l'événement est écrit par la boucle
+        event = {"type": "queue", "position": position, "estimated_wait": estimated_wait}
+        asyncio.run_coroutine_threadsafe(send(event), loop).result()
+
+    result = await loop.run_in_executor(executor, lambda: request.app[ENGINE_KEY].stream(**params, on_queue=on_queue))
+    await response.prepare(request)
+
+    await send({"type": "sources", "sources": serialize_sources(result["sources"]),
+                "search_query": result["search_query"], "cached": result["cached"],
+                "fast_path": result["fast_path"]})
+    tokens = result["stream"]
+    while True:
+        # Chaque token est lu dans le pool : la boucle d'événements reste libre
+        try:
+            token = await loop.run_in_executor(executor, next, tokens, None)
+        except SchedulerBusy as busy:
+            await send({"type": "busy", "message": str(busy), "estimated_wait": busy.estimated_wait})
+            break
+        if token is None:
+            break
+        await send({"type": "token", "token": token})
+    await send({"type": "done", "timings": result["timings"], "degraded": result["degraded"]})
+    await response.write_eof()
+    return response
+
+
+async def handle_stats(request: web.Request) -> web.Response:
+    return web.json_response(request.app[ENGINE_KEY].stats())
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    stats = request.app[ENGINE_KEY].stats()
+    gauges = {key: value for key, value in stats.items() if key.startswith("answer_cache_")}
+    gauges.update({f"embedding_cache_{key}": value for key, value in stats["embedding_cache"].items()})
+    gauges.update({f"llm_{key}": value for key, value in stats["llm_scheduler"].items()})
+    gauges.update({f"prefetch_{key}": value for key, value in stats["prefetch"].items()})
+    for kind in ("llm", "embedding"):
+        backends = stats[f"{kind}_backends"]
+        gauges[f"{kind}_backends"] = len(backends)
+        gauges[f"{kind}_backends_healthy"] = sum(backend["healthy"] for backend in backends)
+    return web.Response(text=METRICS.render_prometheus(gauges), content_type="text/plain",
+                        headers={"X-Prometheus-Format": "0.0.4"})
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok"})
+
+
+def create_app(engine: RAGEngine = None, workers: int = RAG_API_WORKERS) -> web.Application:
+    """
+    Crée l'application aiohttp
+
+    Args:
+        engine: Moteur RAG à servir (créé avec la configuration par défaut si absent)
+        workers: Nombre de requêtes traitées simultanément
+
+    Returns:
+        L'application prête à être lancée
+    """
+    app = web.Application()
+    app[ENGINE_KEY] = engine or RAGEngine()
+    app[EXECUTOR_KEY] = ThreadPoolExecutor(max_workers=workers)
+
+    async def shutdown_executor(app):
+        app[EXECUTOR_KEY].shutdown(wait=False)
+        app[ENGINE_KEY].close()
+
+    app.on_cleanup.append(shutdown_executor)
+    app.add_routes([
+        web.post("/ask", handle_ask),
+        web.post("/ask/stream", handle_ask_stream),
+        web.get("/stats", handle_stats),
+        web.get("/metrics", handle_metrics),
+        web.get("/health", handle_health),
+    ])
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API HTTP du chatbot RAG UQAC")
+    parser.add_argument("--host", default=RAG_API_HOST)
+    parser.add_argument("--port", type=int, default=RAG_API_PORT)
+    parser.add_argument("--workers", type=int, default=RAG_API_WORKERS)
+    args = parser.parse_args()
+
+    web.run_app(create_app(workers=args.workers), host=args.host, port=args.port)
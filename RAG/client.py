@@ -0,0 +1,96 @@
+"""
+Client de l'API HTTP du chatbot (RAG/api.py)
+Expose la même interface que RAGEngine pour que l'interface Streamlit puisse
+utiliser indifféremment le moteur local ou un service distant
+"""
+import json
+from typing import Callable, Dict, List, Optional
+
+import requests
+from langchain_core.documents import Document
+
+from config import CONTEXT_TOKEN_BUDGET, FAST_PATH
+from RAG.scheduler import SchedulerBusy
+
+
+def deserialize_sources(sources: List[Dict]) -> List[Document]:
+    return [Document(page_content=s["content"], metadata=s["metadata"]) for s in sources]
+
+
+class RemoteRAGEngine:
+    """Accès au moteur RAG à travers l'API HTTP"""
+
+    def __init__(self, base_url: str, timeout: float = 300):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()  # Réutilise la connexion HTTP
+
+    def answer(self, question: str, k: Optional[int] = None, session_id: Optional[str] = None,
+               token_budget: int = CONTEXT_TOKEN_BUDGET, client_id: Optional[str] = None,
+               on_queue: Optional[Callable[[int, float], None]] = None, fast_path: bool = FAST_PATH,
+               reask_query: Optional[str] = None) -> Dict:
+        response = self.session.post(
+            f"{self.base_url}/ask",
+            json={"question": question, "k": k, "session_id": session_id, "token_budget": token_budget,
+                  "client_id": client_id, "fast_path": fast_path, "reask_query": reask_query},
+            timeout=self.timeout
+        )
+        if response.status_code == 503:
+            raise SchedulerBusy(response.text, float(response.headers.get("Retry-After", 0)))
+        response.raise_for_status()
+        result = response.json()
+        result["sources"] = deserialize_sources(result["sources"])
+        return result
+
+    def stream(self, question: str, k: Optional[int] = None, session_id: Optional[str] = None,
+               token_budget: int = CONTEXT_TOKEN_BUDGET, client_id: Optional[str] = None,
+               on_queue: Optional[Callable[[int, float], None]] = None, fast_path: bool = FAST_PATH,
+               reask_query: Optional[str] = None) -> Dict:
+        response = self.session.post(
+            f"{self.base_url}/ask/stream",
+            json={"question": question, "k": k, "session_id": session_id, "token_budget": token_budget,
+                  "client_id": client_id, "fast_path": fast_path, "reask_query": reask_query},
+            timeout=self.timeout,
+            stream=True
+        )
+        response.raise_for_status()
+        lines = response.iter_lines(decode_unicode=True)
+
+        # Le premier événement contient les sources
+        first = json.loads(next(lines))
+        result = {
+            "sources": deserialize_sources(first["sources"]),
+            "search_query": first["search_query"],
+            "cached": first["cached"],
+            "degraded": False,
+            "fast_path": first.get("fast_path", False),
+            "timings": {}
+        }
+
+        def generate():
+            busy = None
+            for line in lines:
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["type"] == "token":
+                    yield event["token"]
+                elif event["type"] == "queue":
+                    if on_queue:
+                        on_queue(event["position"], event["estimated_wait"])
+                elif event["type"] == "busy":
+                    busy = SchedulerBusy(event["message"], event["estimated_wait"])
+                elif event["type"] == "done":
+                    result["timings"].update(event["timings"])
+                    result["degraded"] = event.get("degraded", False)
+            response.close()
+            if busy:
+                raise busy
+
+        result["stream"] = generate()
+        return result
+
+    def stats(self) -> Dict:
+        response = self.session.get(f"{self.base_url}/stats", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
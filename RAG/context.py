@@ -0,0 +1,208 @@
+"""
+Assemblage du contexte du prompt dans un budget de tokens
+Les chunks enfants du découpage structuré sont remplacés par leur section
+parente ; les chunks d'une même page qui se chevauchent (CHUNK_OVERLAP) sont
+fusionnés avant la sélection, puis les sources et la mémoire
+de la conversation sont coupées à leur budget pour que la taille du prompt (et
+donc le temps de prefill du LLM) reste bornée quels que soient les réglages.
+"""
+import math
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from parent_store import ParentStore
+
+CHARS_PER_TOKEN = 4  # Estimation pour le français, sans dépendre du tokenizer du LLM
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation du nombre de tokens d'un texte"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Coupe un texte au dernier espace avant la limite de tokens"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > 0 else max_chars].rstrip() + " [...]"
+
+
+def merge_overlapping(documents: List[Document]) -> List[Document]:
+    """
+    Fusionne les chunks d'une même section qui se chevauchent ou se suivent
+
+    Les chunks sont repérés par (url, page, section, start_index) ; le passage fusionné
+    prend la place du mieux classé de ses morceaux.
+
+    Args:
+        documents: Les passages triés par pertinence
+
+    Returns:
+        Les passages fusionnés, sans doublons, dans l'ordre de pertinence
+    """
+    groups: Dict[tuple, List[int]] = {}
+    for rank, doc in enumerate(documents):
+        if 'start_index' in doc.metadata:
+            key = (doc.metadata.get('url'), doc.metadata.get('page'), doc.metadata.get('section'))
+            groups.setdefault(key, []).append(rank)
+
+    # Rang du passage fusionné -> passage ; les autres morceaux sont absorbés
+    merged: Dict[int, Document] = {}
+    absorbed = set()
+    for ranks in groups.values():
+        if len(ranks) < 2:
+            continue
+        ranks = sorted(ranks, key=lambda r: documents[r].metadata['start_index'])
+        runs = [[ranks[0]]]
+        end = _end(documents[ranks[0]])
+        for rank in ranks[1:]:
+            if documents[rank].metadata['start_index'] <= end + 1:
+                runs[-1].append(rank)
+                end = max(end, _end(documents[rank]))
+            else:
+                runs.append([rank])
+                end = _end(documents[rank])
+        for run in runs:
+            if len(run) > 1:
+                merged[min(run)] = _merge_run([documents[r] for r in run])
+                absorbed.update(run)
+
+    result = []
+    seen_contents = set()
+    for rank, doc in enumerate(documents):
+        if rank in merged:
+            doc = merged[rank]
+        elif rank in absorbed:
+            continue
+        if doc.page_content in seen_contents:
+            continue
+        seen_contents.add(doc.page_content)
+        result.append(doc)
+    return result
+
+
+def _end(chunk: Document) -> int:
+    return chunk.metadata['start_index'] + len(chunk.page_content)
+
+
+def _merge_run(chunks: List[Document]) -> Document:
+    """Recolle des chunks consécutifs (triés par position) en retirant le chevauchement"""
+    text = chunks[0].page_content
+    end = _end(chunks[0])
+    for chunk in chunks[1:]:
+        if _end(chunk) <= end:
+            continue  # Entièrement contenu dans le texte déjà recollé
+        overlap = end - chunk.metadata['start_index']
+        text += chunk.page_content[overlap:] if overlap > 0 else " " + chunk.page_content
+        end = _end(chunk)
+    return Document(page_content=text, metadata=dict(chunks[0].metadata))
+
+
+def expand_to_parents(documents: List[Document], parents: Optional[ParentStore],
+                      token_budget: Optional[int] = None) -> List[Document]:
+    """
+    Remplace les chunks enfants par leur section parente, une seule fois
+
+    La section prend le rang de son enfant le mieux classé ; les chunks sans
+    parent (index construit sans découpage structuré) sont gardés tels quels.
+
+    Args:
+        documents: Les passages triés par pertinence
+        parents: Les sections parentes écrites par le scraper (None : aucune)
+        token_budget: Une section plus longue que ce budget est remplacée par l'enfant trouvé
+
+    Returns:
+        Les sections et passages, dans l'ordre de pertinence
+    """
+    result = []
+    seen = set()
+    for doc in documents:
+        parent = parents.get(doc.metadata) if parents else None
+        if parent is None:
+            result.append(doc)
+            continue
+        key = (doc.metadata.get('url'), doc.metadata.get('page'), doc.metadata.get('section'))
+        if key in seen:
+            continue
+        seen.add(key)
+        if token_budget is not None and estimate_tokens(parent) > token_budget:
+            result.append(doc)
+            continue
+        metadata = {k: v for k, v in doc.metadata.items() if k != 'start_index'}
+        result.append(Document(page_content=parent, metadata=metadata))
+    return result
+
+
+def select_within_budget(documents: List[Document], token_budget: int,
+                         max_documents: Optional[int] = None) -> List[Document]:
+    """
+    Garde les meilleurs passages tant qu'ils tiennent dans le budget de tokens
+
+    Args:
+        documents: Les passages triés par pertinence
+        token_budget: Nombre de tokens disponibles pour les sources
+        max_documents: Nombre maximal de passages (None : seul le budget compte)
+
+    Returns:
+        Les passages retenus ; le premier est tronqué s'il dépasse à lui seul le budget
+    """
+    selected = []
+    used = 0
+    for doc in documents:
+        if max_documents and len(selected) == max_documents:
+            break
+        tokens = estimate_tokens(doc.page_content)
+        if not selected and tokens > token_budget:
+            doc = Document(page_content=truncate_to_tokens(doc.page_content, token_budget),
+                           metadata=doc.metadata)
+            tokens = token_budget
+        elif used + tokens > token_budget:
+            continue  # Un passage plus court plus loin peut encore tenir
+        selected.append(doc)
+        used += tokens
+    return selected
+
+
+def format_history(turns: Optional[List[Dict]], token_budget: int, summary: str = "",
+                   max_exchanges: int = 3) -> str:
+    """
+    Met en forme la mémoire de la conversation dans un budget de tokens
+
+    Le résumé prend au plus la moitié du budget ; les échanges les plus récents
+    sont ensuite gardés en priorité, une réponse trop longue étant tronquée
+    plutôt que d'évincer tout l'historique.
+
+    Args:
+        turns: Échanges non résumés ({"question", "answer"}), du plus ancien au plus récent
+        token_budget: Nombre de tokens disponibles pour la mémoire
+        summary: Résumé des échanges plus anciens
+        max_exchanges: Nombre maximal d'échanges repris tels quels
+
+    Returns:
+        Le bloc de mémoire, vide s'il n'y a ni résumé ni échange
+    """
+    block = ""
+    remaining = token_budget
+    if summary:
+        summary = truncate_to_tokens(summary, token_budget // 2)
+        block = f"\n\nRésumé de la conversation:\n{summary}\n"
+        remaining -= estimate_tokens(summary)
+
+    exchanges = []
+    for exchange in reversed((turns or [])[-max_exchanges:]):
+        question = f"Q: {exchange['question']}\n"
+        remaining -= estimate_tokens(question)
+        if remaining <= 0:
+            break
+        answer = truncate_to_tokens(exchange['answer'], remaining)
+        remaining -= estimate_tokens(answer)
+        exchanges.insert(0, question + f"R: {answer}\n\n")
+        if remaining <= 0:
+            break
+
+    if exchanges:
+        block += "\n\nHistorique récent de la conversation:\n" + "".join(exchanges)
+    return block
@@ -0,0 +1,504 @@
+"""
+Moteur RAG indépendant de l'interface
+Regroupe la recherche des sources, la construction du prompt et la génération.
+Il est utilisé par l'interface Streamlit et par l'API HTTP (RAG/api.py).
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.prompts import ChatPromptTemplate
+
+from config import (EMBEDDING_MODEL, PERSIST_DIRECTORY, LLM_MODEL, HYBRID_RETRIEVAL, BM25_INDEX_FILENAME,
+                    PARENT_STORE_FILENAME,
+                    RERANK_CANDIDATES, CONTEXT_TOKEN_BUDGET, HISTORY_TOKEN_BUDGET, EMBEDDING_CACHE_PATH,
+                    LLM_BUSY_FALLBACK, LLM_ENDPOINTS, EMBEDDING_ENDPOINTS, LLM_MAX_IN_FLIGHT, FAST_PATH,
+                    PREFETCH)
+from embedding_cache import CachedEmbeddings
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from ollama_pool import PooledEmbeddings, PooledLLM
+from parent_store import ParentStore
+from RAG.answer_cache import SemanticAnswerCache, collection_fingerprint
+from RAG.context import (estimate_tokens, expand_to_parents, format_history, merge_overlapping,
+                         select_within_budget)
+from RAG.extractive import extractive_answer, fast_path_answer
+from RAG.memory import ConversationMemory, ConversationMemoryStore
+from RAG.prefetch import SourcePrefetcher
+from RAG.reranker import create_reranker, rerank
+from RAG.scheduler import LLMScheduler, SchedulerBusy
+from telemetry import METRICS, Trace, timed
+
+MEMORY_TEMPLATE = """Tu es un assistant spécialisé dans les politiques et procédures de l'UQAC.
+                    Réponds en te basant sur le contexte fourni et l'historique de la conversation.
+                    Si l'information n'est pas dans le contexte, dis-le clairement.
+
+                    {conversation_history}
+
+                    Contexte actuel:
+                    {context}
+
+                    Question actuelle: {question}
+
+                    Réponse:
+        """
+
+TEMPLATE = """Tu es un assistant spécialisé dans les politiques de l'UQAC.
+                    Réponds en te basant uniquement sur le contexte fourni.
+                    Si l'information n'est pas dans le contexte, dis-le clairement.
+
+                    Contexte:
+                    {context}
+
+                    Question: {question}
+
+                    Réponse:
+        """
+
+BUSY_NOTICE = ("⏳ Le service est très sollicité : voici les passages du manuel les plus proches "
+               "de votre question, sans reformulation.")
+
+
+class RAGEngine:
+    """Pipeline RAG : embeddings, base vectorielle et LLM gardés chargés entre les requêtes"""
+
+    def __init__(self, persist_directory: Path = PERSIST_DIRECTORY,
+                 embedding_model: str = EMBEDDING_MODEL, llm_model: str = LLM_MODEL,
+                 embedding_cache_path: Path = EMBEDDING_CACHE_PATH,
+                 llm_endpoints: Sequence[str] = LLM_ENDPOINTS, embedding_endpoints: Sequence[str] = EMBEDDING_ENDPOINTS):
+        self.persist_directory = persist_directory
+        self.embedding_pool = PooledEmbeddings(embedding_model, embedding_endpoints)
+        self.embeddings = CachedEmbeddings(self.embedding_pool, embedding_model, path=embedding_cache_path)
+        self.vectorstore = Chroma(
+            persist_directory=str(persist_directory),
+            embedding_function=self.embeddings
+        )
+        self.llm = PooledLLM(llm_model, llm_endpoints, temperature=0.2)
+        self.answer_cache = SemanticAnswerCache(self.embeddings)
+        self.hybrid = HYBRID_RETRIEVAL
+        self._lexical_index = None
+        self._lexical_mtime = None
+        self._parents = None
+        self._parents_mtime = None
+        self.reranker = create_reranker()
+        # Une file pour toutes les sessions et tous les appels au LLM : les serveurs Ollama sont partagés
+        self.scheduler = LLMScheduler(max_in_flight=LLM_MAX_IN_FLIGHT * self.llm.pool.size)
+        self.llm.pool.on_health_change = lambda healthy: self.scheduler.resize(LLM_MAX_IN_FLIGHT * healthy)
+        self.memory = ConversationMemoryStore(self.llm, scheduler=self.scheduler)
+        self.prefetcher = SourcePrefetcher(self.vectorstore, persist_directory) if PREFETCH else None
+
+    def lexical_index(self) -> Optional[BM25Index]:
+        """Index BM25 construit par le scraper, rechargé s'il a été reconstruit depuis"""
+        path = Path(self.persist_directory) / BM25_INDEX_FILENAME
+        if not path.exists():
+            return None
+        mtime = path.stat().st_mtime
+        if mtime != self._lexical_mtime:
+            self._lexical_index = BM25Index.load(path)
+            self._lexical_mtime = mtime
+        return self._lexical_index
+
+    def parent_store(self) -> Optional[ParentStore]:
+        """Sections parentes écrites par le scraper, relues si elles ont été réécrites depuis"""
+        path = Path(self.persist_directory) / PARENT_STORE_FILENAME
+        if not path.exists():
+            return None
+        mtime = path.stat().st_mtime
+        if mtime != self._parents_mtime:
+            self._parents = ParentStore(path)
+            self._parents_mtime = mtime
+        return self._parents
+
+    def retrieve_candidates(self, question: str, n: int = RERANK_CANDIDATES, trace: Optional[Trace] = None,
+                            session_id: Optional[str] = None,
+                            question_vector: Optional[Sequence[float]] = None) -> List[Document]:
+        """
+        Récupère les passages candidats pour une question, avant reclassement
+
+        Args:
+            question: La question de l'utilisateur
+            n: Nombre de candidats
+            trace: Trace de la réponse (durées de l'embedding et des recherches)
+            session_id: Session dont le voisinage préchargé (sources voisines de la réponse
+                précédente) sert les candidats d'une relance, sans recherche
+            question_vector: Embedding de la question déjà calculé pour le cache des réponses
+
+        Returns:
+            Liste des candidats (sans doublons), du plus au moins pertinent
+        """
+        if question_vector is None:
+            with timed(trace, "query_embedding"):
+                question_vector = self.answer_cache.embed(question)  # Même vecteur que le cache des réponses
+        question_vector = list(map(float, question_vector))
+
+        # Relance couverte par le voisinage préchargé : pas de recherche vectorielle ni BM25
+        prefetched = (self.prefetcher.candidates(session_id, question, question_vector, n)
+                      if self.prefetcher else None)
+        if prefetched:
+            if trace:
+                trace.count("prefetch_hit")
+            return prefetched
+
+        # Récupérer les documents pertinents (sur-échantillonne pour écarter les passages
+        # identiques encore présents dans les bases indexées sans identifiants stables)
+        with timed(trace, "dense_search"):
+            dense_docs = self.vectorstore.similarity_search_by_vector(question_vector, k=n * 2)
+
+        # Recherche hybride : le classement BM25 est fusionné avec le classement vectoriel
+        lexical_index = self.lexical_index() if self.hybrid else None
+        if lexical_index:
+            with timed(trace, "lexical_search"):
+                return reciprocal_rank_fusion([dense_docs, lexical_index.search(question, n * 2)], n)
+
+        candidates = []
+        seen_contents = set()
+        for doc in dense_docs:
+            if doc.page_content in seen_contents:
+                continue
+            seen_contents.add(doc.page_content)
+            candidates.append(doc)
+            if len(candidates) == n:
+                break
+
+        return candidates
+
+    def retrieve_sources(self, question: str, k: Optional[int] = None, token_budget: int = CONTEXT_TOKEN_BUDGET,
+                         trace: Optional[Trace] = None, session_id: Optional[str] = None,
+                         question_vector: Optional[Sequence[float]] = None) -> List[Document]:
+        """
+        Récupère les documents pertinents pour une question : candidats reclassés,
+        remplacés par leur section parente, chunks voisins d'une même page
+        fusionnés, puis passages gardés tant qu'ils tiennent dans le budget de
+        tokens du contexte
+
+        Args:
+            question: La question de l'utilisateur
+            k: Nombre maximal de documents sources (None : seul le budget compte)
+            token_budget: Nombre de tokens de sources dans le prompt
+            trace: Trace de la réponse (durées de chaque étape de la recherche)
+            session_id: Session de l'utilisateur (voisinage préchargé après la réponse précédente)
+            question_vector: Embedding de la question, s'il est déjà calculé
+
+        Returns:
+            Liste des documents sources (sans doublons ni chevauchements)
+        """
+        candidates = self.retrieve_candidates(question, trace=trace, session_id=session_id,
+                                              question_vector=question_vector)
+        with timed(trace, "rerank"):
+            candidates = rerank(self.reranker, question, candidates)
+        with timed(trace, "context"):
+            sources = merge_overlapping(expand_to_parents(candidates, self.parent_store(), token_budget))
+            sources = select_within_budget(sources, token_budget, k)
+        if trace:
+            trace.count("candidates", len(candidates))
+            trace.count("sources", len(sources))
+            trace.count("source_tokens", sum(estimate_tokens(doc.page_content) for doc in sources))
+        return sources
+
+    def build_prompt(self, question: str, source_docs: List[Document],
+                     memory: Optional[ConversationMemory] = None) -> str:
+        """
+        Construit le prompt à partir des sources et de la mémoire de conversation
+
+        Args:
+            question: La question de l'utilisateur
+            source_docs: Documents sources récupérés
+            memory: Mémoire de la session, None si la mémoire est désactivée
+
+        Returns:
+            Le prompt formaté pour le LLM
+        """
+        # Construire le contexte depuis les sources
+        context = "\n\n".join([
+            f"[Source {i + 1}]\n{doc.page_content}"
+            for i, doc in enumerate(source_docs)
+        ])
+
+        # Résumé glissant et dernier échange, dans leur budget de tokens
+        conversation_history = ""
+        if memory:
+            summary, turns = memory.snapshot()
+            conversation_history = format_history(turns, HISTORY_TOKEN_BUDGET, summary=summary)
+
+        # Créer le prompt avec ou sans mémoire
+        if conversation_history:
+            prompt = ChatPromptTemplate.from_template(MEMORY_TEMPLATE)
+            chain_input = {
+                "context": context,
+                "question": question,
+                "conversation_history": conversation_history
+            }
+        else:
+            prompt = ChatPromptTemplate.from_template(TEMPLATE)
+            chain_input = {
+                "context": context,
+                "question": question
+            }
+
+        return prompt.format(**chain_input)
+
+    def lookup_cached_answer(self, question: str, settings):
+        """
+        Cherche une réponse déjà générée pour une question similaire
+
+        Returns:
+            Tuple (réponse mémorisée ou None, embedding de la question)
+        """
+        self.answer_cache.check_collection(collection_fingerprint(self.vectorstore, self.persist_directory))
+        question_vector = self.answer_cache.embed(question)
+        return self.answer_cache.get(question_vector, settings), question_vector
+
+    def prepare(self, question: str, k: Optional[int], session_id: Optional[str], token_budget: int,
+                fast_path: bool = FAST_PATH, reask_query: Optional[str] = None) -> Dict:
+        """
+        Étapes communes à answer et stream : reformulation de la question, cache, recherche,
+        réponse rapide et prompt
+
+        Args:
+            reask_query: Requête de recherche d'une question déjà posée dans la session (réponse
+                complète demandée après une réponse rapide) : reprise telle quelle, sans
+                reformulation, et l'échange n'est pas enregistré une seconde fois dans la mémoire
+
+        Returns:
+            Dictionnaire avec la mémoire de la session, la requête de recherche,
+            la réponse mémorisée (ou les sources et la réponse rapide ou le prompt)
+            et la trace des durées
+        """
+        trace = Trace("chat", token_budget=token_budget)
+        memory = self.memory.get(session_id) if session_id else None
+        standalone = memory is None or memory.is_empty()
+        with trace.span("rewrite"):
+            if reask_query:
+                search_query = reask_query
+            else:
+                search_query = question if standalone else self.memory.rewrite_query(memory, question)
+        if search_query != question:
+            trace.count("rewritten")
+
+        settings = (k, token_budget)
+        with trace.span("cache_lookup"):
+            cached, question_vector = self.lookup_cached_answer(search_query, settings)
+        trace.count("answer_cache_hit" if cached else "answer_cache_miss")
+        state = {
+            "trace": trace,
+            "session_id": session_id,
+            "memory": memory,
+            "record": not reask_query,  # Une question reposée est déjà dans la mémoire
+            "search_query": search_query,
+            "cached": cached,
+            "timings": trace.timings,
+        }
+        if cached:
+            return state
+
+        # L'embedding calculé pour le cache sert aussi à la recherche : un seul appel au serveur
+        state["sources"] = self.retrieve_sources(search_query, k, token_budget, trace, session_id, question_vector)
+        if fast_path:
+            with trace.span("fast_path"):
+                state["fast"] = fast_path_answer(search_query, state["sources"])
+            if state["fast"]:
+                # L'extrait est recalculé à chaque fois : inutile de le mettre en cache
+                trace.count("fast_path")
+                state["cache_key"] = None
+                return state
+
+        with trace.span("prompt"):
+            state["prompt"] = self.build_prompt(question, state["sources"], memory)
+        trace.count("prompt_tokens", estimate_tokens(state["prompt"]))
+
+        # Une réponse qui dépend de la conversation n'est pas réutilisable par d'autres sessions
+        state["cache_key"] = (question_vector, settings) if standalone else None
+        return state
+
+    def finish(self, state: Dict, question: str, answer: str):
+        """
+        Mémorise la réponse (cache et mémoire de la session) une fois générée, lance
+        le préchargement des sources de la relance et enregistre sa trace
+        """
+        if state.get("cache_key"):
+            question_vector, settings = state["cache_key"]
+            self.answer_cache.put(question_vector, settings, answer, state["sources"])
+        if state["memory"]:
+            if state["record"]:
+                self.memory.record(state["memory"], question, answer)
+            if self.prefetcher:
+                sources = state["cached"]["sources"] if state["cached"] else state["sources"]
+                self.prefetcher.schedule(state["session_id"], sources)
+
+        trace = state["trace"]
+        trace.count("answer_tokens", estimate_tokens(answer))
+        trace.add_time("total", trace.elapsed())
+        METRICS.observe(trace)
+
+    def busy_answer(self, state: Dict, question: str, busy: SchedulerBusy) -> str:
+        """
+        Réponse extraite des sources quand le LLM n'a pas de place dans l'objectif de latence
+
+        Raises:
+            SchedulerBusy: si LLM_BUSY_FALLBACK est désactivé (la question est refusée)
+        """
+        state["trace"].count("llm_rejected")
+        if not LLM_BUSY_FALLBACK:
+            raise busy
+        print(f" LLM saturé ({busy}), réponse extraite des sources")
+        state["cache_key"] = None  # Une réponse dégradée n'est pas réutilisée
+        return extractive_answer(question, state["sources"], BUSY_NOTICE)
+
+    def answer(self, question: str, k: Optional[int] = None, session_id: Optional[str] = None,
+               token_budget: int = CONTEXT_TOKEN_BUDGET, client_id: Optional[str] = None,
+               on_queue: Optional[Callable[[int, float], None]] = None, fast_path: bool = FAST_PATH,
+               reask_query: Optional[str] = None) -> Dict:
+        """
+        Génère une réponse en utilisant RAG avec mémoire contextuelle optionnelle
+
+        Args:
+            question: La question de l'utilisateur
+            k: Nombre maximal de documents sources (None : seul le budget compte)
+            session_id: Identifiant de la conversation, None si la mémoire est désactivée
+            token_budget: Nombre de tokens de sources dans le prompt
+            client_id: Session de l'utilisateur pour la file du LLM (session_id par défaut)
+            on_queue: Appelée avec (position, attente estimée en s) tant que la question attend le LLM
+            fast_path: Une question de consultation bien couverte par la meilleure source
+                reçoit l'extrait surligné sans passer par le LLM
+            reask_query: Requête de recherche de la même question déjà posée dans la session
+                (réponse complète d'une réponse rapide), voir prepare
+
+        Returns:
+            Dictionnaire avec la réponse, les sources, la requête de recherche,
+            les durées de chaque étape (s), degraded (réponse extraite, LLM saturé)
+            et fast_path (réponse rapide, sans le LLM)
+        """
+        state = self.prepare(question, k, session_id, token_budget, fast_path, reask_query)
+        timings = state["timings"]
+        if state["cached"]:
+            self.finish(state, question, state["cached"]["answer"])
+            return {**state["cached"], "search_query": state["search_query"], "cached": True,
+                    "degraded": False, "fast_path": False, "timings": timings}
+        if state.get("fast"):
+            self.finish(state, question, state["fast"])
+            return {
+                "answer": state["fast"],
+                "sources": state["sources"],
+                "search_query": state["search_query"],
+                "cached": False,
+                "degraded": False,
+                "fast_path": True,
+                "timings": timings
+            }
+
+        # Générer la réponse dès qu'une place se libère
+        trace = state["trace"]
+        degraded = False
+        try:
+            with self.scheduler.slot(client_id or session_id, on_queue) as wait:
+                trace.add_time("llm_queue", wait)
+                with trace.span("generation"):
+                    answer = self.llm.invoke(state["prompt"])
+        except SchedulerBusy as busy:
+            answer = self.busy_answer(state, question, busy)
+            degraded = True
+        self.finish(state, question, answer)
+
+        return {
+            "answer": answer,
+            "sources": state["sources"],
+            "search_query": state["search_query"],
+            "cached": False,
+            "degraded": degraded,
+            "fast_path": False,
+            "timings": timings
+        }
+
+    def stream(self, question: str, k: Optional[int] = None, session_id: Optional[str] = None,
+               token_budget: int = CONTEXT_TOKEN_BUDGET, client_id: Optional[str] = None,
+               on_queue: Optional[Callable[[int, float], None]] = None, fast_path: bool = FAST_PATH,
+               reask_query: Optional[str] = None) -> Dict:
+        """
+        Variante de answer qui renvoie les sources dès la fin de la recherche
+        et un itérateur sur les tokens générés par le LLM (l'attente d'une place
+        pour le LLM a lieu à la lecture du premier token)
+
+        Returns:
+            Dictionnaire avec les sources, la requête de recherche, le flux de tokens,
+            fast_path, les durées et degraded (complétés une fois le flux entièrement consommé)
+        """
+        state = self.prepare(question, k, session_id, token_budget, fast_path, reask_query)
+        timings = state["timings"]
+        if state["cached"]:
+            self.finish(state, question, state["cached"]["answer"])
+            return {
+                "stream": iter([state["cached"]["answer"]]),
+                "sources": state["cached"]["sources"],
+                "search_query": state["search_query"],
+                "cached": True,
+                "degraded": False,
+                "fast_path": False,
+                "timings": timings
+            }
+        if state.get("fast"):
+            self.finish(state, question, state["fast"])
+            return {
+                "stream": iter([state["fast"]]),
+                "sources": state["sources"],
+                "search_query": state["search_query"],
+                "cached": False,
+                "degraded": False,
+                "fast_path": True,
+                "timings": timings
+            }
+
+        trace = state["trace"]
+        response = {
+            "sources": state["sources"],
+            "search_query": state["search_query"],
+            "cached": False,
+            "degraded": False,
+            "fast_path": False,
+            "timings": timings
+        }
+
+        def generate():
+            answer = ""
+            try:
+                with self.scheduler.slot(client_id or session_id, on_queue) as wait:
+                    trace.add_time("llm_queue", wait)
+                    generation_start = time.perf_counter()
+                    for token in self.llm.stream(state["prompt"]):
+                        if not answer:
+                            trace.add_time("first_token", trace.elapsed())
+                        answer += token
+                        yield token
+                    trace.add_time("generation", time.perf_counter() - generation_start)
+            except SchedulerBusy as busy:
+                answer = self.busy_answer(state, question, busy)
+                response["degraded"] = True
+                yield answer
+            self.finish(state, question, answer)
+
+        response["stream"] = generate()
+        return response
+
+    def close(self):
+        """Arrête les tâches d'arrière-plan (préchargement des relances) avant la fermeture de la base"""
+        if self.prefetcher:
+            self.prefetcher.close()
+
+    def stats(self) -> Dict:
+        """Compteurs des caches, du préchargement et de la file du LLM (affichés dans l'interface, exposés par l'API et /metrics)"""
+        return {
+            "answer_cache_hits": self.answer_cache.hits,
+            "answer_cache_misses": self.answer_cache.misses,
+            "answer_cache_hit_rate": self.answer_cache.hit_rate,
+            "embedding_cache": self.embeddings.stats(),
+            "llm_scheduler": self.scheduler.stats(),
+            "llm_backends": self.llm.pool.stats(),
+            "embedding_backends": self.embedding_pool.pool.stats(),
+            "prefetch": self.prefetcher.stats() if self.prefetcher else {},
+        }
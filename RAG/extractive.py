@@ -0,0 +1,143 @@
+"""
+Réponses extraites des sources, sans le LLM
+Les phrases des sources qui contiennent le plus de termes de la question sont
+citées, termes en gras, avec le lien vers la page du manuel. Deux usages :
+- réponse rapide : une question de consultation (« Quel est le numéro de la
+  politique sur... ? », « Où trouver le règlement... ? ») dont la meilleure
+  source contient les termes est servie sans appeler le LLM ;
+- repli quand le LLM est saturé (RAG/scheduler.py).
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import re
+from typing import List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from config import FAST_PATH_MIN_COVERAGE
+from lexical_index import tokenize
+
+SENTENCE = re.compile(r"(?<=[.!?;:])\s+|\n+")
+WORD = re.compile(r"\w+(?:[.'’]\w+)*")
+MAX_SENTENCES = 3
+FAST_PATH_SENTENCES = 2
+
+# Questions de consultation : la réponse est un numéro, un titre ou une page du manuel
+LOOKUP_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"\b(num[ée]ro|n°)\b",
+    r"^\W*o[uù]\s+(trouver|consulter|se\s+trouve|sont|est)\b",
+    r"\b(lien|adresse|url)\b",
+    r"^\W*(quel|quelle|quels|quelles)\s+(politique|r[èe]glement|proc[ée]dure|directive|article|section)s?\b",
+    r"^\W*(quel|quelle)\s+est\s+(la|le)\s+(politique|r[èe]glement|proc[ée]dure|directive)\b",
+)]
+# Termes de la consultation elle-même, absents des passages qui y répondent
+LOOKUP_TERMS = {"numero", "trouver", "consulter", "trouve", "lien", "adresse", "url"}
+
+
+def is_lookup(question: str) -> bool:
+    """La question demande un numéro, un titre ou l'emplacement d'un texte du manuel"""
+    return any(pattern.search(question) for pattern in LOOKUP_PATTERNS)
+
+
+def question_terms(question: str) -> Set[str]:
+    """Termes de contenu de la question (sans les termes de la consultation)"""
+    return set(tokenize(question)) - LOOKUP_TERMS
+
+
+def coverage(question: str, text: str) -> float:
+    """
+    Part des termes de la question présents dans un passage ; 0 s'il manque un
+    numéro de la question (« 1.1.3 », « 5 ») : un autre article ne répond pas
+    """
+    terms = question_terms(question)
+    if not terms:
+        return 0.0
+    present = terms & set(tokenize(text))
+    if any(term[0].isdigit() and term not in present for term in terms):
+        return 0.0
+    return len(present) / len(terms)
+
+
+def highlight(text: str, terms: Set[str]) -> str:
+    """Met en gras (Markdown) les mots du texte qui correspondent aux termes"""
+    return WORD.sub(lambda m: f"**{m.group(0)}**" if set(tokenize(m.group(0))) & terms else m.group(0), text)
+
+
+def best_sentences(question: str, sources: List[Document],
+                   max_sentences: int = MAX_SENTENCES) -> List[Tuple[str, Document]]:
+    """
+    Phrases des sources qui recouvrent le mieux la question
+
+    Args:
+        question: La question de l'utilisateur
+        sources: Les sources, de la plus à la moins pertinente
+        max_sentences: Nombre de phrases gardées
+
+    Returns:
+        Liste de (phrase, source), dans l'ordre des sources
+    """
+    query_terms = set(tokenize(question))
+    scored = []
+    for source_rank, doc in enumerate(sources):
+        for position, sentence in enumerate(SENTENCE.split(doc.page_content)):
+            sentence = ' '.join(sentence.lstrip('#').split())
+            if len(sentence) < 20:
+                continue
+            overlap = len(query_terms & set(tokenize(sentence)))
+            if overlap:
+                # À recouvrement égal, la source la mieux classée puis la phrase la plus haute gagnent
+                scored.append((-overlap, source_rank, position, sentence, doc))
+    best = sorted(scored, key=lambda item: item[:3])[:max_sentences]
+    return [(sentence, doc) for _, _, _, sentence, doc in sorted(best, key=lambda item: item[1:3])]
+
+
+def extractive_answer(question: str, sources: List[Document], notice: str = "",
+                      max_sentences: int = MAX_SENTENCES) -> str:
+    """
+    Réponse composée des passages des sources, avec leurs liens
+
+    Args:
+        question: La question de l'utilisateur
+        sources: Les sources, de la plus à la moins pertinente
+        notice: Phrase d'introduction (ex. la raison pour laquelle le LLM n'a pas répondu)
+        max_sentences: Nombre de phrases citées
+
+    Returns:
+        La réponse en Markdown
+    """
+    sentences = best_sentences(question, sources, max_sentences)
+    if not sentences:
+        return (notice + "\n\n" if notice else "") + "Aucun passage du manuel ne correspond à cette question."
+
+    terms = question_terms(question)
+    lines = [notice, ""] if notice else []
+    lines += [f"> {highlight(sentence, terms)}" for sentence, _ in sentences]
+    urls = list(dict.fromkeys(doc.metadata.get('url') for _, doc in sentences if doc.metadata.get('url')))
+    if urls:
+        lines += [""] + [f"Source : {url}" for url in urls]
+    return "\n".join(lines)
+
+
+def fast_path_answer(question: str, sources: List[Document],
+                     min_coverage: float = FAST_PATH_MIN_COVERAGE) -> Optional[str]:
+    """
+    Réponse rapide à une question de consultation, si la meilleure source en contient les termes
+    (recouvrement lexical, pas le score du reclasseur ni de la recherche)
+
+    Args:
+        question: La question (reformulée si c'est une relance)
+        sources: Les sources, de la plus à la moins pertinente
+        min_coverage: Recouvrement lexical minimal : part des termes de la question présents
+            dans la meilleure source
+
+    Returns:
+        L'extrait surligné et son lien, ou None (la question passe par le LLM)
+    """
+    if not sources or not is_lookup(question) or coverage(question, sources[0].page_content) < min_coverage:
+        return None
+    return extractive_answer(question, sources[:1], max_sentences=FAST_PATH_SENTENCES)
@@ -0,0 +1,216 @@
+"""
+Mémoire de conversation du chatbot
+Chaque session garde un résumé glissant de la conversation, mis à jour en
+arrière-plan après chaque réponse, et le dernier échange tel quel. Le prompt
+reste ainsi court quelle que soit la longueur des réponses précédentes.
+
+Les questions de relance (« et pour les étudiants ? ») sont reformulées en
+questions autonomes avant la recherche dans la base vectorielle.
+
+Reformulation et résumé passent par la file du LLM (RAG/scheduler.py) avec une
+attente courte : quand le LLM est saturé, la recherche utilise la question
+telle quelle et le résumé attend l'échange suivant.
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from config import MEMORY_MAX_SESSIONS, MEMORY_SUMMARY_WORDS, QUERY_REWRITING, MEMORY_LLM_MAX_WAIT
+from RAG.context import format_history
+from RAG.scheduler import LLMScheduler, SchedulerBusy
+
+SUMMARY_TEMPLATE = """Tu résumes une conversation entre un utilisateur et l'assistant des politiques de l'UQAC.
+Mets à jour le résumé avec les nouveaux échanges. Garde les sujets, les politiques citées
+et les faits importants, en moins de {max_words} mots. Réponds seulement par le résumé.
+
+Résumé actuel:
+{summary}
+
+Nouveaux échanges:
+{exchanges}
+
+Nouveau résumé:"""
+
+REWRITE_TEMPLATE = """Reformule la dernière question de l'utilisateur en une question autonome,
+compréhensible sans la conversation, pour une recherche dans le manuel de gestion de l'UQAC.
+Réponds seulement par la question reformulée.
+{conversation}
+
+Dernière question: {question}
+
+Question autonome:"""
+
+# Débuts de relance et reprises qui renvoient à la conversation
+FOLLOW_UP = re.compile(
+    r"^\s*(et|mais|ou|alors|donc|aussi|pareil|sinon)\b"
+    r"|qu['’]en est-il"
+    r"|\b(ça|cela|ceci|celle|celles|celui|ceux|même|mêmes|précédent|précédente|dernier|dernière)\b"
+    r"|\b(cette|ce|ces) (politique|règlement|procédure|article|section|directive|cas)s?\b",
+    re.IGNORECASE
+)
+
+
+def is_follow_up(question: str) -> bool:
+    """Indique si la question dépend probablement de la conversation"""
+    return len(question.split()) <= 4 or bool(FOLLOW_UP.search(question))
+
+
+def format_exchanges(turns: List[Dict]) -> str:
+    return "".join(f"Q: {turn['question']}\nR: {turn['answer']}\n\n" for turn in turns)
+
+
+class ConversationMemory:
+    """Résumé glissant et derniers échanges d'une session"""
+
+    def __init__(self, session_id: Optional[str] = None):
+        self.session_id = session_id  # Place de la session dans la file du LLM
+        self.summary = ""
+        self.pending: List[Dict] = []  # Échanges pas encore intégrés au résumé
+        self.last_turn: Optional[Dict] = None
+        self.summarizing = False
+        self.lock = threading.Lock()
+
+    def is_empty(self) -> bool:
+        with self.lock:
+            return self.last_turn is None
+
+    def snapshot(self) -> Tuple[str, List[Dict]]:
+        """Résumé et échanges pas encore résumés (dont le dernier), du plus ancien au plus récent"""
+        with self.lock:
+            turns = self.pending + ([self.last_turn] if self.last_turn else [])
+            return self.summary, turns
+
+
+class ConversationMemoryStore:
+    """Mémoires des sessions en cours (LRU), résumées par le LLM dans un thread d'arrière-plan"""
+
+    def __init__(self, llm, max_sessions: int = MEMORY_MAX_SESSIONS,
+                 rewrite_queries: bool = QUERY_REWRITING, scheduler: Optional[LLMScheduler] = None,
+                 max_wait: float = MEMORY_LLM_MAX_WAIT):
+        self.llm = llm
+        self.scheduler = scheduler  # File du LLM partagée avec les réponses (None : appels directs)
+        self.max_wait = max_wait
+        self.max_sessions = max_sessions
+        self.rewrite_queries = rewrite_queries
+        self._sessions: "OrderedDict[str, ConversationMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory")
+
+    def get(self, session_id: str) -> ConversationMemory:
+        """Mémoire de la session (créée au besoin)"""
+        with self._lock:
+            memory = self._sessions.get(session_id)
+            if memory is None:
+                memory = self._sessions[session_id] = ConversationMemory(session_id)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session_id)
+            return memory
+
+    def forget(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def invoke(self, memory: ConversationMemory, prompt: str) -> str:
+        """
+        Appel au LLM dans la file partagée, avec une attente courte
+
+        Raises:
+            SchedulerBusy: si aucune place ne se libère dans max_wait
+        """
+        if self.scheduler is None:
+            return self.llm.invoke(prompt)
+        with self.scheduler.slot(memory.session_id, max_wait=self.max_wait):
+            return self.llm.invoke(prompt)
+
+    def record(self, memory: ConversationMemory, question: str, answer: str):
+        """
+        Enregistre un échange : il devient le dernier échange, et le précédent
+        est intégré au résumé en arrière-plan
+
+        Args:
+            memory: La mémoire de la session
+            question: La question de l'utilisateur
+            answer: La réponse générée
+        """
+        with memory.lock:
+            if memory.last_turn:
+                memory.pending.append(memory.last_turn)
+            memory.last_turn = {"question": question, "answer": answer}
+            if not memory.pending or memory.summarizing:
+                return
+            memory.summarizing = True
+        self._executor.submit(self._summarize, memory)
+
+    def _summarize(self, memory: ConversationMemory):
+        """Intègre les échanges en attente au résumé, jusqu'à ce qu'il n'en reste plus"""
+        while True:
+            with memory.lock:
+                summary, turns = memory.summary, list(memory.pending)
+                if not turns:
+                    memory.summarizing = False
+                    return
+            try:
+                new_summary = self.invoke(memory, SUMMARY_TEMPLATE.format(
+                    max_words=MEMORY_SUMMARY_WORDS,
+                    summary=summary or "(vide)",
+                    exchanges=format_exchanges(turns)
+                )).strip()
+            except SchedulerBusy as e:
+                # LLM saturé : l'ancien résumé est gardé, les échanges seront résumés au suivant
+                print(f" Résumé de conversation reporté (LLM saturé : {e})")
+                with memory.lock:
+                    memory.summarizing = False
+                return
+            except Exception as e:
+                # Les échanges restent en attente, repris tels quels dans le prompt
+                print(f" Résumé de conversation impossible: {e}")
+                with memory.lock:
+                    memory.summarizing = False
+                return
+            with memory.lock:
+                memory.summary = new_summary
+                del memory.pending[:len(turns)]
+
+    def rewrite_query(self, memory: ConversationMemory, question: str) -> str:
+        """
+        Reformule une question de relance en requête de recherche autonome
+
+        Args:
+            memory: La mémoire de la session
+            question: La question de l'utilisateur
+
+        Returns:
+            La requête à utiliser pour la recherche (la question si elle est déjà autonome)
+        """
+        if not self.rewrite_queries or memory.is_empty() or not is_follow_up(question):
+            return question
+
+        summary, turns = memory.snapshot()
+        try:
+            rewritten = self.invoke(memory, REWRITE_TEMPLATE.format(
+                conversation=format_history(turns[-1:], 300, summary=summary),
+                question=question
+            ))
+        except SchedulerBusy as e:
+            # Pas d'attente sur le chemin de la réponse : recherche avec la question telle quelle
+            print(f" Reformulation sautée (LLM saturé : {e})")
+            return question
+        except Exception as e:
+            print(f" Reformulation impossible: {e}")
+            rewritten = ""
+
+        rewritten = rewritten.strip().splitlines()[0].strip(' "«»') if rewritten.strip() else ""
+        if not rewritten or len(rewritten) > 3 * len(question) + 200:
+            # Réponse inutilisable : la question précédente donne le sujet à la recherche
+            return f"{turns[-1]['question']} {question}"
+        return rewritten
@@ -0,0 +1,244 @@
+"""
+Préchargement des sources des questions de relance
+Après chaque réponse, un thread d'arrière-plan récupère dans Chroma les
+passages voisins des sources citées : sections adjacentes de la même page
+(pages adjacentes d'un PDF) et pages voisines dans la même rubrique du manuel
+(article précédent et suivant). Ils sont gardés, avec leurs embeddings, pour la
+session. À la question suivante, les passages préchargés les plus proches de la
+question servent de candidats sans recherche vectorielle ni BM25, si le meilleur
+est assez similaire et qu'ils contiennent les termes et numéros de la question ;
+sinon (changement de sujet), la recherche complète a lieu.
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import posixpath
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+from langchain_core.documents import Document
+
+from config import (MEMORY_MAX_SESSIONS, PREFETCH_RADIUS, PREFETCH_MAX_CHUNKS, PREFETCH_MIN_SIMILARITY,
+                    PREFETCH_MIN_COVERAGE)
+from RAG.answer_cache import collection_fingerprint
+from RAG.extractive import coverage
+
+SITE_MAP_PAGE_SIZE = 1000  # Métadonnées lues par requête pour le plan du site
+
+
+def natural_key(url: str) -> List:
+    """Clé de tri qui range article-2 avant article-10"""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", url)]
+
+
+def rubric(url: str) -> str:
+    """Rubrique d'une page : le chemin de son dossier parent"""
+    return posixpath.dirname(urlparse(url).path.rstrip("/"))
+
+
+def position(metadata: Dict) -> Tuple[int, int]:
+    """Position d'un passage dans sa page : (page du PDF, section)"""
+    return int(metadata.get('page') or 0), int(metadata.get('section') or 0)
+
+
+class SessionPrefetch:
+    """Passages voisins des dernières sources d'une session et leurs embeddings normalisés"""
+
+    def __init__(self, documents: List[Document], vectors: np.ndarray):
+        self.documents = documents
+        self.vectors = vectors
+
+
+class SourcePrefetcher:
+    """Voisinages préchargés des sessions en cours (LRU), calculés dans un thread d'arrière-plan"""
+
+    def __init__(self, vectorstore, persist_directory: Path, radius: int = PREFETCH_RADIUS,
+                 max_chunks: int = PREFETCH_MAX_CHUNKS, max_sessions: int = MEMORY_MAX_SESSIONS,
+                 min_similarity: float = PREFETCH_MIN_SIMILARITY, min_coverage: float = PREFETCH_MIN_COVERAGE):
+        """
+        Args:
+            vectorstore: La base Chroma du chatbot
+            persist_directory: Dossier de la base (empreinte de la collection)
+            radius: Sections, pages de PDF et pages de la rubrique gardées de part et d'autre d'une source
+            max_chunks: Nombre maximal de passages préchargés par session
+            max_sessions: Sessions gardées (les moins récentes sont oubliées)
+            min_similarity: Similarité cosinus minimale du meilleur passage préchargé
+            min_coverage: Part minimale des termes de la question présents dans les passages servis
+        """
+        self.vectorstore = vectorstore
+        self.persist_directory = persist_directory
+        self.radius = radius
+        self.max_chunks = max_chunks
+        self.max_sessions = max_sessions
+        self.min_similarity = min_similarity
+        self.min_coverage = min_coverage
+        self.hits = 0  # Relances servies par le voisinage préchargé, sans recherche
+        self.misses = 0  # Voisinage prêt mais insuffisant (changement de sujet) : recherche complète
+        self.pending = 0  # Question posée avant la fin du préchargement
+        self._sessions: "OrderedDict[str, Future]" = OrderedDict()
+        self._rubrics: Dict[str, List[str]] = {}  # Rubrique -> pages, dans l'ordre du manuel
+        self._fingerprint = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+
+    def schedule(self, session_id: str, sources: List[Document]):
+        """Précharge en arrière-plan le voisinage des sources d'une réponse (remplace le précédent)"""
+        if not sources:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            future = self._executor.submit(self._prefetch, list(sources))
+            self._sessions[session_id] = future
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def forget(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def close(self):
+        """Annule les préchargements en attente ; celui en cours se termine sans résultat"""
+        with self._lock:
+            self._closed = True
+            self._sessions.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _site_map(self) -> Dict[str, List[str]]:
+        """Pages de chaque rubrique, relues dans Chroma après chaque réindexation"""
+        fingerprint = collection_fingerprint(self.vectorstore, self.persist_directory)
+        if fingerprint != self._fingerprint:
+            # Lecture par pages : seules les URL sont gardées
+            urls = set()
+            collection = self.vectorstore._collection
+            for offset in range(0, collection.count(), SITE_MAP_PAGE_SIZE):
+                page = collection.get(include=["metadatas"], limit=SITE_MAP_PAGE_SIZE, offset=offset)
+                urls.update(metadata.get('url') for metadata in page["metadatas"])
+            rubrics: Dict[str, List[str]] = {}
+            for url in sorted(filter(None, urls), key=natural_key):
+                rubrics.setdefault(rubric(url), []).append(url)
+            self._rubrics, self._fingerprint = rubrics, fingerprint
+        return self._rubrics
+
+    def neighbour_pages(self, url: str) -> List[str]:
+        """Pages voisines d'une page dans sa rubrique (article précédent et suivant...)"""
+        pages = self._site_map().get(rubric(url), [])
+        if url not in pages:
+            return []
+        index = pages.index(url)
+        return [page for page in pages[max(0, index - self.radius):index + self.radius + 1] if page != url]
+
+    def _prefetch(self, sources: List[Document]) -> Optional[SessionPrefetch]:
+        """
+        Récupère dans Chroma le voisinage des sources
+
+        Returns:
+            Les passages voisins (sections adjacentes des pages citées d'abord), ou None
+        """
+        if self._closed:
+            return None
+        try:
+            cited: Dict[str, List[Tuple[int, int]]] = {}
+            for doc in sources:
+                if doc.metadata.get('url'):
+                    cited.setdefault(doc.metadata['url'], []).append(position(doc.metadata))
+            neighbours = [page for url in cited for page in self.neighbour_pages(url) if page not in cited]
+            neighbours = list(dict.fromkeys(neighbours))
+
+            result = self.vectorstore._collection.get(
+                where={"url": {"$in": list(cited) + neighbours}},
+                include=["documents", "metadatas", "embeddings"]
+            )
+        except Exception as e:
+            if not self._closed:  # Base fermée avec le moteur : rien à signaler
+                print(f" Préchargement des sources impossible: {e}")
+            return None
+
+        near, around = [], []
+        for text, metadata, vector in zip(result["documents"], result["metadatas"], result["embeddings"]):
+            url = metadata.get('url')
+            if url in cited:
+                page, section = position(metadata)
+                # Même section ou section adjacente ; pour un PDF, pages adjacentes
+                if any(abs(page - p) <= self.radius and (page != p or abs(section - s) <= self.radius)
+                       for p, s in cited[url]):
+                    near.append((text, metadata, vector))
+            else:
+                around.append((text, metadata, vector))
+
+        # Les pages voisines sont parcourues dans l'ordre, début de page d'abord
+        around.sort(key=lambda item: (neighbours.index(item[1]['url']), position(item[1]),
+                                      item[1].get('start_index', 0)))
+        kept = (near + around)[:self.max_chunks]
+        if not kept:
+            return None
+        vectors = np.asarray([vector for _, _, vector in kept], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return SessionPrefetch([Document(page_content=text, metadata=metadata) for text, metadata, _ in kept],
+                               vectors / np.where(norms == 0, 1, norms))
+
+    def candidates(self, session_id: Optional[str], question: str, question_vector: List[float],
+                   n: int) -> Optional[List[Document]]:
+        """
+        Candidats d'une relance pris dans le voisinage préchargé de la session, sans recherche
+
+        Args:
+            session_id: Session de l'utilisateur
+            question: La question (termes et numéros qui doivent figurer dans les passages)
+            question_vector: Embedding de la question
+            n: Nombre de candidats
+
+        Returns:
+            Les n passages préchargés les plus proches de la question, ou None s'il n'y
+            a pas de voisinage prêt ou s'il ne couvre pas la question (recherche complète)
+        """
+        with self._lock:
+            future = self._sessions.get(session_id) if session_id else None
+            if future is None:
+                return None
+            if not future.done():
+                self.pending += 1
+                return None
+        prefetch = None if future.cancelled() else future.result()
+        if prefetch is None:
+            return None
+
+        vector = np.asarray(question_vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        scores = prefetch.vectors @ (vector / norm if norm else vector)
+        ranked = list({prefetch.documents[i].page_content: prefetch.documents[i]
+                       for i in np.argsort(-scores)}.values())[:n]
+        covered = (float(scores.max()) >= self.min_similarity and
+                   coverage(question, " ".join(doc.page_content for doc in ranked)) >= self.min_coverage)
+        with self._lock:
+            if covered:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return ranked if covered else None
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "hits": self.hits,
+                "misses": self.misses,
+                "pending": self.pending,
+                "hit_rate": self.hit_rate,
+            }
@@ -9,11 +9,14 @@ from pathlib import Path
 root_path = Path(__file__).parent.parent
 sys.path.insert(0, str(root_path))
 
-from langchain_chroma import Chroma
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_ollama import OllamaLLM, OllamaEmbeddings
+import uuid
+
 import streamlit as st
-from config import EMBEDDING_MODEL, PERSIST_DIRECTORY, LLM_MODEL
+from config import EMBEDDING_MODEL, LLM_MODEL, RAG_API_URL, CONTEXT_TOKEN_BUDGET, FAST_PATH
+from RAG.client import RemoteRAGEngine
+from RAG.engine import RAGEngine
+from RAG.scheduler import SchedulerBusy
+from telemetry import format_breakdown
 
 
 # ========================
@@ -26,12 +29,14 @@ st.caption("Posez vos questions sur les politiques et règlements de l'UQAC")
 # Sidebar pour les paramètres
 with st.sidebar:
     st.header("⚙️ Paramètres")
-    k_sources = st.slider(
-        "Nombre de sources à consulter",
-        min_value=1,
-        max_value=10,
-        value=4,
-        help="Plus de sources = plus de contexte mais temps de réponse plus long"
+    token_budget = st.slider(
+        "Taille du contexte (tokens)",
+        min_value=300,
+        max_value=4000,
+        value=CONTEXT_TOKEN_BUDGET,
+        step=100,
+        help="Les sources les plus pertinentes sont gardées tant qu'elles tiennent dans ce budget. "
+             "Plus de contexte = réponses plus complètes mais temps de réponse plus long"
     )
 
     use_memory = st.checkbox(
@@ -40,9 +45,16 @@ with st.sidebar:
         help="Le chatbot se souviendra des questions précédentes"
     )
 
+    fast_path = st.checkbox(
+        "Réponses rapides",
+        value=FAST_PATH,
+        help="Une question de consultation (numéro, lien, « où trouver... ») reçoit directement "
+             "le passage du manuel qui y répond, sans attendre le LLM"
+    )
+
     if st.button("🗑️ Effacer l'historique"):
         st.session_state.messages = []
-        st.session_state.conversation_context = []
+        st.session_state.session_id = uuid.uuid4().hex  # Nouvelle mémoire côté moteur
         st.rerun()
 
 # ========================
@@ -50,99 +62,76 @@ with st.sidebar:
 # ========================
 @st.cache_resource
 def init_components():
-    """Initialise les composants (embeddings, vectorstore, LLM)"""
-    embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL)
-    vectorstore = Chroma(
-        persist_directory=PERSIST_DIRECTORY,
-        embedding_function=embeddings
-    )
-    llm = OllamaLLM(model=LLM_MODEL, temperature=0.2)
-    return embeddings, vectorstore, llm
+    """Initialise le moteur RAG (local, ou service distant si RAG_API_URL est défini)"""
+    if RAG_API_URL:
+        return RemoteRAGEngine(RAG_API_URL)
+    return RAGEngine()
 
-embeddings, vectorstore, llm = init_components()
+engine = init_components()
 
 # ========================
 # 3. FONCTION RAG AVEC MÉMOIRE
 # ========================
-def get_rag_response(question: str, k: int = 4, use_memory: bool = True):
+def get_session_id(use_memory: bool):
+    """Identifiant de la mémoire de conversation tenue par le moteur (None si la mémoire est désactivée)"""
+    if use_memory and "session_id" in st.session_state:
+        return st.session_state.session_id
+    return None
+
+
+def stream_rag_response(question: str, token_budget: int = CONTEXT_TOKEN_BUDGET, use_memory: bool = True,
+                        on_queue=None, fast_path: bool = FAST_PATH, reask_query: str = None):
     """
-    Génère une réponse en utilisant RAG avec mémoire contextuelle optionnelle
+    Génère une réponse en flux en utilisant RAG avec mémoire contextuelle optionnelle :
+    les sources sont disponibles dès la fin de la recherche, puis les tokens
+    arrivent au fil de la génération du LLM
 
     Args:
         question: La question de l'utilisateur
-        k: Nombre de documents sources à récupérer
+        token_budget: Nombre de tokens de sources dans le prompt
+        use_memory: Tient compte des échanges précédents de la session
+        on_queue: Appelée avec (position, attente estimée en s) tant que la question attend le LLM
+        fast_path: Permet la réponse rapide, sans le LLM
+        reask_query: Requête de recherche de la question reposée (réponse complète d'une
+            réponse rapide) : ni reformulée, ni enregistrée deux fois dans la mémoire
 
     Returns:
-       Dictionnaire avec le contexte et les sources
+       Dictionnaire avec les sources et le flux de tokens de la réponse
     """
+    return engine.stream(question, session_id=get_session_id(use_memory), token_budget=token_budget,
+                         client_id=st.session_state.session_id, on_queue=on_queue, fast_path=fast_path,
+                         reask_query=reask_query)
 
-    # Récupérer les documents pertinents
-    retriever = vectorstore.as_retriever(search_kwargs={"k": k})
-    source_docs = retriever.invoke(question)
-
-    # Construire le contexte depuis les sources
-    context = "\n\n".join([
-        f"[Source {i + 1}]\n{doc.page_content}"
-        for i, doc in enumerate(source_docs)
-    ])
-
-    # Construire l'historique de conversation
-    conversation_history = ""
-    if use_memory and "conversation_context" in st.session_state:
-        recent_exchanges = st.session_state.conversation_context[-3:]  # 3 derniers échanges
-        if recent_exchanges:
-            conversation_history = "\n\nHistorique récent de la conversation:\n"
-            for exchange in recent_exchanges:
-                conversation_history += f"Q: {exchange['question']}\n"
-                conversation_history += f"R: {exchange['answer']}\n\n"
-
-    # Créer le prompt avec ou sans mémoire
-    if use_memory and conversation_history:
-        template = """Tu es un assistant spécialisé dans les politiques et procédures de l'UQAC.
-                    Réponds en te basant sur le contexte fourni et l'historique de la conversation.
-                    Si l'information n'est pas dans le contexte, dis-le clairement.
-                    
-                    {conversation_history}
-                    
-                    Contexte actuel:
-                    {context}
-                    
-                    Question actuelle: {question}
-                    
-                    Réponse:
-        """
-        prompt = ChatPromptTemplate.from_template(template)
-        chain_input = {
-            "context": context,
-            "question": question,
-            "conversation_history": conversation_history
-        }
-    else:
-        template = """Tu es un assistant spécialisé dans les politiques de l'UQAC.
-                    Réponds en te basant uniquement sur le contexte fourni.
-                    Si l'information n'est pas dans le contexte, dis-le clairement.
-                    
-                    Contexte:
-                    {context}
-                    
-                    Question: {question}
-                    
-                    Réponse:
-        """
-        prompt = ChatPromptTemplate.from_template(template)
-        chain_input = {
-            "context": context,
-            "question": question
-        }
-
-    # Générer la réponse
-    formatted_prompt = prompt.format(**chain_input)
-    answer = llm.invoke(formatted_prompt)
-
-    return {
-        "answer": answer,
-        "sources": source_docs
-    }
+
+def display_timings(timings):
+    """Durées de chaque étape de la réponse (recherche, prompt, génération...)"""
+    if timings:
+        st.caption(f"⏱️ {format_breakdown(timings)}")
+
+
+def display_sources(sources, search_query: str = None, timings=None):
+    """
+    Affiche les sources consultées dans un expander
+
+    Returns:
+        L'expander, pour y ajouter les durées une fois la réponse générée
+    """
+    expander = st.expander(f"📚 {len(sources)} sources consultées")
+    with expander:
+        display_timings(timings)
+        if search_query:
+            st.caption(f"🔎 Question reformulée pour la recherche : {search_query}")
+        for i, doc in enumerate(sources, 1):
+            url = doc.metadata.get('url', 'N/A')
+            page = doc.metadata.get('page')
+
+            st.markdown(f"{i}. {url} (page {page})" if page else f"{i}. {url}")
+
+            # Afficher un extrait du contenu
+            preview = doc.page_content[:200].replace('\n', ' ')
+            st.text(f"Extrait : {preview}...")
+            st.divider()
+    return expander
 
 # ========================
 # 4. INITIALISATION DE LA SESSION
@@ -150,86 +139,105 @@ def get_rag_response(question: str, k: int = 4, use_memory: bool = True):
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-if "conversation_context" not in st.session_state:
-    st.session_state.conversation_context = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 # ========================
 # 5. AFFICHAGE DE L'HISTORIQUE
 # ========================
-for message in st.session_state.messages:
+for index, message in enumerate(st.session_state.messages):
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
         # Afficher les sources si disponibles
         if message["role"] == "assistant" and "sources" in message:
-            with st.expander(f"📚 {len(message['sources'])} sources consultées"):
-                for i, doc in enumerate(message["sources"], 1):
-                    url = doc.metadata.get('url', 'N/A')
-
-                    st.markdown(f"{i}. {url}")
-
-                    # Afficher un extrait du contenu
-                    preview = doc.page_content[:200].replace('\n', ' ')
-                    st.text(f"*Extrait : {preview}...*")
-                    st.divider()
+            display_sources(message["sources"], message.get("search_query"), message.get("timings"))
+
+        # Réponse rapide : la réponse générée par le LLM reste disponible sur demande
+        if message.get("fast_path"):
+            st.caption("⚡ Réponse rapide : passage du manuel, sans reformulation")
+        if message.get("fast_path") and not message.get("full_requested"):
+            if st.button("✍️ Réponse complète", key=f"full-{index}",
+                         help="Reformuler la réponse avec le LLM à partir des sources"):
+                message["full_requested"] = True
+                # Même recherche que la réponse rapide : la question n'est pas traitée comme une relance
+                st.session_state.full_answer_request = (message["question"],
+                                                        message.get("search_query") or message["question"])
+                st.rerun()
 
 # ========================
 # 6. ENTRÉE UTILISATEUR
 # ========================
-if prompt := st.chat_input("Votre question sur le manuel de gestion..."):
+prompt = st.chat_input("Votre question sur le manuel de gestion...")
+requested = st.session_state.pop("full_answer_request", None)
+if prompt or requested:
+    question, reask_query = (prompt, None) if prompt else requested
 
-    # Afficher la question de l'utilisateur
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    with st.chat_message("user"):
-        st.markdown(prompt)
+    # Afficher la question de l'utilisateur (déjà affichée si c'est la réponse complète d'une réponse rapide)
+    if prompt:
+        st.session_state.messages.append({"role": "user", "content": prompt})
+        with st.chat_message("user"):
+            st.markdown(prompt)
 
     # Générer et afficher la réponse
     with st.chat_message("assistant"):
-        with st.spinner("🔍 Recherche dans le manuel de gestion..."):
-            result = get_rag_response(prompt, k=k_sources, use_memory=use_memory)
-            answer = result["answer"]
-            sources = result["sources"]
-
-            # Afficher la réponse
-            st.markdown(answer)
+        answer_placeholder = st.empty()
 
-            # Afficher les sources de manière persistante
-            with st.expander(f"📚 {len(sources)} sources consultées"):
-                for i, doc in enumerate(sources, 1):
-                    url = doc.metadata.get('url', 'N/A')
+        def show_queue_position(position: int, estimated_wait: float):
+            """Position de la question dans la file du LLM, jusqu'au premier token"""
+            ahead = f"{position} question{'s' if position > 1 else ''} avant la vôtre" if position else "bientôt votre tour"
+            answer_placeholder.info(f"⏳ Le chatbot est très sollicité : {ahead} (environ {estimated_wait:.0f}s)")
 
-                    st.markdown(f"{i}. {url}")
-
-                    # Afficher un extrait du contenu
-                    preview = doc.page_content[:200].replace('\n', ' ')
-                    st.text(f"Extrait : {preview}...")
-                    st.divider()
+        with st.spinner("🔍 Recherche dans le manuel de gestion..."):
+            result = stream_rag_response(question, token_budget=token_budget, use_memory=use_memory,
+                                         on_queue=show_queue_position, fast_path=fast_path and not requested,
+                                         reask_query=reask_query)
+            sources = result["sources"]
+            # La requête n'est affichée que si la question a été reformulée
+            search_query = result["search_query"] if result["search_query"] != question else None
+
+        # Les sources s'affichent dès la fin de la recherche, sous la réponse en cours
+        sources_expander = display_sources(sources, search_query)
+
+        # Afficher la réponse au fil des tokens
+        answer = ""
+        try:
+            for token in result["stream"]:
+                answer += token
+                answer_placeholder.markdown(answer + "▌")
+            answer_placeholder.markdown(answer)
+        except SchedulerBusy:
+            answer = "⏳ Le chatbot est très sollicité en ce moment, reposez votre question dans quelques instants."
+            answer_placeholder.warning(answer)
+        with sources_expander:
+            display_timings(result["timings"])
 
     # Sauvegarder la réponse avec les sources dans l'historique
     st.session_state.messages.append({
         "role": "assistant",
         "content": answer,
-        "sources": sources
+        "sources": sources,
+        "search_query": search_query,
+        "timings": dict(result["timings"]),
+        "question": question,
+        "fast_path": result["fast_path"]
     })
-
-    # Mettre à jour le contexte de conversation pour la mémoire
-    st.session_state.conversation_context.append({
-        "question": prompt,
-        "answer": answer
-    })
-
-    # Limiter l'historique contextuel à 5 échanges pour éviter des prompts trop longs
-    if len(st.session_state.conversation_context) > 5:
-        st.session_state.conversation_context = st.session_state.conversation_context[-5:]
+    if result["fast_path"]:
+        st.rerun()  # Affiche le bouton de la réponse complète sous la réponse rapide
 
 # ========================
 # 7. FOOTER AVEC INFOS
 # ========================
 st.divider()
-col1, col2, col3 = st.columns(3)
+col1, col2, col3, col4 = st.columns(4)
 with col1:
     st.metric("🤖 Modèle LLM", LLM_MODEL)
 with col2:
     st.metric("🧠 Modèle Embeddings", EMBEDDING_MODEL)
 with col3:
-    st.metric("💬 Messages", len(st.session_state.messages))
\ No newline at end of file
+    st.metric("💬 Messages", len(st.session_state.messages))
+with col4:
+    stats = engine.stats()
+    st.metric("⚡ Cache des réponses", f"{stats['answer_cache_hit_rate']:.0%}",
+              help=f"{stats['answer_cache_hits']} réponses servies par le cache "
+                   f"sur {stats['answer_cache_hits'] + stats['answer_cache_misses']}")
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+Reclassement des passages récupérés avant la construction du prompt
+La recherche sur-échantillonne des candidats ; le reclasseur les note par lots
+dans un budget de temps fixe, d'après le coût mesuré d'un passage ; la sélection dans le budget de tokens du
+contexte est faite ensuite (RAG/context.py).
+
+Deux reclasseurs :
+- "lexical" : recouvrement pondéré entre les termes de la question et du passage (sans modèle)
+- "cross-encoder" : modèle sentence-transformers sur CPU (dépendance optionnelle)
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from config import RERANKER, RERANK_MODEL, RERANK_BATCH_SIZE, RERANK_TIME_BUDGET
+from lexical_index import tokenize
+
+COST_SMOOTHING = 0.2  # Poids de la dernière mesure dans le coût moyen d'un passage
+
+
+class Reranker:
+    """Interface commune des reclasseurs et coût moyen mesuré de la notation d'un passage"""
+
+    passage_cost: Optional[float] = None  # Secondes par passage, None avant la première mesure
+
+    def prepare(self, query: str, passages: List[str]) -> Any:
+        """Calcul fait une fois sur tous les candidats avant les lots, passé à score (None : aucun)"""
+        return None
+
+    def score(self, query: str, passages: List[str], state: Any = None) -> List[float]:
+        raise NotImplementedError
+
+    def observe(self, passages: int, duration: float):
+        """Met à jour le coût moyen d'un passage après un lot"""
+        cost = duration / max(passages, 1)
+        self.passage_cost = cost if self.passage_cost is None else \
+            self.passage_cost + COST_SMOOTHING * (cost - self.passage_cost)
+
+
+class LexicalReranker(Reranker):
+    """Note chaque passage selon la part des termes de la question qu'il contient"""
+
+    def term_weights(self, query: str, passages: List[str]) -> Dict[str, float]:
+        """Poids des termes de la question : les termes rares parmi les candidats (ex. un numéro d'article) pèsent plus"""
+        query_terms = list(dict.fromkeys(tokenize(query)))  # Ordre fixe : scores reproductibles
+        passage_terms = [set(tokenize(passage)) for passage in passages]
+        n = len(passages)
+        return {
+            term: math.log(1 + n / (1 + sum(term in terms for terms in passage_terms)))
+            for term in query_terms
+        }
+
+    def prepare(self, query: str, passages: List[str]) -> Dict[str, float]:
+        """Poids calculés une fois sur tous les candidats : les scores des lots restent comparables"""
+        return self.term_weights(query, passages)
+
+    def score(self, query: str, passages: List[str], weights: Optional[Dict[str, float]] = None) -> List[float]:
+        """
+        Args:
+            query: La question
+            passages: Les passages à noter
+            weights: Poids des termes calculés par prepare sur tous les candidats (défaut : sur ces passages)
+        """
+        weights = self.term_weights(query, passages) if weights is None else weights
+        if not weights:
+            return [0.0] * len(passages)
+        passage_terms = [set(tokenize(passage)) for passage in passages]
+        total = sum(weights.values()) or 1.0
+        return [sum(w for term, w in weights.items() if term in terms) / total for terms in passage_terms]
+
+
+class CrossEncoderReranker(Reranker):
+    """Cross-encoder sentence-transformers (paires question/passage notées conjointement)"""
+
+    def __init__(self, model_name: str = RERANK_MODEL):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def score(self, query: str, passages: List[str], state: Any = None) -> List[float]:
+        return [float(s) for s in self.model.predict([(query, passage) for passage in passages])]
+
+
+def create_reranker(kind: str = RERANKER):
+    """
+    Crée le reclasseur configuré
+
+    Args:
+        kind: "lexical", "cross-encoder" ou None (pas de reclassement)
+
+    Returns:
+        Le reclasseur, le reclasseur lexical si le modèle n'est pas disponible
+    """
+    if not kind:
+        return None
+    if kind == "cross-encoder":
+        try:
+            return CrossEncoderReranker()
+        except Exception as e:
+            print(f" Cross-encoder indisponible ({e}), reclassement lexical utilisé")
+    return LexicalReranker()
+
+
+def rerank(reranker: Optional[Reranker], query: str, documents: List[Document],
+           batch_size: int = RERANK_BATCH_SIZE, time_budget: float = RERANK_TIME_BUDGET) -> List[Document]:
+    """
+    Reclasse les candidats par lots dans un budget de temps
+
+    Chaque lot, le premier compris, est réduit à ce que le coût mesuré d'un
+    passage permet de noter avant l'échéance. Seul le tout premier appel du
+    reclasseur, sans mesure, note un passage unique pour établir ce coût. Les
+    candidats qui n'ont pas pu être notés à temps gardent leur ordre de
+    recherche, après ceux qui ont été notés.
+
+    Args:
+        reranker: Le reclasseur (None : ordre de recherche conservé)
+        query: La question de l'utilisateur
+        documents: Les candidats dans l'ordre de la recherche
+        batch_size: Nombre de passages notés par appel au reclasseur
+        time_budget: Temps maximal de reclassement par question (s)
+
+    Returns:
+        Les candidats reclassés
+    """
+    if reranker is None or len(documents) < 2:
+        return documents
+
+    deadline = time.perf_counter() + time_budget
+    passages = [doc.page_content for doc in documents]
+    state = reranker.prepare(query, passages)
+    scores: List[float] = []
+    while len(scores) < len(passages):
+        cost = reranker.passage_cost
+        if cost is None:
+            size = 1  # Coût encore inconnu : un seul passage pour le mesurer
+        else:
+            # Pas plus de passages que le temps restant ne permet d'en noter
+            remaining = deadline - time.perf_counter()
+            size = min(batch_size, int(remaining / cost)) if cost > 0 else batch_size
+            if size < 1:
+                break
+        batch = passages[len(scores):len(scores) + size]
+        batch_start = time.perf_counter()
+        scores.extend(reranker.score(query, batch, state))
+        reranker.observe(len(batch), time.perf_counter() - batch_start)
+
+    scored = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+    return [documents[i] for i in scored] + documents[len(scores):]
@@ -0,0 +1,186 @@
+"""
+Ordonnancement des appels au LLM
+Toutes les sessions partagent le même serveur Ollama : sans coordination, une
+pointe de questions le sature et la latence de tout le monde se dégrade en
+même temps. Le planificateur limite le nombre de générations en cours, fait
+attendre les autres dans une file équitable entre sessions (tour à tour, une
+session ne peut pas passer devant les autres en posant plusieurs questions)
+et refuse tout de suite une question dont l'attente estimée dépasse l'objectif
+de latence : le moteur répond alors sans le LLM (RAG/extractive.py).
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from config import LLM_MAX_IN_FLIGHT, LLM_QUEUE_SLO, LLM_MAX_QUEUE, LLM_SERVICE_TIME
+
+SERVICE_TIME_SMOOTHING = 0.2  # Poids de la dernière génération dans la durée moyenne estimée
+
+
+class SchedulerBusy(Exception):
+    """La question n'a pas obtenu de place pour le LLM dans l'objectif de latence"""
+
+    def __init__(self, message: str, estimated_wait: float):
+        super().__init__(message)
+        self.estimated_wait = estimated_wait
+
+
+class Ticket:
+    """Une question en attente d'une place pour le LLM"""
+
+    def __init__(self, client_id: str):
+        self.client_id = client_id
+        self.enqueued_at = time.perf_counter()
+        self.granted = False
+
+
+class LLMScheduler:
+    """Nombre borné de générations simultanées, file équitable entre sessions"""
+
+    def __init__(self, max_in_flight: int = LLM_MAX_IN_FLIGHT, max_queue_wait: float = LLM_QUEUE_SLO,
+                 max_queue: int = LLM_MAX_QUEUE, service_time: float = LLM_SERVICE_TIME):
+        self.max_in_flight = max_in_flight  # Générations envoyées au LLM en même temps
+        self.max_queue_wait = max_queue_wait  # Attente maximale avant de répondre sans le LLM (s)
+        self.max_queue = max_queue  # Questions en attente au-delà desquelles une nouvelle est refusée
+        self.service_time = service_time  # Durée moyenne d'une génération (s), mise à jour en continu
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()  # Session -> questions, dans l'ordre du tour
+        self._anonymous = itertools.count()
+        self._cond = threading.Condition()
+
+    def _service_order(self) -> List[Ticket]:
+        """Ordre de passage des questions en attente : une par session, tour à tour"""
+        order = []
+        queues = [list(q) for q in self._queues.values()]
+        for rank in range(max((len(q) for q in queues), default=0)):
+            order.extend(q[rank] for q in queues if rank < len(q))
+        return order
+
+    def _position(self, ticket: Ticket) -> int:
+        """Nombre de questions qui passeront avant celle-ci"""
+        return self._service_order().index(ticket)
+
+    def estimate_wait(self, position: int) -> float:
+        """Attente estimée (s) d'une question précédée de position autres"""
+        if self.in_flight + position < self.max_in_flight:
+            return 0.0
+        return (position // self.max_in_flight + 1) * self.service_time
+
+    def _grant(self):
+        """Attribue les places libres aux questions suivantes du tour (verrou tenu)"""
+        while self.in_flight < self.max_in_flight and self._queues:
+            client_id, waiting = next(iter(self._queues.items()))
+            ticket = waiting.popleft()
+            # La session passe en fin de tour (ou sort de la file si elle n'attend plus rien)
+            del self._queues[client_id]
+            if waiting:
+                self._queues[client_id] = waiting
+            ticket.granted = True
+            self.in_flight += 1
+            self.admitted += 1
+        self._cond.notify_all()
+
+    def resize(self, max_in_flight: int):
+        """Change le nombre de générations simultanées (ex. un serveur du LLM écarté ou réintégré)"""
+        with self._cond:
+            self.max_in_flight = max(1, max_in_flight)
+            self._grant()
+
+    def _withdraw(self, ticket: Ticket):
+        waiting = self._queues.get(ticket.client_id)
+        if waiting and ticket in waiting:
+            waiting.remove(ticket)
+            if not waiting:
+                del self._queues[ticket.client_id]
+        self._cond.notify_all()  # Les questions suivantes avancent d'une place
+
+    @contextmanager
+    def slot(self, client_id: Optional[str] = None,
+             on_queue: Optional[Callable[[int, float], None]] = None,
+             max_wait: Optional[float] = None) -> Iterator[float]:
+        """
+        Attend une place pour le LLM et la garde pendant la génération
+
+        Args:
+            client_id: Session de l'utilisateur (chaque question anonyme forme sa propre session)
+            on_queue: Appelée avec (position, attente estimée en s) à l'entrée dans la file
+                et à chaque fois que la question avance
+            max_wait: Attente maximale (s), LLM_QUEUE_SLO par défaut
+
+        Yields:
+            Le temps passé dans la file (s)
+
+        Raises:
+            SchedulerBusy: si l'attente estimée ou réelle dépasse max_wait, ou si la file est pleine
+        """
+        max_wait = self.max_queue_wait if max_wait is None else max_wait
+        ticket = Ticket(client_id or f"anonyme-{next(self._anonymous)}")
+        with self._cond:
+            queued = sum(len(q) for q in self._queues.values())
+            estimated = self.estimate_wait(self._fair_position(ticket.client_id))
+            if queued >= self.max_queue or estimated > max_wait:
+                self.rejected += 1
+                raise SchedulerBusy(f"{queued} questions en attente, environ {estimated:.0f}s d'attente",
+                                    estimated)
+            self._queues.setdefault(ticket.client_id, deque()).append(ticket)
+            self._grant()
+
+        reported = None
+        deadline = ticket.enqueued_at + max_wait
+        while True:
+            with self._cond:
+                if ticket.granted:
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._withdraw(ticket)
+                    self.timed_out += 1
+                    raise SchedulerBusy(f"aucune place libérée en {max_wait:g}s", max_wait)
+                position = self._position(ticket)
+                if position == reported:
+                    self._cond.wait(remaining)
+                    continue
+            # Rappel hors du verrou : l'interface peut prendre son temps pour s'afficher
+            reported = position
+            if on_queue:
+                on_queue(position, self.estimate_wait(position))
+
+        start = time.perf_counter()
+        try:
+            yield start - ticket.enqueued_at
+        finally:
+            duration = time.perf_counter() - start
+            with self._cond:
+                self.in_flight -= 1
+                self.service_time += SERVICE_TIME_SMOOTHING * (duration - self.service_time)
+                self._grant()
+
+    def _fair_position(self, client_id: str) -> int:
+        """Position qu'aurait une nouvelle question de cette session dans le tour (verrou tenu)"""
+        rank = len(self._queues.get(client_id, ()))
+        return sum(min(len(q), rank + 1) if other != client_id else rank
+                   for other, q in self._queues.items())
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "queued": sum(len(q) for q in self._queues.values()),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "service_time": self.service_time,
+            }
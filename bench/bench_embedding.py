@@ -0,0 +1,67 @@
+"""
+Benchmark de l'étape d'embedding du scraper contre le serveur Ollama factice
+Compare plusieurs tailles de lot et niveaux de concurrence, avec une part de
+requêtes en erreur pour vérifier les nouvelles tentatives
+
+Utilisation :
+    python bench/bench_embedding.py --chunks 2000 --failure-rate 0.05
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_ollama import OllamaEmbeddings
+
+from bench.stub_ollama import StubOllamaServer
+from config import EMBEDDING_MODEL
+from scrapping.embedding_stage import EmbeddingStage
+
+
+def make_chunks(count: int):
+    return {
+        f"chunk-{i}": Document(
+            page_content=f"Article {i % 50}.{i % 7} : procédure numéro {i} du manuel de gestion de l'UQAC.",
+            metadata={'url': f"https://www.uqac.ca/mgestion/article-{i}/", 'title': f"Article {i}", 'type': 'html'}
+        )
+        for i in range(count)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de l'étape d'embedding")
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--per-item-latency", type=float, default=0.002)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    configurations = [(len(chunks), 1), (32, 1), (32, 4), (64, 8)]
+
+    with StubOllamaServer(args.latency, args.per_item_latency, args.failure_rate) as server:
+        embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL, base_url=server.base_url)
+        print(f" {len(chunks)} chunks, latence {args.latency}s + {args.per_item_latency}s/chunk")
+        print("-" * 50)
+        for batch_size, concurrency in configurations:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                vector_store = Chroma(embedding_function=embeddings, persist_directory=tmp_dir)
+                stage = EmbeddingStage(embeddings, vector_store, batch_size=batch_size,
+                                       concurrency=concurrency, retry_delay=0.05)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stage.run(chunks)
+                duration = time.perf_counter() - start
+                stored = vector_store._collection.count()
+            print(f" lot={batch_size:>5} concurrence={concurrency}: {duration:6.2f} s, "
+                  f"{len(chunks) / duration:7.1f} chunks/s, {stored} chunks stockés")
@@ -0,0 +1,77 @@
+"""
+Benchmark de l'ingestion : pipeline par phases (scrape_all, split_by_sections,
+store_data) contre l'ingestion en flux (ingest_streaming), sur la copie locale
+du manuel et le serveur Ollama factice
+
+Utilisation :
+    python bench/bench_ingest.py --sections 8 --articles 12 --per-item-latency 0.05
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+from bench.stub_ollama import StubOllamaServer
+from scrapping.fixture_server import FixtureServer, build_fixture_site
+
+
+def run_mode(mode: str, base_url: str, embeddings_url: str):
+    """Lance une ingestion complète dans une base et un cache d'embeddings vides"""
+    from langchain_ollama import OllamaEmbeddings
+
+    from config import EMBEDDING_MODEL
+    from embedding_cache import CachedEmbeddings
+    from scrapping.scrapper import ManuelScraperPipeline
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pipeline = ManuelScraperPipeline(base_url=base_url, persist_directory=Path(tmp_dir),
+                                         snapshot_directory=Path(tmp_dir) / "snapshot")
+        pipeline.embeddings = CachedEmbeddings(OllamaEmbeddings(model=EMBEDDING_MODEL, base_url=embeddings_url),
+                                               EMBEDDING_MODEL, path=Path(tmp_dir) / "cache.sqlite")
+        tracemalloc.start()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if mode == "flux":
+                pipeline.ingest_streaming(base_url)
+            else:
+                pipeline.scrape_all(base_url)
+                pipeline.split_by_sections()
+                pipeline.store_data()
+        duration = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stored = pipeline.vector_store._collection.count()
+    return duration, peak, stored
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de l'ingestion par phases et en flux")
+    parser.add_argument("--sections", type=int, default=6)
+    parser.add_argument("--articles", type=int, default=8, help="Articles par section")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latence du site par réponse (s)")
+    parser.add_argument("--per-item-latency", type=float, default=0.05, help="Latence par texte embeddé (s)")
+    args = parser.parse_args()
+
+    site = build_fixture_site(args.sections, args.articles)
+    with FixtureServer(site, latency=args.latency) as server, \
+            StubOllamaServer(latency=0.02, per_item_latency=args.per_item_latency) as stub:
+        os.environ["OLLAMA_HOST"] = stub.base_url
+        print(f" {len(site)} documents, latence du site {args.latency}s, "
+              f"embedding {args.per_item_latency}s/chunk")
+        print("-" * 50)
+        results = {}
+        for mode in ("phases", "flux"):
+            duration, peak, stored = run_mode(mode, server.base_url, stub.base_url)
+            results[mode] = duration
+            print(f" {mode:>7}: {duration:6.2f} s, pic mémoire {peak / 1e6:6.1f} Mo, {stored} chunks stockés")
+        print(f" Gain: x{results['phases'] / results['flux']:.2f}")
@@ -0,0 +1,267 @@
+"""
+Benchmark de la qualité de la recherche et des latences sur un corpus figé
+Rejoue un instantané du corpus (scrapping/snapshot.py) dans une base vide avec
+le serveur Ollama factice, pose une liste fixe de questions dont les sources
+attendues sont connues et mesure recall@k, MRR et les latences (recherche et
+réponse complète). Le résultat JSON peut être comparé à celui d'un autre commit.
+
+Sans --snapshot, l'instantané est construit à partir de la copie locale du manuel
+(scrapping/fixture_server.py), pour laquelle bench/questions.json est écrit.
+
+Utilisation :
+    python bench/bench_retrieval.py --output base.json
+    python bench/bench_retrieval.py --compare base.json          # code de sortie 1 en cas de régression
+    python bench/bench_retrieval.py --snapshot data2/snapshot --questions questions_manuel.json
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import tempfile
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from bench.stub_ollama import StubOllamaServer
+from scrapping.fixture_server import FixtureServer, build_fixture_site
+
+QUESTIONS_PATH = Path(__file__).parent / "questions.json"
+QUALITY_METRICS = ("mrr",)  # Complétées par recall@k
+LATENCY_METRICS = ("retrieval_p95_ms", "end_to_end_p95_ms")
+
+
+def build_fixture_snapshot(directory: Path, sections: int, articles: int):
+    """Crawle la copie locale du manuel et enregistre son instantané"""
+    from scrapping.async_crawler import AsyncCrawler
+    from scrapping.scrapper import HTMLScraper, PDFScraper
+    from scrapping.snapshot import SnapshotStore
+
+    snapshot = SnapshotStore(directory)
+    with FixtureServer(build_fixture_site(sections, articles), latency=0) as server:
+        crawler = AsyncCrawler(HTMLScraper(server.base_url), PDFScraper(),
+                               requests_per_second=1000, snapshot=snapshot)
+        crawler.crawl(server.base_url, 10_000)
+    snapshot.save(complete=crawler.complete)
+
+
+def index_snapshot(snapshot_directory: Path, persist_directory: Path, reparse: bool) -> int:
+    """
+    Découpe et embedde l'instantané dans une base vide (serveur d'embeddings factice)
+
+    Returns:
+        Nombre de chunks indexés
+    """
+    from langchain_ollama import OllamaEmbeddings
+
+    from config import EMBEDDING_MODEL
+    from embedding_cache import CachedEmbeddings
+    from scrapping.scrapper import ManuelScraperPipeline
+
+    pipeline = ManuelScraperPipeline(base_url="", persist_directory=persist_directory,
+                                     snapshot_directory=snapshot_directory)
+    # Cache à part : les vecteurs factices ne doivent pas se mêler à ceux du vrai modèle
+    pipeline.embeddings = CachedEmbeddings(OllamaEmbeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL,
+                                           path=persist_directory / "embedding_cache.sqlite")
+    pipeline.load_snapshot(reparse)
+    # Ordre d'insertion fixe (l'instantané suit l'ordre du crawl concurrent, les lots d'embedding
+    # concurrents finissent dans le désordre) : même index HNSW, mêmes égalités départagées
+    pipeline.scraped_data.sort(key=lambda item: item['url'])
+    pipeline.embedding_concurrency = 1
+    pipeline.split_by_sections()
+    pipeline.store_data()
+    pipeline.build_lexical_index()
+    return pipeline.vector_store._collection.count()
+
+
+def url_path(url: str) -> str:
+    """Chemin d'une URL : les sources attendues ne dépendent pas de l'hôte de l'instantané"""
+    return urlparse(url).path
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def evaluate(engine, questions: List[Dict], ks: List[int], token_budget: int, answers: bool) -> Dict:
+    """
+    Pose chaque question au moteur et mesure la qualité du classement des sources
+
+    Args:
+        engine: Le moteur RAG sur la base du corpus figé
+        questions: Questions et chemins des sources attendues
+        ks: Valeurs de k pour recall@k
+        token_budget: Budget de tokens des sources
+        answers: Génère aussi la réponse complète (latence de bout en bout)
+
+    Returns:
+        Dictionnaire avec les métriques agrégées et le détail par question
+    """
+    from RAG.context import estimate_tokens
+
+    results = []
+    for item in questions:
+        expected = set(item["expected"])
+        start = time.perf_counter()
+        sources = engine.retrieve_sources(item["question"], token_budget=token_budget)
+        retrieval = time.perf_counter() - start
+
+        ranked = list(dict.fromkeys(url_path(doc.metadata.get("url", "")) for doc in sources))
+        ranks = [ranked.index(path) + 1 for path in expected if path in ranked]
+        result = {
+            "question": item["question"],
+            "ranked": ranked[:max(ks)],
+            "first_relevant_rank": min(ranks) if ranks else None,
+            "recall": {k: len([r for r in ranks if r <= k]) / len(expected) for k in ks},
+            "retrieval_ms": retrieval * 1000,
+            "source_tokens": sum(estimate_tokens(doc.page_content) for doc in sources),
+        }
+        if answers:
+            response = engine.answer(item["question"], token_budget=token_budget)
+            result["end_to_end_ms"] = response["timings"]["total"] * 1000
+            result["cached"] = response["cached"]
+        results.append(result)
+
+    count = len(results)
+    retrieval_ms = [r["retrieval_ms"] for r in results]
+    end_to_end_ms = [r["end_to_end_ms"] for r in results if "end_to_end_ms" in r]
+    summary = {f"recall@{k}": sum(r["recall"][k] for r in results) / count for k in ks}
+    summary.update({
+        "mrr": sum(1 / r["first_relevant_rank"] for r in results if r["first_relevant_rank"]) / count,
+        "retrieval_p50_ms": percentile(retrieval_ms, 0.5),
+        "retrieval_p95_ms": percentile(retrieval_ms, 0.95),
+        "end_to_end_p50_ms": percentile(end_to_end_ms, 0.5),
+        "end_to_end_p95_ms": percentile(end_to_end_ms, 0.95),
+        "source_tokens_mean": sum(r["source_tokens"] for r in results) / count,
+    })
+    return {"summary": summary, "questions": results}
+
+
+def run_settings(token_budget: int) -> Dict:
+    """Réglages qui influencent les résultats, enregistrés avec eux"""
+    import config
+
+    names = ("EMBEDDING_MODEL", "LLM_MODEL", "CHUNK_SIZE", "CHUNK_OVERLAP", "STRUCTURED_CHUNKING",
+             "PARENT_CHUNK_SIZE", "CHILD_CHUNK_SIZE", "CHILD_CHUNK_OVERLAP", "HYBRID_RETRIEVAL",
+             "RERANKER", "RERANK_CANDIDATES")
+    settings = {name: getattr(config, name, None) for name in names}
+    settings["token_budget"] = token_budget
+    return settings
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root_path,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float, latency_tolerance: float) -> bool:
+    """
+    Affiche les écarts avec un résultat précédent
+
+    Args:
+        current: Résultat de cette exécution
+        baseline: Résultat de référence (fichier --output d'un autre commit)
+        tolerance: Baisse absolue tolérée des métriques de qualité
+        latency_tolerance: Hausse relative tolérée des latences p95
+
+    Returns:
+        Vrai si aucune métrique ne régresse au-delà des tolérances
+    """
+    print(f"\n Comparaison avec {baseline.get('commit') or 'la référence'}")
+    ok = True
+    quality = [name for name in current["summary"] if name.startswith("recall@")] + list(QUALITY_METRICS)
+    for name, value in current["summary"].items():
+        before = baseline["summary"].get(name)
+        if value is None or before is None:
+            continue
+        regression = ((name in quality and value < before - tolerance) or
+                      (name in LATENCY_METRICS and before > 0 and value > before * (1 + latency_tolerance)))
+        ok = ok and not regression
+        print(f" {name:<20} {before:>10.3f} -> {value:>10.3f} {'  RÉGRESSION' if regression else ''}")
+    return ok
+
+
+if __name__ == "__main__":
+    from config import CONTEXT_TOKEN_BUDGET
+
+    parser = argparse.ArgumentParser(description="Benchmark de la recherche (recall@k, MRR) et des latences")
+    parser.add_argument("--snapshot", type=Path, default=None,
+                        help="Instantané du corpus (défaut : copie locale du manuel)")
+    parser.add_argument("--questions", type=Path, default=QUESTIONS_PATH)
+    parser.add_argument("--sections", type=int, default=6, help="Copie locale : sections du manuel")
+    parser.add_argument("--articles", type=int, default=8, help="Copie locale : articles par section")
+    parser.add_argument("--reparse", action="store_true", help="Réanalyse les HTML/PDF bruts de l'instantané")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--token-budget", type=int, default=CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--skip-answers", action="store_true", help="Ne mesure que la recherche")
+    parser.add_argument("--embedding-latency", type=float, default=0.01, help="Latence du serveur factice (s)")
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--output", type=Path, default=None, help="Fichier JSON du résultat")
+    parser.add_argument("--compare", type=Path, default=None, help="Résultat JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="Baisse tolérée de recall@k et MRR")
+    parser.add_argument("--latency-tolerance", type=float, default=0.25, help="Hausse relative tolérée des p95")
+    args = parser.parse_args()
+
+    import telemetry
+    telemetry.METRICS.log_path = None  # Les traces du benchmark restent hors du journal
+
+    questions = json.loads(args.questions.read_text(encoding="utf-8"))
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            StubOllamaServer(latency=args.embedding_latency, per_item_latency=0,
+                             first_token_latency=args.first_token_latency,
+                             token_latency=args.token_latency) as stub:
+        os.environ["OLLAMA_HOST"] = stub.base_url
+        tmp = Path(tmp_dir)
+        snapshot_directory = args.snapshot
+        if snapshot_directory is None:
+            snapshot_directory = tmp / "snapshot"
+            with contextlib.redirect_stdout(io.StringIO()):
+                build_fixture_snapshot(snapshot_directory, args.sections, args.articles)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            chunks = index_snapshot(snapshot_directory, tmp / "chromadb", args.reparse)
+
+        from RAG.engine import RAGEngine
+        engine = RAGEngine(persist_directory=tmp / "chromadb",
+                           embedding_cache_path=tmp / "chromadb" / "embedding_cache.sqlite")
+        print(f" {len(questions)} questions, {chunks} chunks indexés")
+        evaluation = evaluate(engine, questions, args.k, args.token_budget, not args.skip_answers)
+        engine.close()
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "corpus": str(args.snapshot) if args.snapshot else f"fixture {args.sections}x{args.articles}",
+        "chunks": chunks,
+        "settings": run_settings(args.token_budget),
+        **evaluation,
+    }
+
+    print("-" * 50)
+    for name, value in result["summary"].items():
+        if value is not None:
+            print(f" {name:<20} {value:>10.3f}")
+
+    if args.output:
+        args.output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f" Résultat écrit dans {args.output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if not compare(result, baseline, args.tolerance, args.latency_tolerance):
+            sys.exit(1)
@@ -0,0 +1,370 @@
+"""
+Test de charge du chatbot : utilisateurs simultanés simulés
+Rejoue un journal de questions contre le moteur RAG, avec un nombre donné
+d'utilisateurs simultanés et un débit d'arrivée donné, et mesure le débit
+obtenu, l'attente avant traitement et les latences (p50/p95/p99) de chaque
+étape de la réponse.
+
+Par défaut, un seul moteur partagé par tous les utilisateurs est créé dans le
+processus, comme dans l'interface Streamlit (init_components est mis en cache
+avec st.cache_resource), sur la copie locale du manuel et le serveur Ollama
+factice (latences et nombre de requêtes simultanées du LLM réglables, un ou
+plusieurs serveurs). Avec --api, la charge est envoyée à l'API HTTP
+(RAG/api.py) déjà lancée.
+
+Utilisation :
+    python bench/load_test.py --users 50 --rate 5 --requests 300 --parallel 4
+    python bench/load_test.py --users 20 --think-time 2          # boucle fermée : chaque utilisateur attend sa réponse
+    python bench/load_test.py --users 50 --rate 10 --backends 3 --failure-rate 0.3   # 3 serveurs, le premier défaillant
+    python bench/load_test.py --api http://127.0.0.1:8000 --users 50 --rate 5 --output charge.json
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from bench.bench_retrieval import QUESTIONS_PATH, build_fixture_snapshot, index_snapshot
+from bench.stub_ollama import StubOllamaServer
+from telemetry import percentile
+
+# Étapes mesurées par le harnais (les autres viennent des durées renvoyées par le moteur)
+CLIENT_STAGES = ("queue", "user_first_token", "user_total")
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def load_questions(path: Path) -> List[str]:
+    """
+    Lit le journal de questions
+
+    Args:
+        path: Fichier JSON (liste de questions ou d'objets avec « question »),
+            JSONL ou texte (une question par ligne)
+
+    Returns:
+        Les questions, dans l'ordre du journal
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        items = json.loads(text)
+    elif path.suffix == ".jsonl":
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        items = text.splitlines()
+    questions = [item["question"] if isinstance(item, dict) else item for item in items]
+    return [question.strip() for question in questions if question and question.strip()]
+
+
+def arrival_times(count: int, rate: float, rng: random.Random) -> List[float]:
+    """Instants d'arrivée (s depuis le début) d'un processus de Poisson de débit rate"""
+    times, now = [], 0.0
+    for _ in range(count):
+        times.append(now)
+        now += rng.expovariate(rate)
+    return times
+
+
+class LoadTest:
+    """Envoie les questions au moteur depuis des threads d'utilisateurs simulés"""
+
+    def __init__(self, engine_factory: Callable[[], object], questions: List[str], users: int,
+                 token_budget: int, memory: bool = False):
+        self.engine_factory = engine_factory  # Appelé une fois par utilisateur (le moteur local est partagé)
+        self.questions = questions
+        self.users = users
+        self.token_budget = token_budget
+        self.memory = memory
+        self.results: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def ask(self, engine, user: int, question: str, arrival: float) -> Dict:
+        """
+        Pose une question en flux et mesure ses durées
+
+        Args:
+            engine: RAGEngine ou RemoteRAGEngine
+            user: Numéro de l'utilisateur simulé (identifiant de sa conversation)
+            question: La question
+            arrival: Instant d'arrivée de la question (time.perf_counter)
+
+        Returns:
+            Dictionnaire avec les durées du harnais, celles du moteur et l'erreur éventuelle
+        """
+        start = time.perf_counter()
+        result = {"user": user, "question": question, "queue": start - arrival, "cached": None,
+                  "degraded": None, "fast_path": None, "error": None}
+        try:
+            response = engine.stream(question, session_id=f"charge-{user}" if self.memory else None,
+                                     token_budget=self.token_budget, client_id=f"charge-{user}")
+            tokens = 0
+            for _ in response["stream"]:
+                if not tokens:
+                    result["user_first_token"] = time.perf_counter() - arrival
+                tokens += 1
+            result["cached"] = response["cached"]
+            result["degraded"] = response["degraded"]
+            result["fast_path"] = response["fast_path"]
+            result["tokens"] = tokens
+            result["timings"] = dict(response["timings"])
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["user_total"] = time.perf_counter() - arrival
+        return result
+
+    def record(self, result: Dict):
+        with self._lock:
+            self.results.append(result)
+
+    def run_open(self, count: int, rate: float, rng: random.Random) -> float:
+        """
+        Boucle ouverte : les questions arrivent au débit donné quel que soit l'état du
+        serveur ; une question qui arrive quand tous les utilisateurs sont occupés attend
+
+        Returns:
+            Durée totale du test (s)
+        """
+        pending: "queue.Queue" = queue.Queue()
+        start = time.perf_counter()
+
+        def user_loop(user: int):
+            engine = self.engine_factory()
+            while True:
+                item = pending.get()
+                if item is None:
+                    return
+                question, arrival = item
+                self.record(self.ask(engine, user, question, arrival))
+
+        threads = [threading.Thread(target=user_loop, args=(user,), daemon=True) for user in range(self.users)]
+        for thread in threads:
+            thread.start()
+        for i, offset in enumerate(arrival_times(count, rate, rng)):
+            time.sleep(max(0.0, start + offset - time.perf_counter()))
+            pending.put((self.questions[i % len(self.questions)], start + offset))
+        for _ in threads:
+            pending.put(None)
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+    def run_closed(self, count: int, think_time: float, rng: random.Random) -> float:
+        """
+        Boucle fermée : chaque utilisateur pose sa question suivante après avoir lu
+        la réponse (temps de réflexion tiré selon une loi exponentielle)
+
+        Returns:
+            Durée totale du test (s)
+        """
+        next_index = iter(range(count))
+        index_lock = threading.Lock()
+        start = time.perf_counter()
+
+        def user_loop(user: int):
+            engine = self.engine_factory()
+            user_rng = random.Random(rng.random())
+            while True:
+                with index_lock:
+                    i = next(next_index, None)
+                if i is None:
+                    return
+                self.record(self.ask(engine, user, self.questions[i % len(self.questions)], time.perf_counter()))
+                if think_time:
+                    time.sleep(user_rng.expovariate(1 / think_time))
+
+        threads = [threading.Thread(target=user_loop, args=(user,), daemon=True) for user in range(self.users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+
+def summarize(results: List[Dict], duration: float) -> Dict:
+    """
+    Agrège les mesures du test
+
+    Args:
+        results: Mesures de chaque question (LoadTest.results)
+        duration: Durée totale du test (s)
+
+    Returns:
+        Débit, erreurs, taux de succès du cache de réponses et percentiles (ms)
+        de chaque étape (attente, étapes du moteur, durées vues par l'utilisateur)
+    """
+    succeeded = [r for r in results if not r["error"]]
+    stages: Dict[str, List[float]] = {}
+    for result in succeeded:
+        for stage in CLIENT_STAGES:
+            if stage in result:
+                stages.setdefault(stage, []).append(result[stage])
+        for stage, seconds in result["timings"].items():
+            stages.setdefault(stage, []).append(seconds)
+
+    latencies = {}
+    for stage, values in stages.items():
+        latencies[stage] = {f"p{q * 100:g}": percentile(values, q) * 1000 for q in PERCENTILES}
+        latencies[stage]["max"] = max(values) * 1000
+        latencies[stage]["count"] = len(values)
+
+    errors: Dict[str, int] = {}
+    for result in results:
+        if result["error"]:
+            kind = result["error"].split(":", 1)[0]
+            errors[kind] = errors.get(kind, 0) + 1
+
+    return {
+        "requests": len(results),
+        "succeeded": len(succeeded),
+        "errors": errors,
+        "duration_s": duration,
+        "throughput_rps": len(succeeded) / duration if duration else 0.0,
+        "answer_cache_hit_rate": (sum(1 for r in succeeded if r["cached"]) / len(succeeded)) if succeeded else 0.0,
+        "degraded_rate": (sum(1 for r in succeeded if r["degraded"]) / len(succeeded)) if succeeded else 0.0,
+        "fast_path_rate": (sum(1 for r in succeeded if r["fast_path"]) / len(succeeded)) if succeeded else 0.0,
+        "latency_ms": latencies,
+    }
+
+
+def ollama_waits(stubs: List[StubOllamaServer]) -> Dict[str, List[float]]:
+    """Attentes d'un emplacement libre (s) sur tous les serveurs factices, par modèle"""
+    return {kind: [wait for stub in stubs for wait in stub.wait_times[kind]] for kind in ("embed", "generate")}
+
+
+def print_summary(summary: Dict, offered_rate: Optional[float], stubs: List[StubOllamaServer]):
+    print("-" * 60)
+    offered = f" (offert : {offered_rate:.2f} req/s)" if offered_rate else ""
+    print(f" {summary['succeeded']}/{summary['requests']} réponses en {summary['duration_s']:.1f}s : "
+          f"{summary['throughput_rps']:.2f} req/s{offered}")
+    if summary["errors"]:
+        print(" Erreurs : " + ", ".join(f"{kind} x{count}" for kind, count in summary["errors"].items()))
+    print(f" Réponses servies par le cache : {summary['answer_cache_hit_rate']:.0%}, "
+          f"réponses rapides : {summary['fast_path_rate']:.0%}, "
+          f"extraites sans le LLM (file saturée) : {summary['degraded_rate']:.0%}")
+    print(f"\n {'étape':<20} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'max (ms)':>10}")
+    for stage, values in summary["latency_ms"].items():
+        print(f" {stage:<20} {values['p50']:>10.1f} {values['p95']:>10.1f} {values['p99']:>10.1f} "
+              f"{values['max']:>10.1f}")
+
+    # Attente des requêtes côté Ollama (emplacements --parallel occupés)
+    for kind, waits in ollama_waits(stubs).items():
+        if waits:
+            print(f" {'ollama_' + kind + '_wait':<20} {percentile(waits, 0.5) * 1000:>10.1f} "
+                  f"{percentile(waits, 0.95) * 1000:>10.1f} {percentile(waits, 0.99) * 1000:>10.1f} "
+                  f"{max(waits) * 1000:>10.1f}")
+    if len(stubs) > 1:
+        print("\n Générations par serveur : " + ", ".join(str(stub.generate_count) for stub in stubs))
+
+
+if __name__ == "__main__":
+    from config import CONTEXT_TOKEN_BUDGET
+
+    parser = argparse.ArgumentParser(description="Test de charge du chatbot avec des utilisateurs simultanés")
+    parser.add_argument("--questions", type=Path, default=QUESTIONS_PATH,
+                        help="Journal de questions (.json, .jsonl ou une question par ligne)")
+    parser.add_argument("--users", type=int, default=20, help="Utilisateurs simultanés")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Arrivées par seconde (boucle ouverte) ; absent : boucle fermée")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Boucle fermée : temps de lecture moyen (s)")
+    parser.add_argument("--requests", type=int, default=200, help="Nombre de questions posées")
+    parser.add_argument("--shuffle", action="store_true", help="Mélange le journal de questions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memory", action="store_true", help="Une conversation avec mémoire par utilisateur")
+    parser.add_argument("--no-answer-cache", action="store_true", help="Désactive le cache de réponses")
+    parser.add_argument("--token-budget", type=int, default=CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--api", default=None, help="URL de l'API RAG (au lieu du moteur local)")
+    parser.add_argument("--snapshot", type=Path, default=None,
+                        help="Moteur local : instantané du corpus (défaut : copie locale du manuel)")
+    parser.add_argument("--embedding-latency", type=float, default=0.02, help="Ollama factice : latence (s)")
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--parallel", type=int, default=4,
+                        help="Ollama factice : requêtes simultanées par modèle (0 : illimité)")
+    parser.add_argument("--backends", type=int, default=1,
+                        help="Ollama factice : nombre de serveurs (LLM_ENDPOINTS et EMBEDDING_ENDPOINTS)")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Ollama factice : proportion de requêtes en erreur sur le premier serveur")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Moteur local : générations simultanées (défaut : LLM_MAX_IN_FLIGHT par serveur)")
+    parser.add_argument("--queue-slo", type=float, default=None,
+                        help="Moteur local : attente maximale du LLM (défaut : LLM_QUEUE_SLO)")
+    parser.add_argument("--output", type=Path, default=None, help="Fichier JSON du résultat")
+    args = parser.parse_args()
+
+    import telemetry
+    telemetry.METRICS.log_path = None  # Les traces du test restent hors du journal
+
+    rng = random.Random(args.seed)
+    questions = load_questions(args.questions)
+    if args.shuffle:
+        rng.shuffle(questions)
+
+    with contextlib.ExitStack() as stack:
+        stubs = []
+        if args.api:
+            from RAG.client import RemoteRAGEngine
+            engine_factory = lambda: RemoteRAGEngine(args.api)  # Une session HTTP par utilisateur
+        else:
+            stubs = [stack.enter_context(StubOllamaServer(
+                latency=args.embedding_latency, per_item_latency=0, failure_rate=args.failure_rate if i == 0 else 0,
+                first_token_latency=args.first_token_latency, token_latency=args.token_latency,
+                answer_tokens=args.answer_tokens, parallel=args.parallel)) for i in range(args.backends)]
+            endpoints = [stub.base_url for stub in stubs]
+            os.environ["OLLAMA_HOST"] = stubs[-1].base_url  # Indexation du corpus (serveur sans erreurs)
+            tmp = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+            snapshot_directory = args.snapshot
+            with contextlib.redirect_stdout(io.StringIO()):
+                if snapshot_directory is None:
+                    snapshot_directory = tmp / "snapshot"
+                    build_fixture_snapshot(snapshot_directory, 6, 8)
+                index_snapshot(snapshot_directory, tmp / "chromadb", reparse=False)
+
+            from RAG.engine import RAGEngine
+            shared = RAGEngine(persist_directory=tmp / "chromadb",
+                               embedding_cache_path=tmp / "chromadb" / "embedding_cache.sqlite",
+                               llm_endpoints=endpoints, embedding_endpoints=endpoints)
+            stack.callback(shared.close)  # Avant la suppression du dossier temporaire
+            if args.no_answer_cache:
+                shared.answer_cache.max_entries = 0
+            if args.max_in_flight:
+                shared.scheduler.max_in_flight = args.max_in_flight
+            if args.queue_slo is not None:
+                shared.scheduler.max_queue_wait = args.queue_slo
+            engine_factory = lambda: shared  # Comme st.cache_resource : un moteur pour toutes les sessions
+            for stub in stubs:
+                stub.wait_times = {kind: [] for kind in stub.wait_times}  # Seulement l'attente pendant le test
+
+        mode = f"{args.rate:g} arrivées/s" if args.rate else f"boucle fermée, réflexion {args.think_time:g}s"
+        print(f" {args.requests} questions ({len(questions)} distinctes), {args.users} utilisateurs, {mode}, "
+              f"{'API ' + args.api if args.api else f'moteur local, {args.backends} Ollama factice(s) parallel={args.parallel}'}")
+        test = LoadTest(engine_factory, questions, args.users, args.token_budget, args.memory)
+        if args.rate:
+            duration = test.run_open(args.requests, args.rate, rng)
+        else:
+            duration = test.run_closed(args.requests, args.think_time, rng)
+        summary = summarize(test.results, duration)
+        print_summary(summary, args.rate, stubs)
+
+    if args.output:
+        result = {
+            "settings": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+            **summary,
+            "ollama_wait_ms": {kind: [w * 1000 for w in waits] for kind, waits in ollama_waits(stubs).items()}
+                              if stubs else None,
+            "results": test.results,
+        }
+        args.output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f" Résultat écrit dans {args.output}")
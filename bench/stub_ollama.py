@@ -0,0 +1,227 @@
+"""
+Serveur Ollama factice pour les tests et benchmarks hors réseau / sans GPU
+Implémente l'API d'embeddings d'Ollama (/api/embed et /api/embeddings) et la
+génération (/api/generate, en flux ou non) avec des latences, un taux
+d'erreur et un nombre de requêtes traitées simultanément configurables
+
+Utilisation :
+    python bench/stub_ollama.py --port 11435 --latency 0.05 --token-latency 0.02 --parallel 4
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List
+
+EMBEDDING_DIM = 256
+
+
+def embed_text(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """
+    Embedding déterministe par hachage des mots (sac de mots signé, normalisé)
+    Deux textes qui partagent des mots ont des vecteurs proches, ce qui suffit
+    pour mesurer la recherche sans vrai modèle
+
+    Args:
+        text: Le texte à encoder
+        dim: Dimension du vecteur
+
+    Returns:
+        Le vecteur normalisé
+    """
+    vector = [0.0] * dim
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class StubOllamaServer:
+    """Serveur HTTP en arrière-plan imitant Ollama"""
+
+    def __init__(self, latency: float = 0.02, per_item_latency: float = 0.002,
+                 failure_rate: float = 0.0, first_token_latency: float = 0.2,
+                 token_latency: float = 0.02, answer_tokens: int = 40, parallel: int = 0,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency  # Latence fixe par requête (s)
+        self.per_item_latency = per_item_latency  # Latence ajoutée par texte embeddé (s)
+        self.failure_rate = failure_rate  # Proportion de requêtes en erreur 500
+        self.first_token_latency = first_token_latency  # Temps avant le premier token généré (s)
+        self.token_latency = token_latency  # Temps entre deux tokens générés (s)
+        self.answer_tokens = answer_tokens  # Nombre de tokens par réponse
+        self.parallel = parallel  # Requêtes traitées simultanément par modèle (OLLAMA_NUM_PARALLEL), 0 : illimité
+        # Un modèle d'embedding et un LLM chargés : chacun a ses emplacements, les autres requêtes attendent
+        self._slots = {kind: threading.BoundedSemaphore(parallel) for kind in ("embed", "generate")} if parallel else {}
+        self.wait_times = {"embed": [], "generate": []}  # Attente d'un emplacement libre (s)
+        self.request_count = 0
+        self.embedded_count = 0
+        self.generate_count = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                # Vérification de santé (ollama_pool.py) : liste des modèles, comme Ollama
+                if self.path == "/api/tags":
+                    self._send_json(200, {"models": []})
+                else:
+                    self._send_json(404, {"error": f"route inconnue: {self.path}"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with stub._lock:
+                    stub.request_count += 1
+
+                if random.random() < stub.failure_rate:
+                    self._send_json(500, {"error": "erreur simulée"})
+                    return
+
+                if self.path == "/api/embed":
+                    texts = payload.get("input", [])
+                    if isinstance(texts, str):
+                        texts = [texts]
+                    with stub.slot("embed"):
+                        vectors = stub.embed(texts)
+                    self._send_json(200, {"model": payload.get("model"), "embeddings": vectors})
+                elif self.path == "/api/embeddings":
+                    with stub.slot("embed"):
+                        vectors = stub.embed([payload.get("prompt", "")])
+                    self._send_json(200, {"embedding": vectors[0]})
+                elif self.path == "/api/generate":
+                    with stub.slot("generate"):
+                        self._generate(payload)
+                else:
+                    self._send_json(404, {"error": f"route inconnue: {self.path}"})
+
+            def _generate(self, payload: dict):
+                with stub._lock:
+                    stub.generate_count += 1
+                tokens = stub.answer(payload.get("prompt", ""))
+                final = {"model": payload.get("model"), "response": "", "done": True,
+                         "done_reason": "stop", "prompt_eval_count": len(payload.get("prompt", "").split()),
+                         "eval_count": len(tokens)}
+                time.sleep(stub.first_token_latency)
+
+                if not payload.get("stream", True):
+                    time.sleep(stub.token_latency * (len(tokens) - 1))
+                    self._send_json(200, {**final, "response": "".join(tokens)})
+                    return
+
+                # Flux NDJSON en chunked transfer encoding, comme Ollama
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, token in enumerate(tokens):
+                    if i:
+                        time.sleep(stub.token_latency)
+                    self._write_chunk({"model": payload.get("model"), "response": token, "done": False})
+                self._write_chunk(final)
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, body: dict):
+                data = (json.dumps(body) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _send_json(self, status: int, body: dict):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # Pas de log pour chaque requête
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @contextmanager
+    def slot(self, kind: str) -> Iterator[None]:
+        """Occupe un emplacement du modèle (embed ou generate) et mesure l'attente"""
+        slots = self._slots.get(kind)
+        start = time.perf_counter()
+        if slots:
+            slots.acquire()
+        with self._lock:
+            self.wait_times[kind].append(time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            if slots:
+                slots.release()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency + self.per_item_latency * len(texts))
+        with self._lock:
+            self.embedded_count += len(texts)
+        return [embed_text(text) for text in texts]
+
+    def answer(self, prompt: str) -> List[str]:
+        """Réponse simulée : reprend les premiers mots du contexte du prompt"""
+        context = prompt.split("[Source 1]", 1)[-1]
+        words = re.findall(r"\S+", context)[:self.answer_tokens - 1]
+        return ["Selon le manuel de gestion,"] + [f" {word}" for word in words]
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur Ollama factice")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.02, help="Latence fixe par requête (s)")
+    parser.add_argument("--per-item-latency", type=float, default=0.002, help="Latence par texte embeddé (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Proportion de requêtes en erreur")
+    parser.add_argument("--first-token-latency", type=float, default=0.2, help="Temps avant le premier token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.02, help="Temps entre deux tokens (s)")
+    parser.add_argument("--answer-tokens", type=int, default=40, help="Nombre de tokens par réponse")
+    parser.add_argument("--parallel", type=int, default=0, help="Requêtes simultanées par modèle (0 : illimité)")
+    args = parser.parse_args()
+
+    server = StubOllamaServer(args.latency, args.per_item_latency, args.failure_rate,
+                              args.first_token_latency, args.token_latency, args.answer_tokens,
+                              args.parallel, port=args.port).start()
+    print(f" Ollama factice sur {server.base_url} (Ctrl+C pour arrêter)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
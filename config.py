@@ -7,14 +7,125 @@ from pathlib import Path
 BASE_URL = "https://www.uqac.ca/mgestion/" # URL de base du manuel de gestion
 MAX_PAGES = 250  # Limite pour ne pas surcharger le serveur
 
+# Crawl concurrent (asyncio)
+CONCURRENT_CRAWL = True
+CRAWL_WORKERS = 8  # Nombre maximum de requêtes simultanées
+CRAWL_REQUESTS_PER_SECOND = 4.0  # Budget de politesse par hôte
+
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200  # Chevauchement entre les morceaux
 
+# Découpage structuré (titres du DOM, articles numérotés) : petits chunks enfants embeddés
+# pour la recherche, section parente envoyée une seule fois dans le prompt
+STRUCTURED_CHUNKING = True
+PARENT_CHUNK_SIZE = 1600  # Taille maximale d'une section parente (caractères)
+CHILD_CHUNK_SIZE = 400
+CHILD_CHUNK_OVERLAP = 60
+
 PROJECT_ROOT = Path(__file__).parent
 PERSIST_DIRECTORY = PROJECT_ROOT / "data2" / "chromadb"  # TODO : à modifier au besoin
 PERSIST_DIRECTORY.mkdir(parents=True, exist_ok=True)
 
+# Réindexation incrémentale (requêtes conditionnelles + hash des contenus)
+INCREMENTAL_INDEXING = True
+MANIFEST_FILENAME = "crawl_manifest.json"  # Stocké dans PERSIST_DIRECTORY
+PARENT_STORE_FILENAME = "parents.json"  # Sections parentes du découpage structuré, dans PERSIST_DIRECTORY
+
+# Instantané des documents téléchargés (corps bruts + texte extrait, gzip) pour rejouer
+# le découpage et l'embedding sans réseau (python scrapping/scrapper.py --replay) ; None pour désactiver
+SNAPSHOT_DIRECTORY = PROJECT_ROOT / "data2" / "snapshot"
+
+# Ingestion en flux : crawl, analyse/découpage (pool de processus) et embedding se chevauchent
+STREAMING_INGEST = True
+INGEST_PROCESSES = 4  # Processus d'analyse HTML/PDF et de découpage
+INGEST_QUEUE_SIZE = 256  # Chunks en attente d'embedding au maximum
+PDF_WORKERS = 2  # Processus d'extraction de PDF simultanés (par processus d'analyse)
+PDF_EXTRACTION_TIMEOUT = 60  # Durée maximale d'extraction d'un PDF (s), les pages lues sont gardées
+
+# Recherche hybride : BM25 (construit par le scraper) + vectorielle, fusion par rang réciproque
+HYBRID_RETRIEVAL = True
+BM25_INDEX_FILENAME = "bm25_index.json"  # Stocké dans PERSIST_DIRECTORY
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+
 # Options: nomic-embed-text, mxbai-embed-large, snowflake-arctic-embed
 EMBEDDING_MODEL = "nomic-embed-text"
 
-LLM_MODEL = "llama3.2"
\ No newline at end of file
+# Étape d'embedding du scraper
+EMBEDDING_BATCH_SIZE = 32  # Chunks par requête au serveur d'embeddings
+EMBEDDING_CONCURRENCY = 4  # Requêtes simultanées par serveur d'embeddings
+EMBEDDING_MAX_RETRIES = 3  # Nouvelles tentatives par lot en échec
+
+# Cache persistant des embeddings (clé : modèle + hash du texte)
+EMBEDDING_CACHE_PATH = PROJECT_ROOT / "data2" / "embedding_cache.sqlite"
+EMBEDDING_CACHE_MAX_MB = 512  # Au-delà, les entrées les moins récentes sont supprimées
+
+LLM_MODEL = "llama3.2"
+
+# Serveurs Ollama (ollama_pool.py), partagés par le chatbot et le scraper
+# Liste vide : le serveur local par défaut (variable OLLAMA_HOST)
+LLM_ENDPOINTS = []  # Ex. ["http://gpu1:11434", "http://gpu2:11434"]
+EMBEDDING_ENDPOINTS = []  # Ex. ["http://cpu1:11434", "http://cpu2:11434"]
+OLLAMA_TIMEOUT = 120  # Délai maximal sans réponse d'un serveur (s)
+OLLAMA_MAX_ATTEMPTS = 3  # Serveurs essayés au plus pour une requête
+OLLAMA_EJECT_FAILURES = 3  # Échecs consécutifs avant d'écarter un serveur
+OLLAMA_SLOW_FACTOR = 3  # Serveur écarté si sa latence moyenne dépasse 3 fois la médiane des autres
+OLLAMA_EJECT_TIME = 30  # Durée minimale d'éviction avant réintégration (s)
+OLLAMA_HEALTH_INTERVAL = 10  # Intervalle des vérifications des serveurs (s)
+
+# Reclassement des passages et budget du contexte
+RERANKER = "lexical"  # "lexical", "cross-encoder" (sentence-transformers) ou None
+RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"  # Multilingue, tourne sur CPU
+RERANK_CANDIDATES = 20  # Passages récupérés avant reclassement
+RERANK_BATCH_SIZE = 8  # Passages notés par appel au reclasseur
+RERANK_TIME_BUDGET = 0.3  # Temps maximal de reclassement par question (s)
+CONTEXT_TOKEN_BUDGET = 1200  # Tokens de sources injectés dans le prompt
+HISTORY_TOKEN_BUDGET = 400  # Tokens de mémoire de conversation (résumé + dernier échange) dans le prompt
+
+# Mémoire de conversation du chatbot
+QUERY_REWRITING = True  # Reformule les questions de relance avant la recherche
+MEMORY_SUMMARY_WORDS = 120  # Longueur visée du résumé glissant
+MEMORY_MAX_SESSIONS = 256  # Sessions gardées en mémoire (les moins récentes sont oubliées)
+MEMORY_LLM_MAX_WAIT = 2  # Attente maximale d'une place du LLM pour reformuler ou résumer (s) ; au-delà, étape sautée
+
+# Cache sémantique des réponses du chatbot
+ANSWER_CACHE_THRESHOLD = 0.95  # Similarité cosinus minimale entre deux questions
+ANSWER_CACHE_TTL = 24 * 3600  # Durée de vie d'une réponse (s)
+ANSWER_CACHE_MAX_ENTRIES = 256
+
+# Ordonnancement des appels au LLM (RAG/scheduler.py), partagé par toutes les sessions
+LLM_MAX_IN_FLIGHT = 2  # Générations envoyées à chaque serveur du LLM en même temps (comme OLLAMA_NUM_PARALLEL)
+LLM_QUEUE_SLO = 20  # Attente maximale d'une place (s) ; au-delà, réponse sans le LLM
+LLM_MAX_QUEUE = 64  # Questions en attente au-delà desquelles une nouvelle est refusée tout de suite
+LLM_SERVICE_TIME = 8  # Durée estimée d'une génération (s) avant les premières mesures
+LLM_BUSY_FALLBACK = True  # LLM saturé : passages extraits des sources (sinon refus, HTTP 503 pour l'API)
+
+# Réponse rapide : une question de consultation (numéro, lien, « où trouver... ») dont la
+# meilleure source contient les termes reçoit l'extrait surligné, sans appel au LLM
+FAST_PATH = True  # Valeur par défaut ; l'utilisateur peut demander la réponse complète
+# Recouvrement lexical de la meilleure source (part des termes de la question qu'elle contient, tous
+# les numéros compris) ; ce n'est pas un score de pertinence du reclasseur ni de la recherche
+FAST_PATH_MIN_COVERAGE = 0.8
+
+# Préchargement des sources des relances (RAG/prefetch.py) : après chaque réponse, les passages
+# voisins des sources citées sont récupérés en arrière-plan ; la question suivante de la session
+# est servie par ces passages, sans recherche vectorielle ni BM25, s'ils la couvrent
+PREFETCH = True
+PREFETCH_RADIUS = 1  # Sections (pages d'un PDF, pages de la rubrique) de part et d'autre d'une source
+PREFETCH_MAX_CHUNKS = 200  # Passages préchargés au plus par session
+PREFETCH_MIN_SIMILARITY = 0.5  # Similarité cosinus minimale du meilleur passage préchargé
+PREFETCH_MIN_COVERAGE = 0.6  # Part minimale des termes de la question présents dans les passages servis
+
+# Durées par étape (chatbot et ingestion) : journal JSONL + métriques Prometheus (GET /metrics)
+TELEMETRY_ENABLED = True
+TELEMETRY_LOG_PATH = PROJECT_ROOT / "data2" / "telemetry.jsonl"
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  # Histogrammes (s)
+
+# API HTTP du chatbot (RAG/api.py)
+RAG_API_HOST = "127.0.0.1"
+RAG_API_PORT = 8000
+RAG_API_WORKERS = 8  # Requêtes traitées simultanément
+RAG_API_MAX_K = RERANK_CANDIDATES  # Nombre maximal de sources demandées par requête
+RAG_API_TOKEN_BUDGET_RANGE = (100, 4000)  # Budget de tokens de sources accepté par requête (min, max)
+RAG_API_URL = None  # Ex. "http://127.0.0.1:8000" : l'interface Streamlit utilise alors l'API
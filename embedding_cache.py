@@ -0,0 +1,135 @@
+"""
+Cache persistant des embeddings (SQLite)
+Évite de recalculer les vecteurs déjà obtenus avec le même modèle, aussi
+bien pour le scraper que pour les questions du chatbot
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from config import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_MB
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Enveloppe un modèle d'embeddings (ex. OllamaEmbeddings) avec un cache
+    sur disque indexé par (modèle, hash du texte), avec éviction LRU quand
+    la taille du cache dépasse la limite
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str,
+                 path: Path = EMBEDDING_CACHE_PATH, max_mb: float = EMBEDDING_CACHE_MAX_MB):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()  # Le cache est partagé entre threads (scraper, sessions Streamlit)
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, model TEXT, vector BLOB, size INTEGER, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode('utf-8')).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embedde une liste de textes en ne calculant que ceux absents du cache
+
+        Args:
+            texts: Les textes à encoder
+
+        Returns:
+            Les vecteurs, dans le même ordre que les textes
+        """
+        keys = [self._key(text) for text in texts]
+        cached = self._lookup(keys)
+
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            # Un même texte peut apparaître plusieurs fois dans le lot
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            vectors = self.embeddings.embed_documents(unique)
+            computed = {self._key(text): vector for text, vector in zip(unique, vectors)}
+            self._store(computed)
+            cached.update(computed)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> Dict[str, float]:
+        """Compteurs du cache (succès, échecs, taux de succès, taille en Mo)"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size_mb': self._size / (1024 * 1024),
+        }
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):  # Limite de variables SQLite
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array('f', blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, vectors: Dict[str, List[float]]):
+        now = time.time()
+        rows = []
+        for key, vector in vectors.items():
+            blob = array('f', vector).tobytes()
+            rows.append((key, self.model, blob, len(blob), now))
+        with self._lock:
+            for key, _, _, size, _ in rows:
+                previous = self._conn.execute("SELECT size FROM embeddings WHERE key = ?", (key,)).fetchone()
+                self._size += size - (previous[0] if previous else 0)
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées jusqu'à repasser sous la limite"""
+        while self._size > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_used LIMIT 256"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self._size -= size
+                if self._size <= self.max_bytes:
+                    break
@@ -0,0 +1,154 @@
+"""
+Index lexical BM25 du manuel de gestion
+Construit par le scraper à côté de la base Chroma et interrogé par le chatbot
+en complément de la recherche vectorielle (fusion par rang réciproque).
+Retrouve les numéros exacts (« politique 1.1.3 », « article 5.2 ») que les
+embeddings rapprochent mal.
+"""
+import json
+import math
+import re
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from langchain_core.documents import Document
+
+from config import BM25_K1, BM25_B, RRF_K
+
+# Mots vides du français (sans accents, après normalisation)
+STOPWORDS = set("""
+a au aux avec ce ces cet cette dans de des du elle en et eux il ils je la le les leur leurs lui ma mais me meme mes
+moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos votre vous
+c d j l m n s t y est sont ete etre avoir a ont sera quel quelle quels quelles comment quoi dont
+""".split())
+
+ELISION = re.compile(r"\b(?:l|d|j|m|n|s|t|c|qu|lorsqu|puisqu|jusqu)['’]")
+TOKEN = re.compile(r"\d+(?:\.\d+)*|[a-z]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Découpe un texte français en termes pour BM25
+
+    - minuscules, accents retirés, élisions supprimées (l', d', qu'...)
+    - les numéros d'articles restent entiers (« 1.1.3 », « 5.2 »)
+    - mots vides retirés, pluriels simples ramenés au singulier
+
+    Args:
+        text: Le texte à découper
+
+    Returns:
+        Liste des termes
+    """
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = ELISION.sub(' ', text)
+    terms = []
+    for token in TOKEN.findall(text):
+        if token in STOPWORDS:
+            continue
+        if not token[0].isdigit() and len(token) > 3 and token[-1] in 'sx':
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+class BM25Index:
+    """Index BM25 en mémoire, sauvegardé en JSON"""
+
+    def __init__(self, documents: List[Document], term_frequencies: List[Dict[str, int]]):
+        self.documents = documents
+        self.term_frequencies = term_frequencies
+        self.lengths = [sum(tf.values()) for tf in term_frequencies]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+        # Index inversé : terme -> [(document, fréquence)]
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_index, tf in enumerate(term_frequencies):
+            for term, count in tf.items():
+                self.postings.setdefault(term, []).append((doc_index, count))
+
+    @classmethod
+    def build(cls, documents: List[Document]) -> "BM25Index":
+        """Construit l'index à partir des chunks"""
+        return cls(documents, [dict(Counter(tokenize(doc.page_content))) for doc in documents])
+
+    @classmethod
+    def from_vector_store(cls, vector_store) -> "BM25Index":
+        """Construit l'index à partir de tout le contenu de la collection Chroma"""
+        data = vector_store._collection.get(include=["documents", "metadatas"])
+        documents = [
+            Document(page_content=content, metadata=metadata or {})
+            for content, metadata in zip(data["documents"], data["metadatas"])
+        ]
+        return cls.build(documents)
+
+    def search(self, query: str, k: int = 4) -> List[Document]:
+        """
+        Cherche les chunks les plus pertinents pour la requête
+
+        Args:
+            query: La question de l'utilisateur
+            k: Nombre de résultats
+
+        Returns:
+            Les chunks triés par score BM25 décroissant
+        """
+        scores: Dict[int, float] = {}
+        n_docs = len(self.documents)
+        for term in dict.fromkeys(tokenize(query)):  # Ordre fixe : scores (et égalités) reproductibles
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_index, count in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_index] / self.avg_length)
+                scores[doc_index] = scores.get(doc_index, 0.0) + idf * count * (BM25_K1 + 1) / (count + norm)
+
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [self.documents[i] for i in best]
+
+    def save(self, path: Path):
+        """Écrit l'index sur disque (écriture atomique)"""
+        path = Path(path)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump([
+                {"content": doc.page_content, "metadata": doc.metadata, "tf": tf}
+                for doc, tf in zip(self.documents, self.term_frequencies)
+            ], f, ensure_ascii=False)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        return cls(
+            [Document(page_content=e["content"], metadata=e["metadata"]) for e in entries],
+            [e["tf"] for e in entries]
+        )
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int, rrf_k: int = RRF_K) -> List[Document]:
+    """
+    Fusionne plusieurs classements (vectoriel, lexical) par rang réciproque
+
+    Args:
+        result_lists: Les classements à fusionner
+        k: Nombre de résultats à garder
+        rrf_k: Constante de lissage de la fusion
+
+    Returns:
+        Les k meilleurs chunks, sans doublons
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            key = doc.page_content  # Deux chunks identiques sont fusionnés
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+            documents.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in best]
@@ -0,0 +1,316 @@
+"""
+Répartition des appels à Ollama sur plusieurs serveurs
+config.py peut lister plusieurs serveurs pour le LLM (LLM_ENDPOINTS) et pour
+les embeddings (EMBEDDING_ENDPOINTS). Chaque requête part vers le serveur qui
+a le moins de travail en cours ; un serveur qui échoue plusieurs fois de suite,
+qui ne répond plus ou qui devient beaucoup plus lent que les autres est écarté,
+la requête est retentée sur un autre serveur et un thread vérifie
+régulièrement (GET /api/tags) quand le serveur écarté peut être réintégré.
+Le même pool sert le chatbot et le scraper.
+
+Utilisation :
+    python ollama_pool.py        # état des serveurs configurés
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent
+sys.path.insert(0, str(root_path))
+
+import os
+import statistics
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+import requests
+from langchain_core.embeddings import Embeddings
+from langchain_ollama import OllamaEmbeddings, OllamaLLM
+
+from config import (EMBEDDING_MODEL, LLM_MODEL, LLM_ENDPOINTS, EMBEDDING_ENDPOINTS, OLLAMA_TIMEOUT,
+                    OLLAMA_MAX_ATTEMPTS, OLLAMA_EJECT_FAILURES, OLLAMA_SLOW_FACTOR, OLLAMA_EJECT_TIME,
+                    OLLAMA_HEALTH_INTERVAL)
+
+DEFAULT_HOST = "http://127.0.0.1:11434"
+LATENCY_SMOOTHING = 0.2  # Poids de la dernière mesure dans la latence moyenne d'un serveur
+MIN_LATENCY_SAMPLES = 5  # Mesures avant de juger un serveur trop lent
+
+
+def endpoint_url(endpoint: Optional[str]) -> str:
+    """URL d'un serveur (None : serveur par défaut d'Ollama, variable OLLAMA_HOST)"""
+    url = endpoint or os.environ.get("OLLAMA_HOST") or DEFAULT_HOST
+    if "://" not in url:
+        url = f"http://{url}"
+    return url.rstrip("/")
+
+
+def is_unreachable(error: Exception) -> bool:
+    """Le serveur n'a pas pu être joint (refus de connexion, délai dépassé...)"""
+    return isinstance(error, (ConnectionError, httpx.TransportError, requests.ConnectionError))
+
+
+class Backend:
+    """Un serveur Ollama et ses compteurs"""
+
+    def __init__(self, endpoint: Optional[str], client):
+        self.endpoint = endpoint
+        self.client = client
+        self.outstanding = 0.0  # Travail en cours : textes à embedder, générations
+        # Latence moyenne (s) par type de mesure, jamais mélangés : "call" (durée d'une requête
+        # par unité de travail) et "stream" (délai du premier élément d'une réponse en flux)
+        self.latency: Dict[str, float] = {}
+        self.samples: Dict[str, int] = {}
+        self.failures = 0  # Échecs consécutifs
+        self.healthy = True
+        self.ejected_at = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def url(self) -> str:
+        return endpoint_url(self.endpoint)
+
+
+class BackendPool:
+    """Clients d'un même modèle sur plusieurs serveurs : répartition, éviction et nouvelles tentatives"""
+
+    def __init__(self, endpoints: Sequence[Optional[str]], factory: Callable[[Optional[str]], object], kind: str,
+                 max_attempts: int = OLLAMA_MAX_ATTEMPTS, health_interval: float = OLLAMA_HEALTH_INTERVAL):
+        """
+        Args:
+            endpoints: URL des serveurs (vide : le serveur par défaut d'Ollama)
+            factory: Crée le client LangChain d'un serveur
+            kind: Nom du pool dans les messages ("LLM", "embeddings")
+            max_attempts: Serveurs essayés au plus pour une requête
+            health_interval: Intervalle des vérifications (s)
+        """
+        self.kind = kind
+        self.backends = [Backend(endpoint, factory(endpoint)) for endpoint in (list(endpoints) or [None])]
+        self.max_attempts = max_attempts
+        self.health_interval = health_interval
+        self.on_health_change: Optional[Callable[[int], None]] = None  # Reçoit le nombre de serveurs en service
+        self._lock = threading.Lock()
+        if len(self.backends) > 1:
+            # Un seul serveur n'est jamais écarté : rien à vérifier
+            threading.Thread(target=self._health_loop, daemon=True, name=f"ollama-{kind}").start()
+
+    @property
+    def size(self) -> int:
+        return len(self.backends)
+
+    def healthy_count(self) -> int:
+        return sum(backend.healthy for backend in self.backends)
+
+    def _health_changed(self):
+        """Prévient l'abonné (ex. le planificateur du LLM) d'une éviction ou d'une réintégration (verrou tenu)"""
+        if self.on_health_change:
+            self.on_health_change(self.healthy_count())
+
+    def _acquire(self, tried: List[Backend], weight: float) -> Backend:
+        """Réserve le serveur disponible qui a le moins de travail en cours"""
+        with self._lock:
+            candidates = [b for b in self.backends if b not in tried]
+            # Tous les serveurs restants sont écartés : on tente quand même celui écarté depuis le plus longtemps
+            available = [b for b in candidates if b.healthy] or sorted(candidates, key=lambda b: b.ejected_at)[:1]
+            backend = min(available, key=lambda b: (b.outstanding, b.requests))
+            backend.outstanding += weight
+            backend.requests += 1
+            return backend
+
+    def _release(self, backend: Backend, weight: float, latency: Optional[float] = None,
+                 error: Optional[Exception] = None, metric: str = "call"):
+        """
+        Libère le serveur et met à jour sa santé
+
+        Args:
+            backend: Le serveur réservé par _acquire
+            weight: Le travail réservé
+            latency: La mesure (None : requête interrompue, pas de mesure)
+            error: L'erreur de la requête, s'il y en a une
+            metric: Type de mesure ("call" ou "stream") : seules les mesures du même type sont comparées
+        """
+        with self._lock:
+            backend.outstanding -= weight
+            if error is not None:
+                backend.errors += 1
+                backend.failures += 1
+                if is_unreachable(error) or backend.failures >= OLLAMA_EJECT_FAILURES:
+                    self._eject(backend, f"{type(error).__name__}: {error}")
+                return
+            backend.failures = 0
+            if latency is None:
+                return
+            previous = backend.latency.get(metric)
+            average = latency if previous is None else previous + LATENCY_SMOOTHING * (latency - previous)
+            backend.latency[metric] = average
+            backend.samples[metric] = backend.samples.get(metric, 0) + 1
+
+            # Beaucoup plus lent que les autres serveurs en service, pour le même type de mesure : écarté
+            others = [b.latency[metric] for b in self.backends
+                      if b is not backend and b.healthy and b.samples.get(metric, 0) >= MIN_LATENCY_SAMPLES]
+            if backend.samples[metric] >= MIN_LATENCY_SAMPLES and others and \
+                    average > OLLAMA_SLOW_FACTOR * statistics.median(others):
+                self._eject(backend, f"{average * 1000:.0f} ms par requête ({metric}), "
+                                     f"médiane des autres {statistics.median(others) * 1000:.0f} ms")
+
+    def _eject(self, backend: Backend, reason: str):
+        """Écarte un serveur (verrou tenu) ; le dernier serveur en service est gardé"""
+        if not backend.healthy or not any(b.healthy for b in self.backends if b is not backend):
+            return
+        backend.healthy = False
+        backend.ejected_at = time.monotonic()
+        print(f" {self.kind} : serveur {backend.url} écarté ({reason})")
+        self._health_changed()
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            self.check_health()
+
+    def check_health(self):
+        """Vérifie chaque serveur : écarte ceux qui ne répondent plus, réintègre ceux rétablis"""
+        for backend in self.backends:
+            try:
+                requests.get(f"{backend.url}/api/tags", timeout=min(self.health_interval, 5)).raise_for_status()
+                alive = True
+            except requests.RequestException as e:
+                alive, reason = False, str(e)
+            with self._lock:
+                if not alive:
+                    self._eject(backend, f"vérification : {reason}")
+                elif not backend.healthy and time.monotonic() - backend.ejected_at >= OLLAMA_EJECT_TIME:
+                    # Nouvelle chance : les mesures repartent de zéro
+                    backend.healthy = True
+                    backend.failures = 0
+                    backend.latency.clear()
+                    backend.samples.clear()
+                    print(f" {self.kind} : serveur {backend.url} réintégré")
+                    self._health_changed()
+
+    def call(self, fn: Callable[[object], object], weight: float = 1.0):
+        """
+        Exécute une requête sur le serveur le moins chargé, puis sur un autre en cas d'échec
+
+        Args:
+            fn: Reçoit le client LangChain du serveur et fait la requête
+            weight: Travail de la requête (ex. nombre de textes à embedder)
+
+        Returns:
+            Le résultat de fn
+
+        Raises:
+            Exception: l'erreur du dernier serveur essayé
+        """
+        tried: List[Backend] = []
+        while True:
+            backend = self._acquire(tried, weight)
+            start = time.perf_counter()
+            try:
+                result = fn(backend.client)
+            except Exception as e:
+                self._release(backend, weight, error=e)
+                tried.append(backend)
+                if len(tried) >= min(self.max_attempts, self.size):
+                    raise
+                print(f" {self.kind} : échec sur {backend.url} ({type(e).__name__}), nouvel essai sur un autre serveur")
+                continue
+            self._release(backend, weight, latency=(time.perf_counter() - start) / max(weight, 1))
+            return result
+
+    def stream(self, fn: Callable[[object], Iterator], weight: float = 1.0) -> Iterator:
+        """
+        Variante de call pour une réponse en flux : un autre serveur n'est essayé que
+        si l'échec survient avant le premier élément ; la latence mesurée est celle
+        du premier élément
+
+        Yields:
+            Les éléments du flux
+        """
+        tried: List[Backend] = []
+        while True:
+            backend = self._acquire(tried, weight)
+            start = time.perf_counter()
+            first_item: Optional[float] = None
+            finished = False
+            error = None
+            try:
+                for item in fn(backend.client):
+                    if first_item is None:
+                        first_item = time.perf_counter() - start
+                    yield item
+                finished = True
+                return
+            except Exception as e:
+                error = e
+                tried.append(backend)
+                if first_item is not None or len(tried) >= min(self.max_attempts, self.size):
+                    raise
+                print(f" {self.kind} : échec sur {backend.url} ({type(e).__name__}), nouvel essai sur un autre serveur")
+            finally:
+                # Flux abandonné par le lecteur : le serveur est libéré sans mesure
+                self._release(backend, weight, latency=first_item if finished else None, error=error,
+                              metric="stream")
+
+    def stats(self) -> List[Dict]:
+        """Compteurs de chaque serveur (exposés par l'API)"""
+        with self._lock:
+            return [{
+                "url": backend.url,
+                "healthy": backend.healthy,
+                "outstanding": backend.outstanding,
+                "requests": backend.requests,
+                "errors": backend.errors,
+                "latency_ms": {metric: latency * 1000 for metric, latency in backend.latency.items()},
+            } for backend in self.backends]
+
+
+class PooledEmbeddings(Embeddings):
+    """OllamaEmbeddings réparti sur les serveurs d'embeddings"""
+
+    def __init__(self, model: str = EMBEDDING_MODEL, endpoints: Sequence[str] = EMBEDDING_ENDPOINTS):
+        self.model = model
+        self.pool = BackendPool(
+            endpoints,
+            lambda endpoint: OllamaEmbeddings(model=model, base_url=endpoint,
+                                              client_kwargs={"timeout": OLLAMA_TIMEOUT}),
+            "embeddings"
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.pool.call(lambda client: client.embed_documents(texts), weight=len(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.pool.call(lambda client: client.embed_query(text))
+
+
+class PooledLLM:
+    """OllamaLLM réparti sur les serveurs du LLM (mêmes méthodes invoke et stream)"""
+
+    def __init__(self, model: str = LLM_MODEL, endpoints: Sequence[str] = LLM_ENDPOINTS, temperature: float = 0.2):
+        self.model = model
+        self.pool = BackendPool(
+            endpoints,
+            lambda endpoint: OllamaLLM(model=model, temperature=temperature, base_url=endpoint,
+                                       client_kwargs={"timeout": OLLAMA_TIMEOUT}),
+            "LLM"
+        )
+
+    def invoke(self, prompt: str) -> str:
+        return self.pool.call(lambda client: client.invoke(prompt))
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        return self.pool.stream(lambda client: client.stream(prompt))
+
+
+if __name__ == "__main__":
+    for kind, endpoints in (("LLM", LLM_ENDPOINTS), ("embeddings", EMBEDDING_ENDPOINTS)):
+        print(f"\n {kind} :")
+        for endpoint in list(endpoints) or [None]:
+            url = endpoint_url(endpoint)
+            try:
+                requests.get(f"{url}/api/tags", timeout=5).raise_for_status()
+                print(f"  {url:<40} en service")
+            except requests.RequestException as e:
+                print(f"  {url:<40} hors service ({e})")
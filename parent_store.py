@@ -0,0 +1,71 @@
+"""
+Sections parentes du découpage structuré
+Les chunks enfants ne gardent dans leurs métadonnées que la clé de leur section
+(url, page, section) : le texte de chaque section est stocké une seule fois,
+dans un fichier JSON écrit par le scraper à côté de la base Chroma, et relu par
+le chatbot pour remplacer les enfants trouvés par leur section.
+"""
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+
+def section_key(metadata: Dict) -> str:
+    """Clé d'une section dans son document : « page:section » (sans page pour le HTML)"""
+    page = metadata.get('page')
+    return f"{'' if page is None else page}:{metadata.get('section', 0)}"
+
+
+class ParentStore:
+    """Texte des sections parentes de chaque document, par URL puis par (page, section)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, str]] = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def get(self, metadata: Dict) -> Optional[str]:
+        """Texte de la section d'un chunk, None s'il n'a pas de section parente"""
+        return self.entries.get(metadata.get('url'), {}).get(section_key(metadata))
+
+    def detach(self, url: str, chunks: List[Document]) -> List[Document]:
+        """
+        Enregistre les sections d'un document découpé (elles remplacent les
+        précédentes) et les retire des métadonnées de ses chunks
+
+        Args:
+            url: L'URL du document
+            chunks: Ses chunks ('parent' : texte de leur section, ajouté par split_structured)
+
+        Returns:
+            Les chunks, sans 'parent' dans leurs métadonnées
+        """
+        sections = {}
+        detached = []
+        for chunk in chunks:
+            metadata = dict(chunk.metadata)
+            parent = metadata.pop('parent', None)
+            if parent is not None:
+                sections[section_key(metadata)] = parent
+            detached.append(Document(page_content=chunk.page_content, metadata=metadata))
+        if sections:
+            self.entries[url] = sections
+        else:
+            self.entries.pop(url, None)
+        return detached
+
+    def remove(self, url: str):
+        """Oublie les sections d'un document retiré de l'index"""
+        self.entries.pop(url, None)
+
+    def save(self):
+        """Écrit les sections sur disque (écriture atomique)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        tmp_path.replace(self.path)
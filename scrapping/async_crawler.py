@@ -0,0 +1,225 @@
+"""
+Crawler asynchrone pour le Manuel de Gestion UQAC
+Télécharge plusieurs pages en parallèle (pool borné de requêtes) tout en
+respectant un budget de requêtes par seconde pour chaque hôte
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import asyncio
+from concurrent.futures import Executor
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+from config import CRAWL_WORKERS, CRAWL_REQUESTS_PER_SECOND
+from scrapping.frontier import CrawlFrontier
+from scrapping.manifest import http_validators, not_modified, fetch_failed, is_gone
+from telemetry import timed
+
+
+class HostRateLimiter:
+    """Espace les requêtes envoyées à un même hôte (remplace le time.sleep global)"""
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_slot = {}  # hôte -> prochain instant autorisé
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url: str):
+        """
+        Attend que l'hôte de l'URL puisse recevoir une nouvelle requête
+
+        Args:
+            url: L'URL qui va être téléchargée
+        """
+        host = urlparse(url).netloc
+        loop = asyncio.get_running_loop()
+
+        # Réserve un créneau sous verrou, puis attend hors du verrou
+        async with self._lock:
+            now = loop.time()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AsyncCrawler:
+    """
+    Parcours en largeur concurrent du site
+
+    Un pool de workers puise en continu dans la frontière (FIFO) : chaque lien
+    découvert y est ajouté dès que sa page est analysée, sans attendre la fin
+    d'un niveau, et les CRAWL_WORKERS requêtes restent occupées même quand une
+    page ou un PDF est lent. Sans limite de pages, l'ensemble des documents
+    visités est le même que celui du parcours séquentiel de scrape_all (l'ordre
+    des documents suit l'ordre de fin des téléchargements).
+
+    Pour l'ingestion en flux, l'analyse peut être confiée à un pool de processus
+    (parse + executor) et chaque document transmis dès qu'il est prêt
+    (on_document) au lieu d'être accumulé.
+    """
+
+    def __init__(self, html_scraper, pdf_scraper,
+                 workers: int = CRAWL_WORKERS,
+                 requests_per_second: float = CRAWL_REQUESTS_PER_SECOND,
+                 manifest=None,
+                 parse: Optional[Callable[[str, bytes], Tuple[Dict, List[str]]]] = None,
+                 executor: Optional[Executor] = None,
+                 on_document: Optional[Callable[[Dict], Awaitable[None]]] = None,
+                 snapshot=None,
+                 trace=None):
+        self.html_scraper = html_scraper
+        self.pdf_scraper = pdf_scraper
+        self.workers = workers
+        self.requests_per_second = requests_per_second
+        self.manifest = manifest  # Si présent : requêtes conditionnelles
+        self.parse = parse or self._parse  # (url, corps) -> (document, liens)
+        self.executor = executor  # Pool où l'analyse est faite (None : threads par défaut)
+        self.on_document = on_document  # Si présent : reçoit chaque document au lieu de la liste
+        self.snapshot = snapshot  # Si présent : corps bruts et textes extraits enregistrés
+        self.trace = trace  # Si présent : durées des téléchargements (et de l'analyse hors processus)
+        self.complete = False  # Vrai si la frontière a été entièrement parcourue
+
+    def crawl(self, start_url: str, max_pages: int) -> List[Dict[str, str]]:
+        """
+        Lance le crawl concurrent
+
+        Args:
+            start_url: URL de départ
+            max_pages: Nombre maximum de pages à scraper
+
+        Returns:
+            Liste des documents collectés (vide si les documents sont transmis à on_document)
+        """
+        return asyncio.run(self._crawl(start_url, max_pages))
+
+    async def _crawl(self, start_url: str, max_pages: int) -> List[Dict[str, str]]:
+        rate_limiter = HostRateLimiter(self.requests_per_second)
+        pool = asyncio.Semaphore(self.workers)
+        scraped_data = []
+        frontier = CrawlFrontier([start_url])
+        progress = {'visited': 0, 'collected': 0, 'in_flight': 0}
+        # Réveille les workers en attente quand la frontière s'allonge ou que le dernier en cours finit
+        changed = asyncio.Condition()
+
+        async def worker(session: aiohttp.ClientSession):
+            while True:
+                async with changed:
+                    # Une frontière vide n'est épuisée que si aucune page en cours ne peut l'allonger
+                    await changed.wait_for(lambda: (frontier and progress['visited'] < max_pages)
+                                           or not progress['in_flight'])
+                    if not frontier or progress['visited'] >= max_pages:
+                        changed.notify_all()
+                        return
+                    url = frontier.pop()
+                    progress['visited'] += 1
+                    progress['in_flight'] += 1
+
+                data, links = None, []
+                try:
+                    data, links = await self._process(session, pool, rate_limiter, url)
+                finally:
+                    # Liens ajoutés avant de sortir des pages en cours : aucun worker ne conclut à tort
+                    # que la frontière est épuisée
+                    async with changed:
+                        progress['in_flight'] -= 1
+                        if data:
+                            progress['collected'] += not data.get('fetch_failed')
+                            if not self.on_document:
+                                scraped_data.append(data)
+                        for link in links:
+                            frontier.add(link)
+                        changed.notify_all()
+                if progress['visited'] % 10 == 0:
+                    print(f" Progression: {progress['visited']} pages visitées, "
+                          f"{progress['collected']} documents collectés")
+
+        # Une seule session : les connexions keep-alive sont réutilisées
+        connector = aiohttp.TCPConnector(limit=self.workers)
+        headers = {'User-Agent': 'Mozilla/5.0 (Educational Bot)'}
+        async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+            await asyncio.gather(*[worker(session) for _ in range(self.workers)])
+
+        print(f" Progression: {progress['visited']} pages visitées, {progress['collected']} documents collectés")
+        self.complete = not frontier
+        return scraped_data
+
+    async def _process(self, session: aiohttp.ClientSession, pool: asyncio.Semaphore,
+                       rate_limiter: HostRateLimiter, url: str) -> Tuple[Optional[Dict[str, str]], List[str]]:
+        """Télécharge puis analyse une URL (PDF ou HTML)"""
+        is_pdf = url.lower().endswith('.pdf')
+        doc_type = 'pdf' if is_pdf else 'html'
+        headers = self.manifest.conditional_headers(url) if self.manifest else {}
+
+        async with pool:
+            await rate_limiter.wait(url)
+            try:
+                print(f" {'Téléchargement PDF' if is_pdf else 'Scraping'}: {url}")
+                timeout = aiohttp.ClientTimeout(total=30 if is_pdf else 10)
+                with timed(self.trace, "fetch"):
+                    async with session.get(url, timeout=timeout, headers=headers) as response:
+                        not_changed = response.status == 304
+                        if not not_changed:
+                            response.raise_for_status()
+                            body = await response.read()
+                            validators = http_validators(response.headers)
+                if not_changed:
+                    # Document inchangé : on reprend les liens connus pour continuer le crawl
+                    data = not_modified(url, doc_type)
+                    if self.trace:
+                        self.trace.count("not_modified")
+                    if self.on_document:
+                        await self.on_document(data)
+                    return data, self.manifest.links(url)
+            except Exception as e:
+                print(f" Erreur lors du scraping de {url}: {str(e)}")
+                return await self._failed(url, doc_type, e)
+
+        # L'analyse (BeautifulSoup, pypdf) est faite hors de la boucle d'événements
+        loop = asyncio.get_running_loop()
+        try:
+            data, links = await loop.run_in_executor(self.executor, self.parse, url, body)
+            data.update(validators)
+            # Durées mesurées dans un processus d'analyse (ingestion en flux)
+            timings, counts = data.pop('timings', None), data.pop('counts', None)
+            if self.trace and timings:
+                self.trace.merge(timings, counts)
+        except Exception as e:
+            print(f" Erreur lors de l'analyse de {url}: {str(e)}")
+            return await self._failed(url, doc_type, e)
+
+        if self.snapshot:
+            await loop.run_in_executor(None, self.snapshot.put, data, body)
+
+        if self.on_document:
+            await self.on_document(data)
+        return data, links
+
+    async def _failed(self, url: str, doc_type: str, error: Exception) -> Tuple[Optional[Dict], List[str]]:
+        """
+        Résultat d'une URL en erreur : rien si le document n'existe plus (404/410) ; sinon
+        le marqueur fetch_failed (le document reste indexé) et les liens connus
+        """
+        if is_gone(error):
+            return None, []
+        data = fetch_failed(url, doc_type)
+        if self.trace:
+            self.trace.count("fetch_errors")
+        if self.on_document:
+            await self.on_document(data)
+        return data, self.manifest.links(url) if self.manifest else []
+
+    def _parse(self, url: str, body: bytes) -> Tuple[Dict, List[str]]:
+        """Analyse par défaut avec les scrapers HTML et PDF"""
+        if url.lower().endswith('.pdf'):
+            return self.pdf_scraper.parse_pdf(url, body), []
+        return self.html_scraper.parse_page(url, body)
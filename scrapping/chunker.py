@@ -0,0 +1,164 @@
+"""
+Découpage structuré des pages du manuel
+Le texte extrait garde un bloc du DOM par ligne (titres préfixés par « # »).
+Il est d'abord découpé en sections parentes, aux titres et aux articles numérotés
+de premier niveau (« 3.4. », « 1. Objet »), puis chaque section en petits chunks
+enfants. Seuls les enfants sont embeddés : la recherche porte sur des passages
+précis, et le prompt reçoit la section parente une seule fois. Le texte des
+sections est gardé à part (parent_store.py), les enfants n'en gardent que la clé.
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import re
+from typing import Dict, List, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from config import PARENT_CHUNK_SIZE, CHILD_CHUNK_SIZE, CHILD_CHUNK_OVERLAP
+
+HEADING = re.compile(r"^#{1,6}\s")  # Titre h1-h6 du DOM
+NUMBERED = re.compile(r"^(\d+(?:\.\d+)*)\.\s")  # Article numéroté : « 3.4. », « 3.4.1. »
+MIN_CHILD_SIZE = 100  # Un enfant plus court est complété par les blocs suivants (évite les titres seuls)
+MIN_SECTION_SIZE = 50  # Section plus courte (titre seul) rattachée à la suivante : valid_chunks l'écarterait
+
+PARENT_SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size=PARENT_CHUNK_SIZE, chunk_overlap=0, separators=[". ", " ", ""], keep_separator="end"
+)
+CHILD_SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size=CHILD_CHUNK_SIZE, chunk_overlap=CHILD_CHUNK_OVERLAP,
+    separators=[". ", " ", ""], keep_separator="end", add_start_index=True
+)
+
+
+def article_depth(block: str) -> int:
+    """Profondeur de la numérotation d'un bloc (« 3.4. » -> 2), 0 s'il n'est pas numéroté"""
+    match = NUMBERED.match(block)
+    return match.group(1).count('.') + 1 if match else 0
+
+
+def text_blocks(text: str) -> List[str]:
+    """Blocs non vides du texte extrait, espaces normalisés"""
+    blocks = (' '.join(line.split()) for line in text.split('\n'))
+    return [block for block in blocks if block]
+
+
+def split_parents(blocks: List[str]) -> List[str]:
+    """
+    Regroupe les blocs en sections parentes
+
+    Une section commence à un titre ou à un article numéroté du niveau le plus
+    haut présent dans le texte ; les titres consécutifs et les blocs courts du
+    début (titre d'un PDF) restent avec le contenu qui les suit. Une section plus longue que PARENT_CHUNK_SIZE est coupée entre
+    deux blocs.
+
+    Args:
+        blocks: Les blocs du texte, dans l'ordre
+
+    Returns:
+        Le texte de chaque section parente (un bloc par ligne)
+    """
+    top_depth = min((d for d in map(article_depth, blocks) if d), default=0)
+    sections: List[List[str]] = []
+    current: List[str] = []
+    for block in blocks:
+        boundary = HEADING.match(block) or (top_depth and article_depth(block) == top_depth)
+        if (boundary and current and not all(HEADING.match(b) for b in current)
+                and len('\n'.join(current)) >= MIN_SECTION_SIZE):
+            sections.append(current)
+            current = []
+        current.append(block)
+    if current:
+        sections.append(current)
+
+    parents = []
+    for section in sections:
+        piece: List[str] = []
+        size = 0
+        for block in section:
+            parts = PARENT_SPLITTER.split_text(block) if len(block) > PARENT_CHUNK_SIZE else [block]
+            for part in parts:
+                if piece and size + 1 + len(part) > PARENT_CHUNK_SIZE:
+                    parents.append('\n'.join(piece))
+                    piece, size = [], 0
+                size += len(part) + (1 if piece else 0)
+                piece.append(part)
+        if piece:
+            parents.append('\n'.join(piece))
+    return parents
+
+
+def child_spans(parent: str) -> List[Tuple[int, int]]:
+    """
+    Découpe une section parente en passages enfants d'au plus CHILD_CHUNK_SIZE caractères
+
+    Les blocs sont regroupés tant qu'ils tiennent ; un titre ou un article numéroté
+    commence un nouvel enfant dès que le précédent atteint MIN_CHILD_SIZE.
+
+    Args:
+        parent: Le texte de la section (un bloc par ligne)
+
+    Returns:
+        Les positions (début, fin) de chaque enfant dans le texte de la section
+    """
+    spans: List[Tuple[int, int]] = []
+    start = end = None
+    offset = 0
+    for block in parent.split('\n'):
+        block_start, block_end = offset, offset + len(block)
+        offset = block_end + 1
+        if len(block) > CHILD_CHUNK_SIZE:
+            carry = None  # Titre court en attente : rattaché au premier morceau du bloc
+            if start is not None:
+                if end - start < MIN_CHILD_SIZE:
+                    carry = start
+                else:
+                    spans.append((start, end))
+                start = None
+            for chunk in CHILD_SPLITTER.create_documents([block]):
+                chunk_start = block_start + chunk.metadata['start_index']
+                spans.append((chunk_start if carry is None else carry, chunk_start + len(chunk.page_content)))
+                carry = None
+            continue
+        if start is not None:
+            boundary = HEADING.match(block) or article_depth(block)
+            if block_end - start > CHILD_CHUNK_SIZE or (boundary and end - start >= MIN_CHILD_SIZE):
+                spans.append((start, end))
+                start = None
+        if start is None:
+            start = block_start
+        end = block_end
+    if start is not None:
+        if spans and end - start < MIN_CHILD_SIZE and end - spans[-1][0] <= CHILD_CHUNK_SIZE + MIN_CHILD_SIZE:
+            spans[-1] = (spans[-1][0], end)  # Dernier bloc trop court : rattaché à l'enfant précédent
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def split_structured(text: str, metadata: Dict) -> List[Document]:
+    """
+    Découpe un texte en chunks enfants rattachés à leur section parente
+
+    Args:
+        text: Le texte extrait (un bloc par ligne)
+        metadata: Les métadonnées communes des chunks
+
+    Returns:
+        Liste des chunks enfants ; 'section' est l'indice de la section parente,
+        'start_index' la position dans la section et 'parent' son texte, retiré
+        avant l'indexation par ParentStore.detach
+    """
+    chunks = []
+    for section_index, parent in enumerate(split_parents(text_blocks(text))):
+        for start, end in child_spans(parent):
+            chunks.append(Document(
+                page_content=parent[start:end],
+                metadata={**metadata, 'section': section_index, 'start_index': start, 'parent': parent}
+            ))
+    return chunks
@@ -0,0 +1,158 @@
+"""
+Étape d'embedding du pipeline de scraping
+Découpe les chunks en lots, envoie plusieurs lots en parallèle au serveur
+d'embeddings, réessaie les lots en échec et écrit chaque lot dans ChromaDB
+dès qu'il est prêt. Les chunks peuvent venir d'un dictionnaire complet ou
+d'une file alimentée au fil du crawl (ingestion en flux).
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import queue
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from config import EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY, EMBEDDING_MAX_RETRIES
+from telemetry import Trace, timed
+
+
+class EmbeddingStage:
+    """Embedding par lots concurrents avec écriture progressive dans ChromaDB"""
+
+    def __init__(self, embeddings, vector_store,
+                 batch_size: int = EMBEDDING_BATCH_SIZE,
+                 concurrency: int = EMBEDDING_CONCURRENCY,
+                 max_retries: int = EMBEDDING_MAX_RETRIES,
+                 retry_delay: float = 1.0,
+                 trace: Optional[Trace] = None):
+        self.embeddings = embeddings
+        self.vector_store = vector_store
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.trace = trace  # Si présent : durées cumulées de l'embedding et de l'écriture
+
+    def run(self, chunks_by_id: Dict[str, Document]) -> int:
+        """
+        Embedde et stocke (upsert) les chunks
+
+        Args:
+            chunks_by_id: Chunks à stocker, indexés par leur identifiant stable
+
+        Returns:
+            Nombre de chunks stockés
+        """
+        items = iter(chunks_by_id.items())
+        batches = iter(lambda: list(islice(items, self.batch_size)), [])
+        return self.run_batches(batches, total=len(chunks_by_id))
+
+    def run_queue(self, chunk_queue: "queue.Queue") -> int:
+        """
+        Embedde et stocke les chunks au fur et à mesure qu'ils arrivent dans la file
+
+        Args:
+            chunk_queue: File de tuples (identifiant, chunk), terminée par None
+
+        Returns:
+            Nombre de chunks stockés
+        """
+        return self.run_batches(self._queue_batches(chunk_queue))
+
+    def _queue_batches(self, chunk_queue: "queue.Queue") -> Iterator[List[Tuple[str, Document]]]:
+        """
+        Lots formés avec ce qui est disponible dans la file : on attend le premier
+        chunk, puis on prend les suivants sans attendre (lots pleins si le crawl
+        va plus vite que l'embedding, petits lots sinon)
+        """
+        while True:
+            item = chunk_queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = chunk_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    yield batch
+                    return
+                batch.append(item)
+            yield batch
+
+    def run_batches(self, batches: Iterator[List[Tuple[str, Document]]], total: Optional[int] = None) -> int:
+        """
+        Embedde et stocke des lots lus au fil de l'eau : un lot n'est demandé
+        que lorsqu'une requête peut le prendre en charge
+
+        Args:
+            batches: Lots de tuples (identifiant, chunk)
+            total: Nombre de chunks attendus, pour l'affichage (inconnu en flux)
+
+        Returns:
+            Nombre de chunks stockés
+        """
+        start = time.perf_counter()
+        stored = 0
+        # Au plus 2 lots en attente par requête simultanée : le reste n'est pas encore préparé
+        max_pending = self.concurrency * 2
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = set()
+            exhausted = False
+            while not exhausted or pending:
+                while not exhausted and len(pending) < max_pending:
+                    batch = next(batches, None)
+                    if batch is None:
+                        exhausted = True
+                    else:
+                        pending.add(executor.submit(self._embed_batch, batch))
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch, vectors = future.result()  # Relance l'erreur après les tentatives
+                    self._write_batch(batch, vectors)
+                    stored += len(batch)
+
+                elapsed = time.perf_counter() - start
+                progress = f"{stored}/{total}" if total is not None else f"{stored}"
+                print(f" Embeddings: {progress} chunks ({stored / elapsed:.1f} chunks/s)")
+
+        return stored
+
+    def _embed_batch(self, batch: List[Tuple[str, Document]]) -> Tuple[List[Tuple[str, Document]], List[List[float]]]:
+        """Embedde un lot, avec plusieurs tentatives et un délai croissant"""
+        texts = [chunk.page_content for _, chunk in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                with timed(self.trace, "embedding"):
+                    vectors = self.embeddings.embed_documents(texts)
+                if self.trace:
+                    self.trace.count("embedded_chunks", len(texts))
+                return batch, vectors
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_delay * 2 ** attempt
+                print(f" Erreur d'embedding ({str(e)}), nouvelle tentative dans {delay:.1f}s")
+                time.sleep(delay)
+
+    def _write_batch(self, batch: List[Tuple[str, Document]], vectors: List[List[float]]):
+        """Écrit un lot déjà embeddé dans ChromaDB (upsert sur les identifiants stables)"""
+        with timed(self.trace, "store"):
+            self.vector_store._collection.upsert(
+                ids=[chunk_id for chunk_id, _ in batch],
+                embeddings=vectors,
+                documents=[chunk.page_content for _, chunk in batch],
+                metadatas=[chunk.metadata for _, chunk in batch],
+            )
@@ -0,0 +1,242 @@
+"""
+Serveur HTTP local imitant le Manuel de Gestion UQAC
+Sert une copie synthétique du manuel (pages HTML + PDF) pour tester et
+mesurer le crawler sans contacter uqac.ca
+
+Utilisation :
+    python scrapping/fixture_server.py              # sert le manuel sur http://127.0.0.1:8765/mgestion/
+    python scrapping/fixture_server.py --bench      # compare le crawl séquentiel et le crawl concurrent
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import argparse
+import hashlib
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+MANUAL_PREFIX = "/mgestion/"
+
+
+def build_pdf(lines) -> bytes:
+    """
+    Construit un PDF minimal (une page, police standard) contenant les lignes données
+
+    Args:
+        lines: Lignes de texte à écrire dans la page
+
+    Returns:
+        Le contenu binaire du PDF
+    """
+    text_ops = ["BT", "/F1 11 Tf", "14 TL", "50 780 Td"]
+    for line in lines:
+        escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        text_ops.append(f"({escaped}) Tj T*")
+    text_ops.append("ET")
+    stream = "\n".join(text_ops).encode("latin-1", errors="replace")
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref_offset = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        pdf += f"{offset:010d} 00000 n \n".encode()
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    return pdf
+
+
+def build_fixture_site(sections: int = 6, articles_per_section: int = 8) -> Dict[str, Tuple[str, bytes]]:
+    """
+    Génère une copie synthétique du manuel : un index, des sections, des
+    articles numérotés et une politique PDF par section
+
+    Args:
+        sections: Nombre de sections (chapitres) du manuel
+        articles_per_section: Nombre de pages d'articles par section
+
+    Returns:
+        Dictionnaire chemin -> (content-type, contenu)
+    """
+    site = {}
+
+    def page(title: str, paragraphs, links) -> bytes:
+        body = "".join(f"<p>{p}</p>" for p in paragraphs)
+        nav = "".join(f'<li><a href="{href}">{label}</a></li>' for href, label in links)
+        return (
+            f"<html><head><title>{title} | Manuel de gestion</title></head><body>"
+            f'<nav><ul><li><a href="{MANUAL_PREFIX}">Accueil</a></li>'
+            f'<li><a href="https://www.uqac.ca/">UQAC</a></li></ul></nav>'
+            f'<div class="entry-header"><h1>{title}</h1></div>'
+            f'<div class="entry-content">{body}<ul>{nav}</ul></div>'
+            f"</body></html>"
+        ).encode("utf-8")
+
+    index_links = [(f"{MANUAL_PREFIX}section-{s}/", f"Section {s}") for s in range(1, sections + 1)]
+    site[MANUAL_PREFIX] = ("text/html; charset=utf-8", page(
+        "Manuel de gestion",
+        ["Le manuel de gestion regroupe les politiques, règlements et procédures de l'UQAC."],
+        index_links,
+    ))
+
+    for s in range(1, sections + 1):
+        article_links = [
+            (f"{MANUAL_PREFIX}section-{s}/article-{a}/", f"{s}.{a} Article {s}.{a}")
+            for a in range(1, articles_per_section + 1)
+        ]
+        pdf_path = f"{MANUAL_PREFIX}wp-content/uploads/politique-{s}.pdf"
+        site[f"{MANUAL_PREFIX}section-{s}/"] = ("text/html; charset=utf-8", page(
+            f"Section {s}",
+            [f"La section {s} du manuel de gestion présente les politiques du chapitre {s}."],
+            article_links + [(pdf_path, f"Politique {s} (PDF)")],
+        ))
+        site[pdf_path] = ("application/pdf", build_pdf([
+            f"Politique {s}.1.1",
+            f"1. Objet : la politique {s} encadre les activites du chapitre {s}.",
+            f"2. Champ d'application : tout le personnel et les etudiants de l'UQAC.",
+        ]))
+
+        for a in range(1, articles_per_section + 1):
+            siblings = [
+                (f"{MANUAL_PREFIX}section-{s}/article-{b}/#texte", f"Article {s}.{b}")
+                for b in (a - 1, a + 1) if 1 <= b <= articles_per_section
+            ]
+            site[f"{MANUAL_PREFIX}section-{s}/article-{a}/"] = ("text/html; charset=utf-8", page(
+                f"Article {s}.{a}",
+                [
+                    f"{s}.{a}. Objet de l'article {s}.{a} du manuel de gestion.",
+                    f"{s}.{a}.1. Le présent article précise les responsabilités et les procédures "
+                    f"applicables aux membres de la communauté universitaire.",
+                    f"{s}.{a}.2. Toute demande doit être adressée au service concerné.",
+                ],
+                siblings + [(f"{MANUAL_PREFIX}section-{s}/", f"Retour à la section {s}")],
+            ))
+
+    return site
+
+
+class FixtureServer:
+    """Serveur HTTP en arrière-plan avec une latence configurable et la gestion des ETag (304)"""
+
+    def __init__(self, site: Dict[str, Tuple[str, bytes]] = None, latency: float = 0.05,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.site = site if site is not None else build_fixture_site()
+        self.latency = latency
+        self.request_count = 0
+        self.not_modified_count = 0
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive pour la réutilisation des connexions
+
+            def do_GET(self):
+                fixture.request_count += 1
+                time.sleep(fixture.latency)
+                entry = fixture.site.get(self.path.split("?")[0])
+                if entry is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                content_type, body = entry
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    fixture.not_modified_count += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Pas de log pour chaque requête
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{MANUAL_PREFIX}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def run_benchmark(latency: float, max_pages: int):
+    """Compare le crawl séquentiel et le crawl concurrent sur le manuel local"""
+    from scrapping.scrapper import ManuelScraperPipeline
+
+    timings = {}
+    documents = {}
+    with FixtureServer(latency=latency) as server, tempfile.TemporaryDirectory() as tmp_dir:
+        for mode, concurrent in (("séquentiel", False), ("concurrent", True)):
+            pipeline = ManuelScraperPipeline(base_url=server.base_url, persist_directory=Path(tmp_dir),
+                                             snapshot_directory=Path(tmp_dir) / "snapshot")
+            start = time.perf_counter()
+            pipeline.scrape_all(server.base_url, max_pages=max_pages, concurrent=concurrent)
+            timings[mode] = time.perf_counter() - start
+            documents[mode] = {item['url'] for item in pipeline.scraped_data}
+
+    print("\n" + "=" * 50)
+    for mode, duration in timings.items():
+        print(f" Crawl {mode}: {duration:.2f} s, {len(documents[mode])} documents")
+    print(f" Gain: x{timings['séquentiel'] / timings['concurrent']:.1f}")
+    print(f" Mêmes documents: {documents['séquentiel'] == documents['concurrent']}")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copie locale du manuel de gestion UQAC")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="Latence simulée par réponse (s)")
+    parser.add_argument("--bench", action="store_true", help="Mesure le gain du crawl concurrent")
+    parser.add_argument("--max-pages", type=int, default=250)
+    args = parser.parse_args()
+
+    if args.bench:
+        run_benchmark(args.latency, args.max_pages)
+    else:
+        server = FixtureServer(latency=args.latency, port=args.port).start()
+        print(f" Manuel local servi sur {server.base_url} (Ctrl+C pour arrêter)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.stop()
@@ -0,0 +1,80 @@
+"""
+Frontière de crawl : file FIFO (deque) + ensemble des URLs déjà vues
+Ajout, retrait et test d'appartenance en O(1), avec normalisation des URLs
+pour ne pas crawler deux fois la même page
+"""
+from collections import deque
+from typing import Iterable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Calcule la forme canonique d'une URL (clé de dédoublonnage)
+
+    - supprime le fragment (#section)
+    - met le schéma et l'hôte en minuscules, retire le port par défaut
+    - trie les paramètres de la query string
+    - retire la barre oblique finale du chemin
+
+    Args:
+        url: L'URL à normaliser
+
+    Returns:
+        L'URL canonique
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+def strip_fragment(url: str) -> str:
+    """Retire le fragment d'une URL (c'est l'URL réellement téléchargée)"""
+    return urlunsplit(urlsplit(url.strip())._replace(fragment=''))
+
+
+class CrawlFrontier:
+    """File des URLs à visiter pour un parcours en largeur"""
+
+    def __init__(self, start_urls: Iterable[str] = ()):
+        self._queue = deque()
+        self._seen = set()  # URLs canoniques déjà ajoutées (visitées ou en attente)
+        for url in start_urls:
+            self.add(url)
+
+    def add(self, url: str) -> bool:
+        """
+        Ajoute une URL si sa forme canonique n'a jamais été vue
+
+        Args:
+            url: L'URL découverte
+
+        Returns:
+            True si l'URL a été ajoutée à la file
+        """
+        key = normalize_url(url)
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        self._queue.append(strip_fragment(url))
+        return True
+
+    def pop(self) -> str:
+        """Retire la prochaine URL à visiter (ordre FIFO)"""
+        return self._queue.popleft()
+
+    def __contains__(self, url: str) -> bool:
+        return normalize_url(url) in self._seen
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def __bool__(self) -> bool:
+        return bool(self._queue)
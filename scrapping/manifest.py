@@ -0,0 +1,156 @@
+"""
+Manifeste de crawl pour la réindexation incrémentale
+Garde pour chaque URL les validateurs HTTP (ETag / Last-Modified), le hash
+du contenu, les liens sortants et les chunks stockés dans ChromaDB
+"""
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+GONE_STATUSES = (404, 410)  # Document supprimé du site : retiré de l'index
+
+
+def content_hash(text: str) -> str:
+    """Hash SHA-256 d'un texte (document ou chunk)"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def chunk_id(url: str, section: int, offset: int, page: Optional[int] = None) -> str:
+    """
+    Identifiant ChromaDB stable d'un chunk
+
+    Args:
+        url: L'URL du document
+        section: Index de la section dans le document (ou dans la page)
+        offset: Position (en caractères) du chunk dans la section
+        page: Numéro de page pour les PDF
+
+    Returns:
+        Un identifiant identique d'une exécution à l'autre pour le même emplacement
+    """
+    url_hash = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+    if page is not None:
+        return f"{url_hash}-p{page}-s{section}-o{offset}"
+    return f"{url_hash}-s{section}-o{offset}"
+
+
+def document_chunk_id(chunk) -> str:
+    """Identifiant stable d'un chunk produit par split_by_sections"""
+    metadata = chunk.metadata
+    return chunk_id(metadata['url'], metadata.get('section', 0), metadata.get('start_index', 0),
+                    metadata.get('page'))
+
+
+def http_validators(headers) -> Dict[str, str]:
+    """Extrait l'ETag et le Last-Modified des en-têtes d'une réponse HTTP"""
+    return {
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+    }
+
+
+def not_modified(url: str, doc_type: str) -> Dict:
+    """Marqueur d'un document inchangé depuis le dernier crawl (réponse 304)"""
+    return {'url': url, 'type': doc_type, 'not_modified': True}
+
+
+def fetch_failed(url: str, doc_type: str) -> Dict:
+    """
+    Marqueur d'un document qui n'a pas pu être téléchargé ou analysé (délai dépassé,
+    erreur 5xx, connexion coupée...) : il compte comme vu et inchangé, son état
+    dans le manifeste et ses chunks sont gardés jusqu'au prochain crawl
+    """
+    return {'url': url, 'type': doc_type, 'fetch_failed': True}
+
+
+def is_gone(error: Exception) -> bool:
+    """Vrai si l'erreur est une réponse 404/410 : le document n'existe plus"""
+    status = getattr(error, 'status', None)  # aiohttp.ClientResponseError
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)  # requests.HTTPError
+    return status in GONE_STATUSES
+
+
+class CrawlManifest:
+    """Manifeste persistant (JSON) de l'état du dernier crawl"""
+
+    def __init__(self, path: Path, chunking: Optional[str] = None):
+        self.path = Path(path)
+        self.chunking = chunking  # Signature des paramètres de découpage en cours
+        self.entries: Dict[str, Dict] = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """
+        En-têtes pour une requête conditionnelle (réponse 304 si la page n'a pas changé)
+
+        Args:
+            url: L'URL à télécharger
+
+        Returns:
+            Dictionnaire d'en-têtes HTTP (vide si l'URL est inconnue)
+        """
+        entry = self.entries.get(url, {})
+        headers = {}
+        if entry.get('chunking') != self.chunking:
+            return headers  # Découpage modifié : le document doit être redécoupé
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def links(self, url: str) -> List[str]:
+        """Liens sortants enregistrés pour une page (utilisés quand le serveur répond 304)"""
+        return self.entries.get(url, {}).get('links', [])
+
+    def is_unchanged(self, url: str, text: str) -> bool:
+        """Vrai si le contenu extrait est identique à celui déjà indexé, avec le même découpage"""
+        entry = self.entries.get(url, {})
+        return entry.get('chunking') == self.chunking and entry.get('content_hash') == content_hash(text)
+
+    def chunks(self, url: str) -> Dict[str, str]:
+        """Chunks indexés pour une URL : id du chunk -> hash du texte"""
+        return self.entries.get(url, {}).get('chunks', {})
+
+    def update(self, item: Dict, chunks: Dict[str, str]):
+        """
+        Enregistre l'état d'un document après son indexation
+
+        Args:
+            item: Document scrapé (url, content, etag, last_modified, links)
+            chunks: Chunks indexés (id -> hash)
+        """
+        self.entries[item['url']] = {
+            'type': item.get('type'),
+            'etag': item.get('etag'),
+            'last_modified': item.get('last_modified'),
+            'content_hash': content_hash(item.get('content', '')),
+            'links': item.get('links', []),
+            'chunking': self.chunking,
+            'chunks': chunks,
+        }
+
+    def remove(self, url: str) -> List[str]:
+        """
+        Retire une URL du manifeste
+
+        Returns:
+            Les ids des chunks qu'il faut supprimer de ChromaDB
+        """
+        entry = self.entries.pop(url, {})
+        return list(entry.get('chunks', {}))
+
+    def urls(self) -> List[str]:
+        return list(self.entries)
+
+    def save(self):
+        """Écrit le manifeste sur disque (écriture atomique)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+        tmp_path.replace(self.path)
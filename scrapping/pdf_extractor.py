@@ -0,0 +1,85 @@
+"""
+Extraction du texte des PDF hors du processus du crawler
+Le PDF est lu directement en mémoire (sans fichier temporaire) par un
+processus dédié qui renvoie le texte page par page : le découpage peut
+commencer avant la fin de la lecture, et un PDF trop long à analyser est
+interrompu au bout du délai par document sans bloquer le crawl.
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+import io
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Iterator, Tuple
+
+from pypdf import PdfReader
+
+from config import PDF_EXTRACTION_TIMEOUT, PDF_WORKERS
+
+# Pas de fork : l'appelant a des threads (crawler, embedding) dont les verrous seraient
+# copiés tels quels dans l'enfant. Les processus partent d'un serveur sans threads, qui a
+# importé le script principal et pypdf une seule fois (spawn à défaut de forkserver).
+# Le pool d'analyse de l'ingestion en flux utilise le même contexte : ses processus
+# réutilisent ce serveur pour leurs propres extractions.
+PROCESS_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+if PROCESS_CONTEXT.get_start_method() == "forkserver":
+    PROCESS_CONTEXT.set_forkserver_preload(["__main__", __name__])
+_slots = threading.BoundedSemaphore(PDF_WORKERS)  # Extractions simultanées
+
+
+def _extract_pages(content: bytes, pages: "multiprocessing.Queue"):
+    """Processus d'extraction : envoie (numéro de page, texte), puis None"""
+    try:
+        reader = PdfReader(io.BytesIO(content))
+        for page_number, page in enumerate(reader.pages, start=1):
+            pages.put((page_number, page.extract_text() or ""))
+    except Exception as e:
+        pages.put(e)
+    pages.put(None)
+
+
+def iter_pdf_pages(content: bytes, timeout: float = PDF_EXTRACTION_TIMEOUT) -> Iterator[Tuple[int, str]]:
+    """
+    Extrait le texte d'un PDF page par page dans un processus séparé
+
+    Args:
+        content: Le contenu binaire du PDF
+        timeout: Durée maximale de l'extraction du document (s)
+
+    Yields:
+        Tuples (numéro de page à partir de 1, texte de la page)
+
+    Raises:
+        TimeoutError: si le document n'est pas entièrement lu dans le délai
+            (les pages déjà renvoyées restent utilisables)
+    """
+    with _slots:
+        pages = PROCESS_CONTEXT.Queue()
+        process = PROCESS_CONTEXT.Process(target=_extract_pages, args=(content, pages), daemon=True)
+        process.start()
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                try:
+                    item = pages.get(timeout=max(deadline - time.monotonic(), 0.001))
+                except queue.Empty:
+                    raise TimeoutError(f"extraction interrompue après {timeout:.0f}s")
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+            pages.close()
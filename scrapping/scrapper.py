@@ -11,19 +11,43 @@ root_path = Path(__file__).parent.parent
 sys.path.insert(0, str(root_path))
 
 import os
+import argparse
+import asyncio
+import functools
+import hashlib
+import queue
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-import tempfile
 import time
-from typing import List, Dict
-from pypdf import PdfReader
-from langchain_ollama import OllamaEmbeddings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional, Tuple
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from langchain_chroma import Chroma
 import re
-from config import BASE_URL, EMBEDDING_MODEL, PERSIST_DIRECTORY, MAX_PAGES, CHUNK_SIZE, CHUNK_OVERLAP
+from config import (BASE_URL, EMBEDDING_MODEL, PERSIST_DIRECTORY, MAX_PAGES, CHUNK_SIZE, CHUNK_OVERLAP,
+                    CONCURRENT_CRAWL, INCREMENTAL_INDEXING, MANIFEST_FILENAME, BM25_INDEX_FILENAME, PARENT_STORE_FILENAME,
+                    STREAMING_INGEST, INGEST_PROCESSES, INGEST_QUEUE_SIZE, SNAPSHOT_DIRECTORY,
+                    STRUCTURED_CHUNKING, PARENT_CHUNK_SIZE, CHILD_CHUNK_SIZE, CHILD_CHUNK_OVERLAP,
+                    EMBEDDING_CONCURRENCY)
+from embedding_cache import CachedEmbeddings
+from lexical_index import BM25Index
+from ollama_pool import PooledEmbeddings
+from parent_store import ParentStore
+from scrapping.async_crawler import AsyncCrawler
+from scrapping.chunker import MIN_SECTION_SIZE, split_structured
+from scrapping.embedding_stage import EmbeddingStage
+from scrapping.frontier import CrawlFrontier
+from scrapping.manifest import (CrawlManifest, content_hash, document_chunk_id, http_validators, not_modified,
+                                fetch_failed, is_gone)
+from scrapping.pdf_extractor import PROCESS_CONTEXT, iter_pdf_pages
+from scrapping.snapshot import SnapshotStore
+from telemetry import METRICS, Trace, format_breakdown, timed
+
+PAGE_SEPARATOR = "\f"  # Saut de page entre les pages d'un PDF dans le contenu extrait
+BLOCK_TAGS = ['p', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'td', 'th', 'dt', 'dd',
+              'blockquote', 'pre', 'tr', 'div', 'section', 'article', 'table', 'ul', 'ol']
 
 # ==========================================
 # SCRAPING DES PAGES HTML
@@ -34,61 +58,85 @@ from config import BASE_URL, EMBEDDING_MODEL, PERSIST_DIRECTORY, MAX_PAGES, CHUN
 class HTMLScraper:
     """Classe pour scraper les pages HTML du manuel UQAC"""
     
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, manifest: Optional[CrawlManifest] = None,
+                 snapshot: Optional[SnapshotStore] = None, trace: Optional[Trace] = None):
         self.base_url = base_url
+        self.manifest = manifest  # Si présent : requêtes conditionnelles
+        self.snapshot = snapshot  # Si présent : pages brutes et textes extraits enregistrés
+        self.trace = trace  # Si présent : durées du téléchargement et de l'analyse
         self.visited_urls = set()  # Pour éviter les doublons
         self.session = requests.Session()  # Réutilise la connexion HTTP
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Educational Bot)'
         })
     
-    def get_page_content(self, url: str) -> Dict[str, str]:
+    def fetch_page(self, url: str) -> Tuple[Optional[Dict[str, str]], List[str]]:
         """
-        Récupère le contenu d'une page HTML
-        
+        Télécharge et analyse une page HTML une seule fois pour en extraire
+        à la fois le contenu et les liens sortants
+
         Args:
             url: L'URL de la page à scraper
-            
+
         Returns:
-            Dictionnaire avec le titre, le contenu et l'URL
+            Tuple (dictionnaire avec le titre, le contenu et l'URL, liste des URLs trouvées) ;
+            (None, []) si la page n'existe plus (404/410), le marqueur fetch_failed et les
+            liens connus en cas d'autre erreur
         """
         try:
             print(f" Scraping: {url}")
-            response = self.session.get(url, timeout=10)
+            headers = self.manifest.conditional_headers(url) if self.manifest else {}
+            with timed(self.trace, "fetch"):
+                response = self.session.get(url, timeout=10, headers=headers)
+            if response.status_code == 304:
+                # Page inchangée : on reprend les liens connus pour continuer le crawl
+                return not_modified(url, 'html'), self.manifest.links(url)
             response.raise_for_status()  # Lève une erreur si le statut n'est pas 200
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Récupère le titre de la page
-            title = soup.find('title')
-            title_text = title.get_text().strip() if title else "Sans titre"
-            
-            # Cherche le contenu dans les divs spécifiées
-            content_parts = []
-            
-            # Cherche dans entry-header
-            header = soup.find('div', class_='entry-header')
-            if header:
-                content_parts.append(header.get_text(strip=True, separator=' '))
-            
-            # Cherche dans entry-content
-            content = soup.find('div', class_='entry-content')
-            if content:
-                content_parts.append(content.get_text(strip=True, separator=' '))
-            
-            # Combine tout le contenu
-            full_content = ' '.join(content_parts)
-            
-            return {
-                'title': title_text,
-                'content': full_content,
-                'url': url,
-                'type': 'html'
-            }
-            
+
+            data, links = self.parse_page(url, response.content)
+            data.update(http_validators(response.headers))
+            if self.snapshot:
+                self.snapshot.put(data, response.content)
+            return data, links
+
         except Exception as e:
             print(f" Erreur lors du scraping de {url}: {str(e)}")
-            return None
+            if is_gone(e):
+                return None, []
+            # Erreur passagère : la page garde ses chunks, le crawl continue par ses liens connus
+            if self.trace:
+                self.trace.count("fetch_errors")
+            return fetch_failed(url, 'html'), self.manifest.links(url) if self.manifest else []
+
+    def parse_page(self, url: str, html: bytes) -> Tuple[Dict[str, str], List[str]]:
+        """
+        Analyse le HTML déjà téléchargé d'une page (utilisé aussi par le crawler asynchrone)
+
+        Args:
+            url: L'URL de la page
+            html: Le corps de la réponse HTTP
+
+        Returns:
+            Tuple (dictionnaire avec le titre, le contenu et l'URL, liste des URLs trouvées)
+        """
+        with timed(self.trace, "parse"):
+            soup = BeautifulSoup(html, 'html.parser')
+            data, links = self._extract_content(soup, url), self._extract_links(soup, url)
+        data['links'] = links
+        return data, links
+
+    def get_page_content(self, url: str) -> Dict[str, str]:
+        """
+        Récupère le contenu d'une page HTML
+        
+        Args:
+            url: L'URL de la page à scraper
+            
+        Returns:
+            Dictionnaire avec le titre, le contenu et l'URL
+        """
+        data, _ = self.fetch_page(url)
+        return data
     
     def find_links(self, url: str) -> List[str]:
         """
@@ -100,23 +148,49 @@ class HTMLScraper:
         Returns:
             Liste des URLs trouvées
         """
-        try:
-            response = self.session.get(url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            links = []
-            for link in soup.find_all('a', href=True):
-                absolute_url = urljoin(url, link['href'])
-                
-                # Garde seulement les liens du même domaine
-                if self.base_url in absolute_url:
-                    links.append(absolute_url)
-            
-            return list(set(links))  # Enlève les doublons
+        _, links = self.fetch_page(url)
+        return links
+
+    def _extract_content(self, soup: BeautifulSoup, url: str) -> Dict[str, str]:
+        """Extrait le titre et le texte entry-header / entry-content d'une page déjà analysée"""
+        # Récupère le titre de la page
+        title = soup.find('title')
+        title_text = title.get_text().strip() if title else "Sans titre"
+        
+        # Cherche le contenu dans les divs spécifiées
+        content_parts = []
+        
+        # Cherche dans entry-header
+        header = soup.find('div', class_='entry-header')
+        if header:
+            content_parts.append(block_text(header))
+        
+        # Cherche dans entry-content
+        content = soup.find('div', class_='entry-content')
+        if content:
+            content_parts.append(block_text(content))
+        
+        # Combine tout le contenu (un bloc du DOM par ligne)
+        full_content = '\n'.join(part for part in content_parts if part)
+        
+        return {
+            'title': title_text,
+            'content': full_content,
+            'url': url,
+            'type': 'html'
+        }
+
+    def _extract_links(self, soup: BeautifulSoup, url: str) -> List[str]:
+        """Extrait les liens du même domaine d'une page déjà analysée"""
+        links = []
+        for link in soup.find_all('a', href=True):
+            absolute_url = urljoin(url, link['href'])
             
-        except Exception as e:
-            print(f" Erreur lors de la recherche de liens: {str(e)}")
-            return []
+            # Garde seulement les liens du même domaine
+            if self.base_url in absolute_url:
+                links.append(absolute_url)
+        
+        return list(dict.fromkeys(links))  # Enlève les doublons en gardant l'ordre
 
 
 # ==========================================
@@ -126,7 +200,11 @@ class HTMLScraper:
 class PDFScraper:
     """Classe pour télécharger et extraire le texte des PDF"""
     
-    def __init__(self):
+    def __init__(self, manifest: Optional[CrawlManifest] = None, snapshot: Optional[SnapshotStore] = None,
+                 trace: Optional[Trace] = None):
+        self.manifest = manifest  # Si présent : requêtes conditionnelles
+        self.snapshot = snapshot  # Si présent : PDF bruts et textes extraits enregistrés
+        self.trace = trace  # Si présent : durées du téléchargement et de l'extraction
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Educational Bot)'
@@ -140,43 +218,233 @@ class PDFScraper:
             url: L'URL du PDF
             
         Returns:
-            Dictionnaire avec le contenu et l'URL
+            Dictionnaire avec le contenu et l'URL ; None si le PDF n'existe plus (404/410),
+            le marqueur fetch_failed en cas d'autre erreur
         """
         try:
             print(f" Téléchargement PDF: {url}")
             
             # Télécharge le PDF
-            response = self.session.get(url, timeout=30)
+            headers = self.manifest.conditional_headers(url) if self.manifest else {}
+            with timed(self.trace, "fetch"):
+                response = self.session.get(url, timeout=30, headers=headers)
+            if response.status_code == 304:
+                return not_modified(url, 'pdf')
             response.raise_for_status()
             
-            # Crée un fichier temporaire
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                tmp_file.write(response.content)
-                tmp_path = tmp_file.name
-            
-            # Lit le PDF
-            reader = PdfReader(tmp_path)
-            text_parts = []
-            
-            for page in reader.pages:
-                text_parts.append(page.extract_text())
-            
-            # Supprime le fichier temporaire
-            os.unlink(tmp_path)
-            
-            full_text = '\n'.join(text_parts)
-            
-            return {
-                'title': os.path.basename(urlparse(url).path),
-                'content': full_text,
-                'url': url,
-                'type': 'pdf'
-            }
+            data = self.parse_pdf(url, response.content)
+            data.update(http_validators(response.headers))
+            if self.snapshot:
+                self.snapshot.put(data, response.content)
+            return data
             
         except Exception as e:
             print(f" Erreur lors de l'extraction du PDF {url}: {str(e)}")
-            return None
+            if is_gone(e):
+                return None
+            # Erreur passagère : le PDF garde ses chunks jusqu'au prochain crawl
+            if self.trace:
+                self.trace.count("fetch_errors")
+            return fetch_failed(url, 'pdf')
+
+    def parse_pdf(self, url: str, content: bytes,
+                  on_page: Optional[Callable[[int, str], None]] = None) -> Dict[str, str]:
+        """
+        Extrait le texte d'un PDF déjà téléchargé (utilisé aussi par le crawler asynchrone)
+        Le PDF est lu en mémoire dans un processus séparé, page par page
+
+        Args:
+            url: L'URL du PDF
+            content: Le contenu binaire du PDF
+            on_page: Appelée avec (numéro de page, texte) dès qu'une page est extraite
+
+        Returns:
+            Dictionnaire avec le contenu (pages séparées par PAGE_SEPARATOR) et l'URL
+        """
+        text_parts = []
+        try:
+            with timed(self.trace, "pdf_extraction"):
+                for page_number, text in iter_pdf_pages(content):
+                    text_parts.append(text)
+                    if on_page:
+                        on_page(page_number, text)
+        except TimeoutError as e:
+            # Les pages déjà extraites sont gardées
+            print(f" PDF {url} : {str(e)}, {len(text_parts)} pages gardées")
+        if self.trace:
+            self.trace.count("pdf_pages", len(text_parts))
+
+        return {
+            'title': pdf_title(url),
+            'content': PAGE_SEPARATOR.join(text_parts),
+            'url': url,
+            'type': 'pdf'
+        }
+
+
+def pdf_title(url: str) -> str:
+    """Titre d'un PDF : le nom du fichier"""
+    return os.path.basename(urlparse(url).path)
+
+
+def block_text(element) -> str:
+    """
+    Texte d'un élément avec un bloc du DOM par ligne ; les titres h1-h6 sont
+    préfixés par « # » selon leur niveau pour le découpage structuré
+
+    Args:
+        element: L'élément BeautifulSoup (modifié sur place)
+
+    Returns:
+        Le texte, espaces normalisés dans chaque ligne, sans ligne vide
+    """
+    for br in element.find_all('br'):
+        br.replace_with('\n')
+    for block in element.find_all(BLOCK_TAGS):
+        if block.name[0] == 'h' and block.name[1:].isdigit():
+            block.insert(0, '#' * int(block.name[1:]) + ' ')
+        block.insert_before('\n')
+        block.insert_after('\n')
+    lines = (' '.join(line.split()) for line in element.get_text().split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+# ==========================================
+# DÉCOUPAGE EN CHUNKS
+# ==========================================
+
+SECTION_PATTERN = r"\n(?=\d+\.\s|\n\d+\.\d+\.\s)"  # Regex du titre
+
+# Signature du découpage : les documents indexés avec d'autres paramètres sont redécoupés
+CHUNKING_SIGNATURE = hashlib.sha256((
+    f"{CHUNK_SIZE}|{CHUNK_OVERLAP}|{SECTION_PATTERN}|{PAGE_SEPARATOR!r}|"
+    f"{STRUCTURED_CHUNKING}|{PARENT_CHUNK_SIZE}|{CHILD_CHUNK_SIZE}|{CHILD_CHUNK_OVERLAP}|{MIN_SECTION_SIZE}"
+).encode('utf-8')).hexdigest()[:16]
+
+# Utilise le text splitter de LangChain pour garantir la taille
+TEXT_SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size=CHUNK_SIZE,
+    chunk_overlap=CHUNK_OVERLAP,
+    length_function=len,
+    separators=["\n\n", "\n", " ", ""],
+    add_start_index=True  # Position du chunk, utilisée pour son identifiant
+)
+
+
+def to_document(item: Dict[str, str]) -> Document:
+    """Convertit un document scrapé en Document LangChain"""
+    return Document(
+        page_content=item['content'],
+        metadata={
+            'title': item['title'],
+            'url': item['url'],
+            'type': item['type']
+        }
+    )
+
+
+def split_document(doc: Document) -> List[Document]:
+    """
+    Découpe un document par sections, puis subdivise les sections trop longues
+    Les PDF sont découpés page par page (numéro de page dans les métadonnées)
 
+    Args:
+        doc: Le document à découper
+
+    Returns:
+        Liste des chunks (métadonnées du document + section + start_index [+ page] [+ parent])
+    """
+    if doc.metadata.get('type') == 'pdf':
+        chunks = []
+        for page_number, text in enumerate(doc.page_content.split(PAGE_SEPARATOR), start=1):
+            chunks.extend(split_page(text, {**doc.metadata, 'page': page_number}))
+        return chunks
+    return split_page(doc.page_content, doc.metadata)
+
+
+def split_page(text: str, metadata: Dict) -> List[Document]:
+    """Découpe une page HTML ou une page de PDF (structuré si STRUCTURED_CHUNKING, sinon par regex)"""
+    if STRUCTURED_CHUNKING:
+        return split_structured(text, metadata)
+    return split_text(text, metadata)
+
+
+def split_text(text: str, metadata: Dict) -> List[Document]:
+    """
+    Découpe un texte par sections, puis subdivise les sections trop longues
+
+    Args:
+        text: Le texte à découper
+        metadata: Les métadonnées communes des chunks
+
+    Returns:
+        Liste des chunks
+    """
+    chunks = []
+    # Découpe d'abord par sections si possible
+    sections = re.split(SECTION_PATTERN, text)
+    for section_index, section in enumerate(sections):
+        section = section.strip()
+        if len(section) > 100:  # évite les titres seuls
+            section_metadata = {**metadata, 'section': section_index}
+            if len(section) > CHUNK_SIZE:
+                # Subdivise avec le text splitter
+                chunks.extend(TEXT_SPLITTER.create_documents([section], metadatas=[section_metadata]))
+            else:
+                chunks.append(Document(page_content=section, metadata={**section_metadata, 'start_index': 0}))
+    return chunks
+
+
+def valid_chunks(chunks: List[Document]) -> List[Document]:
+    """Filtre les chunks vides ou trop petits"""
+    return [chunk for chunk in chunks if chunk.page_content and len(chunk.page_content.strip()) > 50]
+
+
+@functools.lru_cache(maxsize=None)
+def _worker_scrapers(base_url: str) -> Tuple[HTMLScraper, PDFScraper]:
+    """Scrapers réutilisés par un processus du pool d'ingestion"""
+    return HTMLScraper(base_url), PDFScraper()
+
+
+def process_document(base_url: str, url: str, body: bytes) -> Tuple[Dict, List[str]]:
+    """
+    Analyse et découpe un document téléchargé (exécuté dans le pool de processus
+    de l'ingestion en flux)
+
+    Args:
+        base_url: URL de base du manuel (filtre des liens)
+        url: L'URL du document
+        body: Le corps de la réponse HTTP
+
+    Returns:
+        Tuple (document avec ses chunks valides dans 'chunks' et les durées de
+        l'analyse et du découpage dans 'timings', liens trouvés)
+    """
+    html_scraper, pdf_scraper = _worker_scrapers(base_url)
+    trace = Trace("document")  # Durées renvoyées au processus principal avec le document
+    if url.lower().endswith('.pdf'):
+        # Chaque page est découpée pendant que la suivante est extraite
+        chunks = []
+        metadata = {'title': pdf_title(url), 'url': url, 'type': 'pdf'}
+
+        def chunk_page(page_number: int, text: str):
+            with trace.span("chunking"):
+                chunks.extend(split_page(text, {**metadata, 'page': page_number}))
+
+        with trace.span("pdf_extraction"):
+            data = pdf_scraper.parse_pdf(url, body, on_page=chunk_page)
+        trace.add_time("pdf_extraction", -trace.timings.get("chunking", 0.0))
+        trace.count("pdf_pages", len(data['content'].split(PAGE_SEPARATOR)) if data['content'] else 0)
+        data['chunks'] = valid_chunks(chunks)
+        data['timings'], data['counts'] = trace.timings, trace.counts
+        return data, []
+
+    with trace.span("parse"):
+        data, links = html_scraper.parse_page(url, body)
+    with trace.span("chunking"):
+        data['chunks'] = valid_chunks(split_document(to_document(data))) if data.get('content') else []
+    data['timings'], data['counts'] = trace.timings, trace.counts
+    return data, links
 
 
 # ==========================================
@@ -185,36 +453,61 @@ class PDFScraper:
 class ManuelScraperPipeline:
     """Pipeline complet de scraping et stockage"""
     
-    def __init__(self):
-        self.html_scraper = HTMLScraper(BASE_URL)
-        self.pdf_scraper = PDFScraper()
-        self.embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL)
-        self.vector_store = Chroma(embedding_function=self.embeddings, persist_directory=PERSIST_DIRECTORY)
+    def __init__(self, base_url: str = BASE_URL, persist_directory: Path = PERSIST_DIRECTORY,
+                 incremental: bool = INCREMENTAL_INDEXING,
+                 snapshot_directory: Optional[Path] = None):
+        self.base_url = base_url
+        self.persist_directory = persist_directory
+        # Le manifeste vit à côté de la base : il décrit exactement son contenu
+        self.manifest = (CrawlManifest(Path(persist_directory) / MANIFEST_FILENAME, chunking=CHUNKING_SIGNATURE)
+                         if incremental else None)
+        # Texte des sections parentes, stocké une fois par section et non dans chaque chunk
+        self.parents = ParentStore(Path(persist_directory) / PARENT_STORE_FILENAME)
+        # Instantané à la demande : un crawl complet en retire les documents absents, un pipeline
+        # de test sur un autre site ne doit pas vider celui du manuel
+        self.snapshot = SnapshotStore(snapshot_directory) if snapshot_directory else None
+        self.trace = Trace("ingest")  # Durées cumulées de chaque étape, enregistrées à la fin de run()
+        self.html_scraper = HTMLScraper(base_url, manifest=self.manifest, snapshot=self.snapshot, trace=self.trace)
+        self.pdf_scraper = PDFScraper(manifest=self.manifest, snapshot=self.snapshot, trace=self.trace)
+        # Tous les serveurs d'embeddings travaillent pour l'ingestion
+        self.embedding_pool = PooledEmbeddings(EMBEDDING_MODEL)
+        self.embedding_concurrency = EMBEDDING_CONCURRENCY * self.embedding_pool.pool.size
+        self.embeddings = CachedEmbeddings(self.embedding_pool, EMBEDDING_MODEL)
+        self.vector_store = Chroma(embedding_function=self.embeddings, persist_directory=str(persist_directory))
         self.scraped_data = []
         self.chunks = []
+        self.crawl_complete = False  # Vrai si toute la frontière a été parcourue
     
-    def scrape_all(self, start_url: str, max_pages: int = MAX_PAGES):
+    def scrape_all(self, start_url: str, max_pages: int = MAX_PAGES, concurrent: bool = CONCURRENT_CRAWL):
         """
         Lance le scraping complet
         
         Args:
             start_url: URL de départ
             max_pages: Nombre maximum de pages à scraper
+            concurrent: Utilise le crawler asynchrone au lieu du parcours séquentiel
         """
-        urls_to_visit = [start_url]
-        visited = set()
+        frontier = CrawlFrontier([start_url])
+        visited = 0
         
         print(f" Début du scraping depuis {start_url}")
         print(f" Maximum {max_pages} pages")
         print("-" * 50)
         
-        while urls_to_visit and len(visited) < max_pages:
-            current_url = urls_to_visit.pop(0)
-            
-            if current_url in visited:
-                continue
-            
-            visited.add(current_url)
+        if concurrent:
+            crawler = AsyncCrawler(self.html_scraper, self.pdf_scraper, manifest=self.manifest,
+                                   snapshot=self.snapshot, trace=self.trace)
+            self.scraped_data.extend(crawler.crawl(start_url, max_pages))
+            self.crawl_complete = crawler.complete
+            self.save_snapshot({item['url'] for item in self.scraped_data if item})
+            self.trace.count("documents", len(self.scraped_data))
+            print("-" * 50)
+            print(f" Scraping terminé! {len(self.scraped_data)} documents collectés")
+            return
+        
+        while frontier and visited < max_pages:
+            current_url = frontier.pop()
+            visited += 1
             
             # Détermine si c'est un PDF ou HTML
             if current_url.lower().endswith('.pdf'):
@@ -223,116 +516,336 @@ class ManuelScraperPipeline:
                 if data:
                     self.scraped_data.append(data)
             else:
-                # Traite les HTML
-                data = self.html_scraper.get_page_content(current_url)
+                # Traite les HTML : une seule requête pour le contenu et les liens
+                data, new_links = self.html_scraper.fetch_page(current_url)
                 if data:
                     self.scraped_data.append(data)
                 
-                # Trouve de nouveaux liens
-                new_links = self.html_scraper.find_links(current_url)
+                # Ajoute les nouveaux liens (la frontière ignore ceux déjà vus)
                 for link in new_links:
-                    if link not in visited and link not in urls_to_visit:
-                        urls_to_visit.append(link)
+                    frontier.add(link)
             
             # Pause pour ne pas surcharger le serveur
             time.sleep(0.5)
             
             # Affiche la progression
-            if len(visited) % 10 == 0:
-                print(f" Progression: {len(visited)} pages visitées, {len(self.scraped_data)} documents collectés")
+            if visited % 10 == 0:
+                print(f" Progression: {visited} pages visitées, {len(self.scraped_data)} documents collectés")
         
+        self.crawl_complete = not frontier
+        self.save_snapshot({item['url'] for item in self.scraped_data if item})
+        self.trace.count("documents", len(self.scraped_data))
         print("-" * 50)
         print(f" Scraping terminé! {len(self.scraped_data)} documents collectés")
-        
+
+    def save_snapshot(self, seen_urls):
+        """Enregistre l'instantané ; après un crawl complet, les documents disparus en sont retirés"""
+        if not self.snapshot:
+            return
+        if self.crawl_complete:
+            for url in self.snapshot.urls():
+                if url not in seen_urls:
+                    self.snapshot.remove(url)
+        self.snapshot.save(complete=self.crawl_complete)
+
+    def load_snapshot(self, reparse: bool = False):
+        """
+        Recharge les documents de l'instantané au lieu de crawler (aucune requête réseau)
+
+        Args:
+            reparse: Réanalyse les corps HTML/PDF bruts au lieu de reprendre le texte extrait
+        """
+        if not self.snapshot or not self.snapshot.urls():
+            raise FileNotFoundError("Aucun instantané : lancer d'abord un crawl")
+        print(f" Rejeu de l'instantané {self.snapshot.directory} ({len(self.snapshot.urls())} documents)")
+        for url in self.snapshot.urls():
+            data = self.snapshot.document(url)
+            if reparse:
+                body = self.snapshot.body(url)
+                validators = {k: data.get(k) for k in ('etag', 'last_modified')}
+                if data['type'] == 'pdf':
+                    data = self.pdf_scraper.parse_pdf(url, body)
+                else:
+                    data, _ = self.html_scraper.parse_page(url, body)
+                data.update(validators)
+            self.scraped_data.append(data)
+        self.crawl_complete = self.snapshot.complete
+        self.trace.count("documents", len(self.scraped_data))
+
     def convert_data(self):
         print("\nConversion des données en documents")
         documents = []
         for item in self.scraped_data:
-            print(f" Converti : {item}")
-            if item and item.get('content'):
-                doc = Document(
-                    page_content=item['content'],
-                    metadata={
-                        'title': item['title'],
-                        'url': item['url'],
-                        'type': item['type']
-                    }
-                )
-                documents.append(doc)
+            if not item or not item.get('content'):
+                continue  # Erreur de scraping ou document inchangé (304)
+            if self.manifest and self.manifest.is_unchanged(item['url'], item['content']):
+                continue  # Contenu identique à celui déjà indexé
+            print(f" Converti : {item['url']}")
+            documents.append(to_document(item))
         print(f"{len(documents)} documents convertis")
         return documents
     
     def split_by_sections(self):
         print("\nDécoupage des documents en sections")
 
-        documents = self.convert_data()
-
-        # Utilise le text splitter de LangChain pour garantir la taille
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
-
         all_chunks = []
-        for doc in documents:
-            # Découpe d'abord par sections si possible
-            text = doc.page_content
-            sections = re.split(
-                r"\n(?=\d+\.\s|\n\d+\.\d+\.\s)",  # Regex du titre
-                text
-            )
-            for section in sections:
-                section = section.strip()
-                if len(section) > 100:  # évite les titres seuls
-                    if len(section) > CHUNK_SIZE:
-                        # Subdivise avec le text splitter
-                        sub_chunks = text_splitter.create_documents(
-                            [section],
-                            metadatas=[doc.metadata]
-                        )
-                        all_chunks.extend(sub_chunks)
-                    else:
-                        all_chunks.append(
-                            Document(
-                                page_content=section,
-                                metadata=doc.metadata
-                            )
-                        )
+        with self.trace.span("chunking"):
+            for doc in self.convert_data():
+                all_chunks.extend(self.parents.detach(doc.metadata['url'], split_document(doc)))
         self.chunks = all_chunks
         print(f"\n {len(self.chunks)} sections créées")
 
-        max_length = max(len(chunk.page_content) for chunk in self.chunks)
-        print(f"Taille maximale des chunks: {max_length} caractères")
+        if self.chunks:
+            max_length = max(len(chunk.page_content) for chunk in self.chunks)
+            print(f"Taille maximale des chunks: {max_length} caractères")
 
     def store_data(self):
         """Stocke les données dans la base vectorielle"""
         print("\n Stockage des données dans ChromaDB...")
 
-        if not self.chunks:
+        if not self.chunks and not self.manifest:
             print("\n Aucun chunk à stocker !")
             return
 
-        # Filtre les chunks vides ou trop petits
-        valid_chunks = [
-            chunk for chunk in self.chunks
-            if chunk.page_content and len(chunk.page_content.strip()) > 50
-        ]
-        print(f"{len(valid_chunks)} chunks valides sur {len(self.chunks)}")
+        chunks = valid_chunks(self.chunks)
+        print(f"{len(chunks)} chunks valides sur {len(self.chunks)}")
 
-        self.vector_store.add_documents(valid_chunks)
+        if self.manifest:
+            self.store_incremental(chunks)
+        else:
+            # Identifiants stables : upsert, la base ne grossit pas d'une exécution à l'autre
+            chunks_by_id = {document_chunk_id(chunk): chunk for chunk in chunks}
+            self.embedding_stage().run(chunks_by_id)
+        self.parents.save()
         print("Stockage terminé!")
+
+    def store_incremental(self, valid_chunks: List[Document]):
+        """
+        Met à jour la base à partir du manifeste : seuls les nouveaux chunks
+        sont embeddés, ceux des documents modifiés ou disparus sont supprimés
+
+        Args:
+            valid_chunks: Chunks des documents nouveaux ou modifiés
+        """
+        chunks_by_url = {}
+        for chunk in valid_chunks:
+            chunks_by_url.setdefault(chunk.metadata['url'], []).append(chunk)
+
+        to_add = {}  # id -> chunk
+        to_delete = []
+        seen_urls = set()
+        for item in self.scraped_data:
+            if not item:
+                continue
+            seen_urls.add(item['url'])
+            item_to_add, item_to_delete = self.diff_document(item, chunks_by_url.get(item['url'], []))
+            to_add.update(item_to_add)
+            to_delete.extend(item_to_delete)
+        to_delete.extend(self.remove_unseen(seen_urls))
+
+        print(f" {len(to_add)} chunks nouveaux ou modifiés, {len(to_delete)} chunks supprimés")
+        if to_delete:
+            self.vector_store.delete(ids=to_delete)
+        if to_add:
+            # Upsert : un chunk modifié remplace l'ancien sous le même identifiant
+            self.embedding_stage().run(to_add)
+        self.manifest.save()
+
+    def diff_document(self, item: Dict, chunks: List[Document]) -> Tuple[Dict[str, Document], List[str]]:
+        """
+        Compare un document scrapé à son état dans le manifeste, puis met le manifeste à jour
+
+        Args:
+            item: Document scrapé
+            chunks: Ses chunks valides
+
+        Returns:
+            Tuple (chunks à embedder indexés par identifiant, identifiants à supprimer)
+        """
+        url = item['url']
+        if item.get('not_modified') or item.get('fetch_failed'):
+            return {}, []  # Inchangé (304) ou pas téléchargé : chunks et manifeste gardés
+        if self.manifest.is_unchanged(url, item.get('content', '')):
+            # Même contenu : on garde les chunks, on met seulement à jour les validateurs
+            self.manifest.update(item, self.manifest.chunks(url))
+            return {}, []
+
+        to_add = {}
+        new_chunks = {}
+        for chunk in chunks:
+            cid = document_chunk_id(chunk)
+            new_chunks[cid] = content_hash(chunk.page_content)
+            to_add[cid] = chunk
+        old_chunks = self.manifest.chunks(url)
+        to_delete = [cid for cid in old_chunks if cid not in new_chunks]
+        for cid, chunk_hash in old_chunks.items():
+            if new_chunks.get(cid) == chunk_hash:
+                to_add.pop(cid, None)  # Même emplacement, même texte : déjà embeddé
+        self.manifest.update(item, new_chunks)
+        return to_add, to_delete
+
+    def remove_unseen(self, seen_urls) -> List[str]:
+        """
+        Retire du manifeste les documents qui ne sont plus atteignables (crawl complet
+        seulement) : plus liés, ou en 404/410. Un document en erreur passagère est dans
+        seen_urls (marqueur fetch_failed) et reste indexé.
+        """
+        to_delete = []
+        if self.crawl_complete:
+            for url in self.manifest.urls():
+                if url not in seen_urls:
+                    print(f" Document retiré: {url}")
+                    to_delete.extend(self.manifest.remove(url))
+                    self.parents.remove(url)
+        return to_delete
+
+    def ingest_streaming(self, start_url: str, max_pages: int = MAX_PAGES,
+                         processes: int = INGEST_PROCESSES, queue_size: int = INGEST_QUEUE_SIZE):
+        """
+        Crawl, analyse, découpage et embedding en étapes concurrentes : chaque
+        document passe au pool de processus (HTML/PDF + découpage) dès qu'il est
+        téléchargé, puis ses chunks rejoignent l'étape d'embedding par une file
+        bornée. Rien n'est accumulé : la mémoire reste stable et la durée totale
+        tend vers celle de l'étape la plus lente.
+
+        Args:
+            start_url: URL de départ
+            max_pages: Nombre maximum de pages à scraper
+            processes: Processus d'analyse et de découpage
+            queue_size: Chunks en attente d'embedding au maximum
+        """
+        print(f" Ingestion en flux depuis {start_url}")
+        print(f" Maximum {max_pages} pages, {processes} processus d'analyse")
+        print("-" * 50)
+
+        start = time.perf_counter()
+        chunk_queue = queue.Queue(maxsize=queue_size)
+        stage = self.embedding_stage()
+        embedder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        stored = embedder.submit(stage.run_queue, chunk_queue)
+        seen_urls = set()
+        counts = {'documents': 0, 'chunks': 0, 'deleted': 0}
+
+        def enqueue(items):
+            """Place les chunks dans la file ; bloque tant qu'elle est pleine (contre-pression)"""
+            for item in items:
+                while True:
+                    if stored.done():
+                        stored.result()  # Relance l'erreur de l'étape d'embedding
+                        raise RuntimeError("Étape d'embedding arrêtée")
+                    try:
+                        chunk_queue.put(item, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+
+        async def on_document(data: Dict):
+            seen_urls.add(data['url'])
+            chunks = data.pop('chunks', [])
+            if data.get('content'):
+                chunks = self.parents.detach(data['url'], chunks)
+            counts['documents'] += 1
+            if self.manifest:
+                to_add, to_delete = self.diff_document(data, chunks)
+                if to_delete:
+                    self.vector_store.delete(ids=to_delete)
+                    counts['deleted'] += len(to_delete)
+            else:
+                to_add = {document_chunk_id(chunk): chunk for chunk in chunks}
+            counts['chunks'] += len(to_add)
+            if to_add:
+                await asyncio.get_running_loop().run_in_executor(None, enqueue, list(to_add.items()))
+
+        try:
+            with ProcessPoolExecutor(max_workers=processes, mp_context=PROCESS_CONTEXT) as pool:
+                crawler = AsyncCrawler(self.html_scraper, self.pdf_scraper, manifest=self.manifest,
+                                       parse=functools.partial(process_document, self.base_url),
+                                       executor=pool, on_document=on_document, snapshot=self.snapshot,
+                                       trace=self.trace)
+                crawler.crawl(start_url, max_pages)
+                self.crawl_complete = crawler.complete
+        finally:
+            if not stored.done():
+                chunk_queue.put(None)  # Fin du flux
+            embedder.shutdown(wait=True)
+        stored.result()
+        self.save_snapshot(seen_urls)
+
+        if self.manifest:
+            to_delete = self.remove_unseen(seen_urls)
+            if to_delete:
+                self.vector_store.delete(ids=to_delete)
+                counts['deleted'] += len(to_delete)
+            self.manifest.save()
+        self.parents.save()
+
+        self.trace.count("documents", counts['documents'])
+        print("-" * 50)
+        print(f" Ingestion terminée en {time.perf_counter() - start:.1f}s : {counts['documents']} documents, "
+              f"{counts['chunks']} chunks nouveaux ou modifiés, {counts['deleted']} chunks supprimés")
+
+    def build_lexical_index(self):
+        """Reconstruit l'index BM25 à partir de tout le contenu de la base vectorielle"""
+        print("\n Construction de l'index BM25...")
+        with self.trace.span("lexical_index"):
+            index = BM25Index.from_vector_store(self.vector_store)
+            index.save(Path(self.persist_directory) / BM25_INDEX_FILENAME)
+        print(f" Index BM25: {len(index.documents)} chunks, {len(index.postings)} termes")
+
+    def embedding_stage(self) -> EmbeddingStage:
+        """Étape d'embedding, avec EMBEDDING_CONCURRENCY requêtes simultanées par serveur"""
+        return EmbeddingStage(self.embeddings, self.vector_store, concurrency=self.embedding_concurrency,
+                              trace=self.trace)
+
+    def print_cache_stats(self):
+        """Affiche les compteurs du cache d'embeddings (et la répartition entre serveurs)"""
+        stats = self.embeddings.stats()
+        print(f" Cache d'embeddings: {stats['hits']} succès, {stats['misses']} échecs "
+              f"({stats['hit_rate']:.0%}), {stats['size_mb']:.1f} Mo")
+        if self.embedding_pool.pool.size > 1:
+            print(" Serveurs d'embeddings: " + ", ".join(
+                f"{backend['url']} {backend['requests']} requêtes ({backend['errors']} échecs)"
+                for backend in self.embedding_pool.pool.stats()))
+
+    def record_trace(self, mode: str):
+        """Termine la trace de l'ingestion (journal JSONL, métriques) et affiche les durées par étape"""
+        stats = self.embeddings.stats()
+        self.trace.attributes['mode'] = mode
+        self.trace.count("embedding_cache_hits", stats['hits'])
+        self.trace.count("embedding_cache_misses", stats['misses'])
+        self.trace.add_time("total", self.trace.elapsed())
+        METRICS.observe(self.trace)
+        # Les étapes concurrentes se chevauchent : leurs durées cumulées peuvent dépasser le total
+        print(f" Durées par étape (cumulées) : {format_breakdown(self.trace.timings)}")
     
-    def run(self):
-        """Lance le pipeline complet"""
-        self.scrape_all(BASE_URL)
-        self.split_by_sections()
-        self.store_data()
+    def run(self, replay: bool = False, reparse: bool = False):
+        """
+        Lance le pipeline complet
+
+        Args:
+            replay: Découpe et embedde les documents de l'instantané, sans crawler
+            reparse: Avec replay, réanalyse les corps bruts au lieu du texte extrait
+        """
+        if replay:
+            mode = "replay"
+            self.load_snapshot(reparse)
+            self.split_by_sections()
+            self.store_data()
+        elif STREAMING_INGEST and CONCURRENT_CRAWL:
+            mode = "streaming"
+            self.ingest_streaming(self.base_url)
+        else:
+            mode = "phased"
+            self.scrape_all(self.base_url)
+            self.split_by_sections()
+            self.store_data()
+        self.build_lexical_index()
+        self.print_cache_stats()
+        self.record_trace(mode)
         
         print("\n" + "=" * 50)
         print(" PIPELINE TERMINÉ!")
-        print(f" Base de données sauvegardée dans: {PERSIST_DIRECTORY}")
+        print(f" Base de données sauvegardée dans: {self.persist_directory}")
         print("=" * 50)
 
 
@@ -345,8 +858,15 @@ if __name__ == "__main__":
           Projet Chatbot RAG - IA                    
     """)
     
+    parser = argparse.ArgumentParser(description="Scraper du manuel de gestion UQAC")
+    parser.add_argument("--replay", action="store_true",
+                        help="Redécoupe et réindexe depuis l'instantané local, sans réseau")
+    parser.add_argument("--reparse", action="store_true",
+                        help="Avec --replay, réanalyse les HTML/PDF bruts de l'instantané")
+    args = parser.parse_args()
+
     # Lance le pipeline
-    pipeline = ManuelScraperPipeline()
-    pipeline.run()
+    pipeline = ManuelScraperPipeline(snapshot_directory=SNAPSHOT_DIRECTORY)
+    pipeline.run(replay=args.replay, reparse=args.reparse)
 
 
@@ -0,0 +1,104 @@
+"""
+Instantané local des documents téléchargés
+Garde, pour chaque URL, le corps HTTP brut (HTML ou PDF) et le texte extrait,
+compressés avec gzip. Le découpage et l'embedding peuvent ensuite être rejoués
+sans réseau (changement de CHUNK_SIZE, de la regex des sections, tests...).
+
+Structure du dossier :
+    index.json          URL -> fichier, type, date, validateurs HTTP
+    records/<hash>.gz   corps HTTP brut
+    records/<hash>.json.gz  document extrait (titre, contenu, liens...)
+"""
+import gzip
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+
+def record_key(url: str) -> str:
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()[:24]
+
+
+class SnapshotStore:
+    """Instantané compressé des documents du dernier crawl"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.records = self.directory / "records"
+        self.index_path = self.directory / "index.json"
+        self.index: Dict[str, Dict] = {}
+        self.complete = False  # Vrai si l'instantané couvre un crawl complet
+        if self.index_path.exists():
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.index = data['documents']
+            self.complete = data.get('complete', False)
+
+    def put(self, item: Dict, body: bytes):
+        """
+        Enregistre un document téléchargé
+
+        Args:
+            item: Document extrait (url, title, content, type, links, validateurs)
+            body: Corps HTTP brut
+        """
+        self.records.mkdir(parents=True, exist_ok=True)
+        key = record_key(item['url'])
+        with gzip.open(self.records / f"{key}.gz", 'wb') as f:
+            f.write(body)
+        extracted = {k: v for k, v in item.items() if k != 'chunks'}
+        with gzip.open(self.records / f"{key}.json.gz", 'wt', encoding='utf-8') as f:
+            json.dump(extracted, f, ensure_ascii=False)
+        self.index[item['url']] = {
+            'key': key,
+            'type': item.get('type'),
+            'fetched_at': time.time(),
+            'etag': item.get('etag'),
+            'last_modified': item.get('last_modified'),
+        }
+
+    def document(self, url: str) -> Optional[Dict]:
+        """Document extrait enregistré pour une URL"""
+        entry = self.index.get(url)
+        if not entry:
+            return None
+        with gzip.open(self.records / f"{entry['key']}.json.gz", 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def body(self, url: str) -> Optional[bytes]:
+        """Corps HTTP brut enregistré pour une URL"""
+        entry = self.index.get(url)
+        if not entry:
+            return None
+        with gzip.open(self.records / f"{entry['key']}.gz", 'rb') as f:
+            return f.read()
+
+    def urls(self):
+        return list(self.index)
+
+    def documents(self) -> Iterator[Dict]:
+        """Documents extraits, dans l'ordre du crawl (lus un par un)"""
+        for url in self.urls():
+            yield self.document(url)
+
+    def remove(self, url: str):
+        entry = self.index.pop(url, None)
+        if entry:
+            for suffix in (".gz", ".json.gz"):
+                (self.records / f"{entry['key']}{suffix}").unlink(missing_ok=True)
+
+    def save(self, complete: bool = False):
+        """
+        Écrit l'index sur disque (écriture atomique)
+
+        Args:
+            complete: Le crawl a parcouru toute la frontière
+        """
+        self.complete = complete
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'complete': complete, 'documents': self.index}, f, ensure_ascii=False, indent=1)
+        tmp_path.replace(self.index_path)
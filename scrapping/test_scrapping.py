@@ -1,8 +1,15 @@
 """
 Script de test pour vérifier le scraper avant le lancement complet
 """
+import sys
+from pathlib import Path
 
-from scrapper import HTMLScraper, PDFScraper, Config
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+from config import BASE_URL, EMBEDDING_MODEL
+from scrapping.scrapper import HTMLScraper
 
 
 def test_html_scraping():
@@ -10,8 +17,8 @@ def test_html_scraping():
     print("\n TEST 1: Scraping d'une page HTML")
     print("-" * 50)
     
-    scraper = HTMLScraper(Config.BASE_URL)
-    data = scraper.get_page_content(Config.BASE_URL)
+    scraper = HTMLScraper(BASE_URL)
+    data = scraper.get_page_content(BASE_URL)
     
     if data:
         print(f" Titre: {data['title'][:50]}...")
@@ -26,8 +33,8 @@ def test_find_links():
     print("\n TEST 2: Recherche de liens")
     print("-" * 50)
     
-    scraper = HTMLScraper(Config.BASE_URL)
-    links = scraper.find_links(Config.BASE_URL)
+    scraper = HTMLScraper(BASE_URL)
+    links = scraper.find_links(BASE_URL)
     
     print(f" {len(links)} liens trouvés")
     print(" Premiers liens:")
@@ -40,8 +47,8 @@ def test_embeddings():
     print("-" * 50)
     
     try:
-        from langchain_community.embeddings import GPT4AllEmbeddings
-        embeddings = GPT4AllEmbeddings()
+        from langchain_ollama import OllamaEmbeddings
+        embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL)
         
         # Test avec un texte simple
         test_text = "Ceci est un test pour vérifier que les embeddings fonctionnent."
@@ -64,7 +71,3 @@ if __name__ == "__main__":
     print("\n" + "=" * 50)
     print(" Tests terminés!")
     print("=" * 50)
-    vectorstore = Chroma(
-                embedding=gpt4all_embeddings,
-                persist_directory=self.persist_directory
-            )
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""
+Mesure des durées par étape (chatbot et ingestion)
+Chaque réponse du chatbot et chaque ingestion produit une trace : durée de
+chaque étape, nombres de tokens, succès des caches. Les traces terminées sont
+ajoutées au journal JSONL (TELEMETRY_LOG_PATH) et agrégées dans des
+histogrammes exposés au format texte de Prometheus (route /metrics de l'API).
+
+Utilisation :
+    python telemetry.py                  # percentiles par étape depuis le journal
+    python telemetry.py --kind ingest    # seulement les ingestions
+"""
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire racine au path Python
+root_path = Path(__file__).parent
+sys.path.insert(0, str(root_path))
+
+import argparse
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import TELEMETRY_ENABLED, TELEMETRY_LOG_PATH, LATENCY_BUCKETS
+
+
+class Trace:
+    """Durées (s) et compteurs d'une réponse ou d'une ingestion"""
+
+    def __init__(self, kind: str, **attributes):
+        self.kind = kind  # "chat", "ingest"
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+        self.counts: Dict[str, float] = {}
+        self._lock = threading.Lock()  # Les étapes de l'ingestion tournent dans plusieurs threads
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """Mesure la durée d'une étape (cumulée si l'étape est répétée)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def add_time(self, stage: str, seconds: float):
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def count(self, name: str, value: float = 1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def merge(self, timings: Dict[str, float], counts: Optional[Dict[str, float]] = None):
+        """Ajoute des durées et compteurs mesurés ailleurs (ex. dans un processus d'analyse)"""
+        for stage, seconds in timings.items():
+            self.add_time(stage, seconds)
+        for name, value in (counts or {}).items():
+            self.count(name, value)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "timestamp": self.started_at,
+                **self.attributes,
+                "timings": dict(self.timings),
+                "counts": dict(self.counts),
+            }
+
+
+def timed(trace: Optional[Trace], stage: str):
+    """trace.span(stage), ou rien si l'appelant n'est pas instrumenté"""
+    return trace.span(stage) if trace else nullcontext()
+
+
+class MetricsRegistry:
+    """Agrège les traces terminées (histogrammes, compteurs) et les écrit dans le journal JSONL"""
+
+    def __init__(self, log_path: Optional[Path] = TELEMETRY_LOG_PATH, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.log_path = Path(log_path) if log_path else None
+        self.buckets = tuple(sorted(buckets))
+        self.traces: Dict[str, int] = {}
+        self.histograms: Dict[Tuple[str, str], Dict] = {}  # (kind, étape) -> {"buckets", "sum", "count"}
+        self.counters: Dict[Tuple[str, str], float] = {}  # (kind, nom) -> total
+        self._lock = threading.Lock()
+
+    def observe(self, trace: Trace):
+        """
+        Enregistre une trace terminée
+
+        Args:
+            trace: La trace (sa durée totale doit être dans trace.timings["total"])
+        """
+        record = trace.to_dict()
+        with self._lock:
+            self.traces[trace.kind] = self.traces.get(trace.kind, 0) + 1
+            for stage, seconds in record["timings"].items():
+                histogram = self.histograms.setdefault(
+                    (trace.kind, stage), {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                )
+                for i, bound in enumerate(self.buckets):
+                    if seconds <= bound:
+                        histogram["buckets"][i] += 1
+                histogram["sum"] += seconds
+                histogram["count"] += 1
+            for name, value in record["counts"].items():
+                self.counters[(trace.kind, name)] = self.counters.get((trace.kind, name), 0) + value
+
+            if self.log_path:
+                try:
+                    self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                    with open(self.log_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                except OSError as e:
+                    print(f" Journal des durées inaccessible: {e}")
+
+    def render_prometheus(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """
+        Métriques au format texte de Prometheus
+
+        Args:
+            gauges: Valeurs instantanées à ajouter (ex. taux de succès des caches)
+
+        Returns:
+            Le texte à servir sur /metrics
+        """
+        lines = []
+        with self._lock:
+            lines += ["# HELP rag_traces_total Réponses et ingestions mesurées",
+                      "# TYPE rag_traces_total counter"]
+            for kind, total in sorted(self.traces.items()):
+                lines.append(f'rag_traces_total{{kind="{kind}"}} {total}')
+
+            lines += ["# HELP rag_stage_duration_seconds Durée de chaque étape",
+                      "# TYPE rag_stage_duration_seconds histogram"]
+            for (kind, stage), histogram in sorted(self.histograms.items()):
+                labels = f'kind="{kind}",stage="{stage}"'
+                for bound, observed in zip(self.buckets, histogram["buckets"]):
+                    lines.append(f'rag_stage_duration_seconds_bucket{{{labels},le="{bound:g}"}} {observed}')
+                lines.append(f'rag_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+                lines.append(f'rag_stage_duration_seconds_sum{{{labels}}} {histogram["sum"]:.6f}')
+                lines.append(f'rag_stage_duration_seconds_count{{{labels}}} {histogram["count"]}')
+
+            lines += ["# HELP rag_events_total Tokens, documents et succès de cache cumulés",
+                      "# TYPE rag_events_total counter"]
+            for (kind, name), total in sorted(self.counters.items()):
+                lines.append(f'rag_events_total{{kind="{kind}",name="{name}"}} {total:g}')
+
+        for name, value in sorted((gauges or {}).items()):
+            lines += [f"# TYPE rag_{name} gauge", f"rag_{name} {value:g}"]
+        return "\n".join(lines) + "\n"
+
+
+# Registre du processus (partagé par le moteur RAG, l'API et le scraper) ; sans journal si désactivé
+METRICS = MetricsRegistry(TELEMETRY_LOG_PATH if TELEMETRY_ENABLED else None)
+
+
+def format_breakdown(timings: Dict[str, float]) -> str:
+    """Durées d'une trace sur une ligne, dans l'ordre des étapes (ex. « retrieval 120 ms · ... »)"""
+    return " · ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in timings.items())
+
+
+def load_traces(path: Path = TELEMETRY_LOG_PATH, kind: Optional[str] = None) -> List[Dict]:
+    """Traces du journal JSONL (les lignes illisibles sont ignorées)"""
+    traces = []
+    if not Path(path).exists():
+        return traces
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                trace = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if kind is None or trace.get("kind") == kind:
+                traces.append(trace)
+    return traces
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Percentiles des durées par étape depuis le journal JSONL")
+    parser.add_argument("--log", type=Path, default=TELEMETRY_LOG_PATH)
+    parser.add_argument("--kind", choices=["chat", "ingest"], default=None)
+    args = parser.parse_args()
+
+    traces = load_traces(args.log, args.kind)
+    if not traces:
+        print(f" Aucune trace dans {args.log}")
+        sys.exit(0)
+
+    for kind in sorted({trace["kind"] for trace in traces}):
+        selected = [trace for trace in traces if trace["kind"] == kind]
+        print(f"\n {kind} : {len(selected)} traces")
+        print(f" {'étape':<16} {'p50 (ms)':>10} {'p95 (ms)':>10} {'max (ms)':>10}")
+        stages = list(dict.fromkeys(stage for trace in selected for stage in trace["timings"]))
+        for stage in stages:
+            values = [trace["timings"][stage] * 1000 for trace in selected if stage in trace["timings"]]
+            print(f" {stage:<16} {percentile(values, 0.5):>10.1f} {percentile(values, 0.95):>10.1f} "
+                  f"{max(values):>10.1f}")
+        counters = {}
+        for trace in selected:
+            for name, value in trace["counts"].items():
+                counters[name] = counters.get(name, 0) + value
+        if counters:
+            print(" " + ", ".join(f"{name}: {value / len(selected):.1f}/trace" for name, value in counters.items()))
@@ -0,0 +1,9 @@
+"""
+Configuration commune des tests : le répertoire racine est ajouté au path
+Python, comme dans les scripts du projet
+"""
+import sys
+from pathlib import Path
+
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
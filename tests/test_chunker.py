@@ -0,0 +1,48 @@
+"""Tests du découpage structuré (sections parentes et chunks enfants)"""
+from config import CHILD_CHUNK_SIZE, PARENT_CHUNK_SIZE
+from scrapping.chunker import MIN_SECTION_SIZE, split_structured
+
+METADATA = {'url': "https://www.uqac.ca/mgestion/politique/", 'type': 'html'}
+PARAGRAPH = "Le comité exécutif approuve les demandes présentées par les unités administratives. " * 3
+
+
+def test_children_point_into_their_parent_section():
+    text = "\n".join(["# Politique de gestion", "1. Objet", PARAGRAPH, "2. Champ d'application", PARAGRAPH])
+    chunks = split_structured(text, METADATA)
+    assert chunks
+    for chunk in chunks:
+        parent = chunk.metadata['parent']
+        start = chunk.metadata['start_index']
+        assert parent[start:start + len(chunk.page_content)] == chunk.page_content
+        assert len(chunk.page_content) <= CHILD_CHUNK_SIZE + 100
+        assert chunk.metadata['url'] == METADATA['url']
+
+
+def test_top_level_articles_start_new_sections():
+    text = "\n".join(["1. Objet", PARAGRAPH, "1.1. Définitions", PARAGRAPH, "2. Champ d'application", PARAGRAPH])
+    parents = {}
+    for chunk in split_structured(text, METADATA):
+        parents[chunk.metadata['section']] = chunk.metadata['parent']
+    assert len(parents) == 2
+    assert parents[0].startswith("1. Objet") and "1.1. Définitions" in parents[0]
+    assert parents[1].startswith("2. Champ d'application")
+
+
+def test_short_leading_blocks_stay_with_the_next_section():
+    title = "Règlement 3.1"
+    assert len(title) < MIN_SECTION_SIZE
+    chunks = split_structured("\n".join([title, "1. Objet", PARAGRAPH]), METADATA)
+    assert {chunk.metadata['section'] for chunk in chunks} == {0}
+    assert chunks[0].page_content.startswith(title)
+
+
+def test_long_sections_are_split_under_parent_size():
+    text = "\n".join(["# Annexe"] + [PARAGRAPH] * 12)
+    chunks = split_structured(text, METADATA)
+    parents = {chunk.metadata['section']: chunk.metadata['parent'] for chunk in chunks}
+    assert len(parents) > 1
+    assert all(len(parent) <= PARENT_CHUNK_SIZE for parent in parents.values())
+
+
+def test_empty_text_gives_no_chunks():
+    assert split_structured("\n \n", METADATA) == []
@@ -0,0 +1,56 @@
+"""Tests de l'assemblage du contexte (budget de tokens, fusion des chunks, fusion des classements)"""
+from langchain_core.documents import Document
+
+from lexical_index import reciprocal_rank_fusion
+from RAG.context import estimate_tokens, merge_overlapping, select_within_budget
+
+
+def doc(text: str, **metadata) -> Document:
+    return Document(page_content=text, metadata=metadata)
+
+
+def test_select_within_budget_keeps_order_and_skips_what_does_not_fit():
+    documents = [doc("a" * 40), doc("b" * 80), doc("c" * 20)]  # 10, 20 et 5 tokens
+    selected = select_within_budget(documents, token_budget=16)
+    assert [d.page_content[0] for d in selected] == ["a", "c"]
+    assert sum(estimate_tokens(d.page_content) for d in selected) <= 16
+
+
+def test_select_within_budget_respects_max_documents():
+    documents = [doc(f"passage {i}") for i in range(5)]
+    assert len(select_within_budget(documents, token_budget=1000, max_documents=2)) == 2
+    assert len(select_within_budget(documents, token_budget=1000)) == 5
+
+
+def test_select_within_budget_truncates_an_oversized_first_passage():
+    selected = select_within_budget([doc("mot " * 100, url="u"), doc("court")], token_budget=10)
+    assert len(selected) == 1
+    assert selected[0].page_content.endswith("[...]")
+    assert estimate_tokens(selected[0].page_content) <= 10 + 2
+    assert selected[0].metadata == {"url": "u"}
+
+
+def test_merge_overlapping_joins_chunks_of_the_same_section():
+    text = "0123456789abcdefghij"
+    first = doc(text[0:12], url="u", section=0, start_index=0)
+    second = doc(text[8:20], url="u", section=0, start_index=8)
+    other = doc("ailleurs", url="v", section=0, start_index=0)
+    merged = merge_overlapping([second, other, first])
+    assert [d.page_content for d in merged] == [text, "ailleurs"]
+
+
+def test_merge_overlapping_drops_duplicate_passages():
+    merged = merge_overlapping([doc("même texte", url="u"), doc("même texte", url="v")])
+    assert len(merged) == 1
+
+
+def test_reciprocal_rank_fusion_favours_documents_in_both_rankings():
+    a, b, c, d = (doc(t) for t in "abcd")
+    fused = reciprocal_rank_fusion([[a, b, c], [c, d, b]], k=3)
+    assert [x.page_content for x in fused] == ["c", "b", "a"]
+
+
+def test_reciprocal_rank_fusion_deduplicates_identical_chunks():
+    fused = reciprocal_rank_fusion([[doc("x", source="dense")], [doc("x", source="bm25")]], k=5)
+    assert len(fused) == 1
+    assert fused[0].metadata == {"source": "dense"}
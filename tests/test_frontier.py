@@ -0,0 +1,44 @@
+"""Tests de la frontière de crawl (normalisation des URLs, file FIFO)"""
+from scrapping.frontier import CrawlFrontier, normalize_url, strip_fragment
+
+
+def test_normalize_url_removes_fragment_and_trailing_slash():
+    assert normalize_url("https://www.uqac.ca/mgestion/#chapitre") == "https://www.uqac.ca/mgestion"
+    assert normalize_url("https://www.uqac.ca/") == "https://www.uqac.ca/"
+
+
+def test_normalize_url_lowercases_scheme_and_host_only():
+    assert normalize_url("HTTPS://WWW.UQAC.CA/MGestion/Page") == "https://www.uqac.ca/MGestion/Page"
+
+
+def test_normalize_url_drops_default_port_only():
+    assert normalize_url("https://www.uqac.ca:443/a") == "https://www.uqac.ca/a"
+    assert normalize_url("http://www.uqac.ca:80/a") == "http://www.uqac.ca/a"
+    assert normalize_url("http://127.0.0.1:8080/a") == "http://127.0.0.1:8080/a"
+
+
+def test_normalize_url_sorts_query_parameters():
+    assert normalize_url("https://x.ca/p?b=2&a=1&c=") == normalize_url("https://x.ca/p?c=&a=1&b=2")
+    assert normalize_url("https://x.ca/p?a=1") != normalize_url("https://x.ca/p?a=2")
+
+
+def test_strip_fragment_keeps_trailing_slash():
+    assert strip_fragment(" https://x.ca/a/#top ") == "https://x.ca/a/"
+
+
+def test_frontier_is_fifo_and_deduplicates_canonical_urls():
+    frontier = CrawlFrontier(["https://x.ca/a/"])
+    assert frontier.add("https://x.ca/b")
+    assert not frontier.add("https://X.ca/a#section")
+    assert not frontier.add("https://x.ca/b/")
+    assert len(frontier) == 2
+    assert frontier.pop() == "https://x.ca/a/"
+    assert frontier.pop() == "https://x.ca/b"
+    assert not frontier
+
+
+def test_frontier_remembers_visited_urls():
+    frontier = CrawlFrontier(["https://x.ca/a"])
+    frontier.pop()
+    assert "https://x.ca/a/" in frontier
+    assert not frontier.add("https://x.ca/a")
@@ -0,0 +1,65 @@
+"""Tests du manifeste de crawl (détection des changements, signature du découpage)"""
+from scrapping.manifest import CrawlManifest, content_hash, is_gone
+
+URL = "https://www.uqac.ca/mgestion/chapitre-1/"
+ITEM = {
+    'url': URL,
+    'type': 'html',
+    'content': "1. Objet\nLe présent règlement...",
+    'etag': '"abc"',
+    'last_modified': "Mon, 06 Jan 2025 10:00:00 GMT",
+    'links': ["https://www.uqac.ca/mgestion/chapitre-2/"],
+}
+
+
+def indexed_manifest(tmp_path, chunking="v1") -> CrawlManifest:
+    manifest = CrawlManifest(tmp_path / "manifest.json", chunking=chunking)
+    manifest.update(ITEM, {"id-1": content_hash("chunk")})
+    manifest.save()
+    return manifest
+
+
+def test_unknown_url_has_no_conditional_headers(tmp_path):
+    manifest = CrawlManifest(tmp_path / "manifest.json", chunking="v1")
+    assert manifest.conditional_headers(URL) == {}
+    assert not manifest.is_unchanged(URL, ITEM['content'])
+    assert manifest.links(URL) == []
+
+
+def test_indexed_url_sends_validators_and_detects_same_content(tmp_path):
+    manifest = CrawlManifest(indexed_manifest(tmp_path).path, chunking="v1")
+    assert manifest.conditional_headers(URL) == {
+        'If-None-Match': '"abc"',
+        'If-Modified-Since': "Mon, 06 Jan 2025 10:00:00 GMT",
+    }
+    assert manifest.is_unchanged(URL, ITEM['content'])
+    assert manifest.links(URL) == ITEM['links']
+
+
+def test_modified_content_is_detected(tmp_path):
+    manifest = indexed_manifest(tmp_path)
+    assert not manifest.is_unchanged(URL, ITEM['content'] + " (modifié)")
+
+
+def test_new_chunking_signature_forces_rechunking(tmp_path):
+    manifest = CrawlManifest(indexed_manifest(tmp_path, chunking="v1").path, chunking="v2")
+    assert manifest.conditional_headers(URL) == {}
+    assert not manifest.is_unchanged(URL, ITEM['content'])
+
+
+def test_remove_returns_stored_chunk_ids(tmp_path):
+    manifest = indexed_manifest(tmp_path)
+    assert manifest.remove(URL) == ["id-1"]
+    assert manifest.urls() == []
+    assert manifest.remove(URL) == []
+
+
+class HTTPError(Exception):
+    def __init__(self, status):
+        self.status = status
+
+
+def test_only_404_and_410_mean_gone():
+    assert is_gone(HTTPError(404)) and is_gone(HTTPError(410))
+    assert not is_gone(HTTPError(503))
+    assert not is_gone(TimeoutError())
@@ -0,0 +1,96 @@
+"""Tests de la file du LLM (équité entre sessions, refus au-delà de l'objectif de latence)"""
+import threading
+import time
+
+import pytest
+
+from RAG.scheduler import LLMScheduler, SchedulerBusy
+
+
+def wait_until(condition, timeout: float = 2.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "délai dépassé"
+        time.sleep(0.001)
+
+
+def ask(scheduler: LLMScheduler, client_id: str, on_queue=None):
+    with scheduler.slot(client_id, on_queue=on_queue):
+        pass
+
+
+def test_slot_is_immediate_when_a_place_is_free():
+    scheduler = LLMScheduler(max_in_flight=2, max_queue_wait=1, service_time=1)
+    with scheduler.slot("a") as waited, scheduler.slot("b"):
+        assert waited < 0.1
+        assert scheduler.stats()["in_flight"] == 2
+    assert scheduler.stats()["in_flight"] == 0
+
+
+def test_sessions_are_served_in_turn():
+    scheduler = LLMScheduler(max_in_flight=1, max_queue_wait=5, max_queue=10, service_time=0.01)
+    served = []
+
+    def ask(client_id: str, label: str):
+        with scheduler.slot(client_id):
+            served.append(label)
+
+    threads = []
+    with scheduler.slot("occupant"):
+        # Une session pose trois questions avant qu'une autre n'en pose une
+        for client_id, label in (("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1")):
+            thread = threading.Thread(target=ask, args=(client_id, label))
+            thread.start()
+            threads.append(thread)
+            wait_until(lambda: scheduler.stats()["queued"] == len(threads))
+    for thread in threads:
+        thread.join(timeout=5)
+    assert served == ["a1", "b1", "a2", "a3"]
+
+
+def test_queue_position_is_reported():
+    scheduler = LLMScheduler(max_in_flight=1, max_queue_wait=5, service_time=0.5)
+    positions = []
+    with scheduler.slot("occupant"):
+        thread = threading.Thread(target=ask, args=(scheduler, "a", lambda p, w: positions.append((p, w))))
+        thread.start()
+        wait_until(lambda: positions)
+    thread.join(timeout=5)
+    assert positions[0] == (0, 0.5)
+    assert scheduler.stats()["in_flight"] == 0
+
+
+def test_rejects_when_estimated_wait_exceeds_the_objective():
+    scheduler = LLMScheduler(max_in_flight=1, max_queue_wait=1, service_time=10)
+    with scheduler.slot("a"):
+        with pytest.raises(SchedulerBusy) as busy:
+            with scheduler.slot("b"):
+                pass
+    assert busy.value.estimated_wait == 10
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_rejects_when_the_queue_is_full():
+    scheduler = LLMScheduler(max_in_flight=1, max_queue_wait=5, max_queue=1, service_time=0.01)
+    with scheduler.slot("occupant"):
+        waiting = threading.Thread(target=ask, args=(scheduler, "a"))
+        waiting.start()
+        wait_until(lambda: scheduler.stats()["queued"] == 1)
+        with pytest.raises(SchedulerBusy):
+            with scheduler.slot("b"):
+                pass
+    waiting.join(timeout=5)
+    assert scheduler.stats()["admitted"] == 2
+
+
+def test_gives_up_after_max_wait_and_leaves_the_queue():
+    scheduler = LLMScheduler(max_in_flight=1, max_queue_wait=5, service_time=0.001)
+    with scheduler.slot("occupant"):
+        start = time.perf_counter()
+        with pytest.raises(SchedulerBusy):
+            with scheduler.slot("a", max_wait=0.05):
+                pass
+        assert time.perf_counter() - start >= 0.05
+        stats = scheduler.stats()
+    assert stats["timed_out"] == 1
+    assert stats["queued"] == 0